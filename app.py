@@ -4,15 +4,10 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
+from logging_config import setup_logging
 
-# Set up logging for production - MÁXIMA ESTABILIDAD
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-    ]
-)
+# Logging para producción: JSON, asíncrono (cola + hilo escritor), niveles por módulo
+setup_logging()
 
 class Base(DeclarativeBase):
     pass
@@ -130,7 +125,10 @@ with app.app_context():
     # Import models only (routes imported in main.py)
     try:
         import models
+        import crm_analytics  # registra los listeners que mantienen profile_stats
         db.create_all()
+        from db_schema import apply_schema_updates
+        apply_schema_updates(db)
         print("✅ Database initialized successfully")
     except Exception as e:
         print(f"⚠️ Database error: {e}")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la detección de sectores en intereses_laborales
+Compara el bucle anterior (keyword in text por cada raíz) con la expresión compilada de crm_text
+y muestra en qué textos difieren los resultados.
+
+Uso:
+    python bench_sectors.py --texts 20000
+    python bench_sectors.py --from-db            # intereses reales de users y perfiles ND
+"""
+
+import argparse
+import random
+import time
+from collections import Counter
+
+from crm_text import SECTOR_KEYWORDS, extraer_sectores
+
+
+def legacy_extract_sectors(text):
+    """Implementación anterior de /api/neurodivergent/sectors-data (texto ya en minúsculas)"""
+    sectores_encontrados = []
+    for sector, keywords in SECTOR_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword in text:
+                sectores_encontrados.append(sector)
+                break
+    return sectores_encontrados
+
+
+# Frases de relleno con falsos positivos del método anterior ("it" en "limitado", "arte" en "parte")
+_RELLENO = ['me gustaría', 'trabajar en', 'por mi parte', 'horario limitado', 'con posibilidad de',
+            'equipo pequeño', 'de forma remota', 'sin atención al público', 'a tiempo parcial', 'aprender']
+
+
+def synthetic_texts(n, seed=42):
+    rng = random.Random(seed)
+    keywords = [k for words in SECTOR_KEYWORDS.values() for k in words]
+    texts = []
+    for _ in range(n):
+        parts = rng.sample(_RELLENO, 3) + rng.sample(keywords, rng.randint(0, 3))
+        rng.shuffle(parts)
+        text = ' '.join(parts)
+        texts.append(text.capitalize() if rng.random() < 0.5 else text)
+    return texts
+
+
+def db_texts():
+    from app import app, db
+    from db_schema import usuarios_unificados as vista
+
+    with app.app_context():
+        rows = db.session.query(vista.c.intereses_laborales).filter(
+            vista.c.intereses_laborales.isnot(None), vista.c.intereses_laborales != '').all()
+    return [row[0] for row in rows]
+
+
+def _time(func, texts, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--texts', type=int, default=20000, help='textos sintéticos a generar')
+    parser.add_argument('--from-db', action='store_true', help='usar los intereses guardados en la base de datos')
+    parser.add_argument('--repeat', type=int, default=5, help='repeticiones (se toma la mejor)')
+    args = parser.parse_args()
+
+    texts = db_texts() if args.from_db else synthetic_texts(args.texts)
+    if not texts:
+        print("⚠️ No hay textos que analizar")
+        return
+    print(f"📊 {len(texts)} textos, {sum(len(w) for w in SECTOR_KEYWORDS.values())} raíces, mejor de {args.repeat}")
+
+    legacy = _time(lambda t: legacy_extract_sectors(t.lower()), texts, args.repeat)
+    compiled = _time(extraer_sectores, texts, args.repeat)
+    print(f"  anterior (keyword in text): {legacy * 1000:8.1f} ms  ({len(texts) / legacy:,.0f} textos/s)")
+    print(f"  expresión compilada:        {compiled * 1000:8.1f} ms  ({len(texts) / compiled:,.0f} textos/s)")
+    print(f"  aceleración: x{legacy / compiled:.2f}")
+
+    # Diferencias: sectores que solo detecta uno de los dos métodos
+    solo_anterior, solo_nuevo = Counter(), Counter()
+    distintos = 0
+    ejemplos = []
+    for text in texts:
+        antes, ahora = set(legacy_extract_sectors(text.lower())), set(extraer_sectores(text))
+        if antes == ahora:
+            continue
+        distintos += 1
+        solo_anterior.update(antes - ahora)
+        solo_nuevo.update(ahora - antes)
+        if len(ejemplos) < 5:
+            ejemplos.append((text, sorted(antes - ahora), sorted(ahora - antes)))
+    print(f"🔍 Textos con resultado distinto: {distintos} de {len(texts)}")
+    print(f"  solo el método anterior: {dict(solo_anterior.most_common())}")
+    print(f"  solo la expresión compilada: {dict(solo_nuevo.most_common())}")
+    for text, quitados, nuevos in ejemplos:
+        print(f"  - {text!r}: -{quitados} +{nuevos}")
+
+
+if __name__ == '__main__':
+    main()
@@ -223,7 +223,7 @@ COLABORADORES_TABLE_TEMPLATE = '''
                     </div>
                     <div class="col-md-6 text-end">
                         <button class="btn btn-success me-2" onclick="showAddColaboradorForm()">➕ Añadir Colaborador</button>
-                        <a href="/colaboradores/export" class="btn btn-warning me-2">📤 Exportar CSV</a>
+                        <button onclick="exportarEnSegundoPlano('colaboradores', {}, this)" class="btn btn-warning me-2">📤 Exportar CSV</button>
                         <button onclick="deleteAllColaboradores()" class="btn btn-danger">🗑️ Eliminar Todo</button>
                     </div>
                 </div>
@@ -409,6 +409,7 @@ COLABORADORES_TABLE_TEMPLATE = '''
         </div>
     </div>
     
+    <script src="{{ url_for('static', filename='js/export-jobs.js') }}"></script>
     <script>
         function deleteColaborador(id) {
             if (confirm('¿Estás seguro de que quieres eliminar este colaborador?')) {
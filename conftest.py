@@ -0,0 +1,62 @@
+"""
+Fixtures comunes de las pruebas
+Las pruebas con base de datos usan PostgreSQL (app.py no admite otro motor) y solo se ejecutan con
+TEST_DATABASE_URL apuntando a una base de datos desechable: vacían las tablas que usan.
+"""
+
+import os
+
+import pytest
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL', '')
+
+# Tablas que las pruebas vacían antes de cada caso
+TEST_TABLES = ['users', 'neurodivergent_profiles_new', 'general_leads', 'general_leads_archive',
+               'profile_stats', 'sector_tags', 'registration_daily', 'analytics_state', 'asociaciones']
+
+
+@pytest.fixture(scope='session')
+def crm_app(tmp_path_factory):
+    """App Flask con las rutas del CRM minimal sobre TEST_DATABASE_URL"""
+    if not TEST_DATABASE_URL.startswith('postgresql'):
+        pytest.skip('TEST_DATABASE_URL (PostgreSQL) no configurada')
+    os.environ['DATABASE_URL'] = TEST_DATABASE_URL
+    # crm_data.json, el spool de copias y las exportaciones se crean en el directorio actual
+    os.chdir(tmp_path_factory.mktemp('crm'))
+
+    from app import app
+    from crm_minimal import create_minimal_crm_routes
+
+    create_minimal_crm_routes(app)
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def db(crm_app):
+    """Sesión de base de datos con las tablas de TEST_TABLES vacías y sin cargas iniciales hechas"""
+    from sqlalchemy import text
+
+    import crm_analytics
+    from app import db
+
+    with crm_app.app_context():
+        db.session.execute(text(f"TRUNCATE {', '.join(TEST_TABLES)} RESTART IDENTITY CASCADE"))
+        db.session.commit()
+        crm_analytics._seeded.clear()
+        crm_analytics._dashboard_cache.update(data=None, expires=0.0)
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def client(crm_app, db):
+    return crm_app.test_client()
+
+
+@pytest.fixture
+def admin_client(client):
+    """Cliente con la sesión de administrador que piden las rutas destructivas del CRM"""
+    with client.session_transaction() as session:
+        session['admin_ok'] = True
+    return client
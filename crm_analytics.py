@@ -0,0 +1,844 @@
+#!/usr/bin/env python3
+"""
+Analítica pre-agregada de perfiles neurodivergentes y usuarios
+Las clasificaciones se calculan una vez al escribir el perfil y los contadores (profile_stats)
+se actualizan en la misma transacción, así los dashboards leen unas pocas filas en lugar de
+recorrer neurodivergent_profiles_new en cada petición.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import bindparam, event, func, inspect, literal, select, text, union_all
+from sqlalchemy.orm import Session
+
+from crm_text import extraer_sectores, simplificar
+from db_schema import usuarios_unificados as vista
+from models import (AnalyticsState, GeneralLead, GeneralLeadArchive, NeurodivergentProfile, ProfileStat,
+                    RegistrationDaily, SectorTag, User)
+
+logger = logging.getLogger(__name__)
+
+# ==================== CARGA INICIAL ====================
+# Mientras una tabla derivada no tenga su carga inicial, los listeners no le aplican deltas:
+# así la primera escritura tras el despliegue no la deja "no vacía" con datos parciales.
+
+_seeded = set()
+
+
+def is_seeded(connection, nombre):
+    """¿Tiene ya la tabla derivada su carga inicial? (se recuerda en el proceso una vez vista)"""
+    if nombre in _seeded:
+        return True
+    table = AnalyticsState.__table__
+    if connection.execute(select(table.c.nombre).where(table.c.nombre == nombre)).first() is None:
+        return False
+    _seeded.add(nombre)
+    return True
+
+
+_MARK_SEEDED = text(
+    "INSERT INTO analytics_state (nombre, cargado_at) VALUES (:nombre, :cargado_at) "
+    "ON CONFLICT (nombre) DO UPDATE SET cargado_at = excluded.cargado_at"
+)
+
+
+def mark_seeded(session, nombre):
+    """Marcar la carga inicial como hecha (en la misma transacción que la escribe)"""
+    session.execute(_MARK_SEEDED, {'nombre': nombre, 'cargado_at': datetime.utcnow()})
+
+# ==================== CLASIFICACIONES ====================
+# Mismas reglas que las consultas CASE ... LIKE que usaba /api/neurodivergent/ai-insights
+
+
+def _contiene(texto, palabras):
+    return any(palabra in texto for palabra in palabras)
+
+
+def clasificar_educacion(formacion):
+    lower = (formacion or '').lower()
+    if _contiene(lower, ('primaria', 'egb')):
+        return 'Educación Primaria'
+    if _contiene(lower, ('eso', 'bachiller', 'fp', 'grado medio')):
+        return 'Educación Secundaria'
+    if _contiene(lower, ('máster', 'master', 'universidad', 'grado')):
+        return 'Educación Superior'
+    if not formacion:
+        return 'Sin especificar'
+    return 'Otro'
+
+
+_ANOS_EXPERIENCIA = re.compile(r'[0-9]+.*año', re.DOTALL)
+
+
+def clasificar_experiencia(experiencia):
+    lower = (experiencia or '').lower()
+    if _contiene(lower, ('ninguna', 'sin experiencia')):
+        return 'Sin experiencia'
+    if experiencia and _ANOS_EXPERIENCIA.search(experiencia):
+        return 'Con experiencia (años especificados)'
+    if experiencia and len(experiencia) > 50:
+        return 'Experiencia detallada'
+    if experiencia:
+        return 'Experiencia básica'
+    return 'Sin especificar'
+
+
+def clasificar_adaptacion(adaptaciones):
+    lower = (adaptaciones or '').lower()
+    if _contiene(lower, ('ambiente', 'colaborativ')):
+        return 'Ambiente de trabajo'
+    if _contiene(lower, ('silenc', 'ruido')):
+        return 'Control acústico'
+    if _contiene(lower, ('música', 'sonido')):
+        return 'Estímulos auditivos'
+    if _contiene(lower, ('comprens', 'comunic')):
+        return 'Comunicación clara'
+    if adaptaciones:
+        return 'Otras adaptaciones'
+    return 'Sin adaptaciones específicas'
+
+
+def clasificar_perfil(profile):
+    """Rellenar las columnas derivadas de un perfil a partir de sus textos"""
+    profile.nivel_educativo = clasificar_educacion(profile.formacion_academica)
+    profile.tipo_experiencia = clasificar_experiencia(profile.experiencia_laboral)
+    profile.tipo_adaptacion = clasificar_adaptacion(profile.adaptaciones_necesarias)
+
+
+# ==================== CIUDADES ====================
+
+# Alias habituales -> nombre oficial; CRM_CITY_ALIASES puede apuntar a un JSON {"alias": "Ciudad"} que se añade
+CITY_ALIASES = {
+    'bcn': 'Barcelona',
+    'barna': 'Barcelona',
+    'mad': 'Madrid',
+    'madrid capital': 'Madrid',
+    'vlc': 'Valencia',
+    'valència': 'Valencia',
+    'sevilla capital': 'Sevilla',
+    'bilbo': 'Bilbao',
+    'donostia': 'San Sebastián',
+    'donostia-san sebastián': 'San Sebastián',
+    'la coruña': 'A Coruña',
+    'coruña': 'A Coruña',
+    'gerona': 'Girona',
+    'lérida': 'Lleida',
+    'palma de mallorca': 'Palma',
+    'vitoria': 'Vitoria-Gasteiz',
+    'gasteiz': 'Vitoria-Gasteiz',
+    'castellón': 'Castellón de la Plana',
+    'alacant': 'Alicante',
+    'elx': 'Elche',
+}
+
+
+def _load_city_aliases():
+    path = os.environ.get('CRM_CITY_ALIASES')
+    if path:
+        try:
+            with open(path, encoding='utf-8') as f:
+                CITY_ALIASES.update(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️ No se pudieron cargar los alias de ciudades (%s): %s", path, e)
+
+
+_load_city_aliases()
+_ALIAS_KEYS = {simplificar(alias): simplificar(ciudad) for alias, ciudad in CITY_ALIASES.items()}
+# Nombres con tildes que la clave normalizada pierde
+CITY_ACCENTED_NAMES = ['Málaga', 'Córdoba', 'Cádiz', 'León', 'Almería', 'Jaén', 'Ávila', 'Cáceres',
+                       'Logroño', 'Alcalá de Henares', 'Móstoles', 'Gijón', 'Castellón de la Plana',
+                       'Santa Cruz de Tenerife', 'Las Palmas de Gran Canaria', 'Mérida']
+# Clave normalizada -> nombre para mostrar
+CITY_NAMES = {simplificar(ciudad): ciudad for ciudad in CITY_ACCENTED_NAMES + list(CITY_ALIASES.values())}
+
+
+def normalizar_ciudad(ciudad):
+    """Clave de agrupación de una ciudad ("  BCN " -> "barcelona", "Málaga" -> "malaga"); None si está vacía"""
+    clave = simplificar(ciudad or '')
+    if not clave:
+        return None
+    return _ALIAS_KEYS.get(clave, clave)
+
+
+# ciudad_clave de una ciudad en blanco (solo espacios, tabuladores, NBSP...): distinto de NULL = "sin calcular"
+CITY_BLANK_KEY = ''
+
+
+def _clave_guardada(ciudad):
+    return normalizar_ciudad(ciudad) or CITY_BLANK_KEY
+
+
+def nombre_ciudad(clave, muestra=None):
+    """Nombre para mostrar de una clave: el oficial si es un alias conocido, si no la muestra capitalizada"""
+    if clave in CITY_NAMES:
+        return CITY_NAMES[clave]
+    return ' '.join((muestra or clave).split()).title()
+
+
+@event.listens_for(User, 'before_insert')
+@event.listens_for(User, 'before_update')
+@event.listens_for(NeurodivergentProfile, 'before_insert')
+@event.listens_for(NeurodivergentProfile, 'before_update')
+def _city_key_before_write(mapper, connection, target):
+    target.ciudad_clave = _clave_guardada(target.ciudad)
+
+
+def rebuild_city_keys(db, batch_size=1000):
+    """Recalcular ciudad_clave en users y perfiles (tras cambiar los alias o cargas por SQL directo)"""
+    processed = 0
+    for model in (User, NeurodivergentProfile):
+        table = model.__table__
+        update = (table.update().where(table.c.id == bindparam('fila_id'))
+                  .values(ciudad_clave=bindparam('clave')))
+        last_id = 0
+        while True:
+            rows = db.session.query(model.id, model.ciudad).filter(
+                model.id > last_id).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            db.session.execute(update, [{'fila_id': row.id, 'clave': _clave_guardada(row.ciudad)}
+                                        for row in rows])
+            db.session.commit()
+            processed += len(rows)
+            last_id = rows[-1].id
+    mark_seeded(db.session, 'city_keys')
+    db.session.commit()
+    logger.info("🏙️ Claves de ciudad recalculadas: %s filas", processed)
+    return processed
+
+
+def ensure_city_keys(db):
+    """Carga inicial de ciudad_clave (filas anteriores a la columna) si aún no se ha hecho
+
+    Después los listeners calculan la clave de cada fila escrita por el ORM; las cargas por SQL directo
+    necesitan rebuild_city_keys.
+    """
+    if not is_seeded(db.session.connection(), 'city_keys'):
+        rebuild_city_keys(db)
+
+
+def top_cities(session, limit=15):
+    """(ciudades más frecuentes en users + perfiles, número total de ciudades) en una sola consulta"""
+    # GROUP BY sobre la clave indexada; el total de ciudades sale de la ventana antes del LIMIT
+    total = func.count()
+    filas = session.query(
+        vista.c.ciudad_clave, total, func.max(vista.c.ciudad), func.count().over()
+    ).filter(vista.c.ciudad_clave.isnot(None), vista.c.ciudad_clave != CITY_BLANK_KEY).group_by(
+        vista.c.ciudad_clave
+    ).order_by(total.desc(), vista.c.ciudad_clave).limit(limit).all()
+    cities = [{'ciudad': nombre_ciudad(clave, muestra), 'count': count} for clave, count, muestra, _ in filas]
+    return cities, (filas[0][3] if filas else 0)
+
+
+# ==================== SECTORES DE INTERÉS ====================
+
+# Incluye los leads: migrate_legacy_users convierte los usuarios legacy en general_leads
+_SECTOR_SOURCES = {User: 'user', GeneralLead: 'lead', NeurodivergentProfile: 'profile'}
+
+# Marca de carga inicial; cambia de nombre cuando cambian las fuentes para recargar las instalaciones existentes
+_SECTOR_TAGS_SEED = 'sector_tags:leads'
+
+
+def _replace_sector_tags(connection, source, source_id, intereses):
+    table = SectorTag.__table__
+    connection.execute(table.delete().where(table.c.source == source, table.c.source_id == source_id))
+    sectores = extraer_sectores(intereses)
+    if sectores:
+        connection.execute(table.insert(), [{'source': source, 'source_id': source_id, 'sector': sector}
+                                            for sector in sectores])
+
+
+def tag_inserted_rows(connection, source, rows):
+    """Etiquetar filas insertadas sin pasar por el ORM (INSERT ... SELECT); rows: [(id, intereses_laborales)]"""
+    values = [{'source': source, 'source_id': row_id, 'sector': sector}
+              for row_id, intereses in rows for sector in extraer_sectores(intereses)]
+    if values:
+        connection.execute(SectorTag.__table__.insert(), values)
+    return len(values)
+
+
+def _tag_after_insert(mapper, connection, target):
+    _replace_sector_tags(connection, _SECTOR_SOURCES[mapper.class_], target.id, target.intereses_laborales)
+
+
+def _tag_after_update(mapper, connection, target):
+    if inspect(target).attrs.intereses_laborales.history.has_changes():
+        _replace_sector_tags(connection, _SECTOR_SOURCES[mapper.class_], target.id, target.intereses_laborales)
+
+
+def _tag_after_delete(mapper, connection, target):
+    _replace_sector_tags(connection, _SECTOR_SOURCES[mapper.class_], target.id, None)
+
+
+for _model in _SECTOR_SOURCES:
+    event.listen(_model, 'after_insert', _tag_after_insert)
+    event.listen(_model, 'after_update', _tag_after_update)
+    event.listen(_model, 'after_delete', _tag_after_delete)
+
+
+def rebuild_sector_tags(db, batch_size=1000):
+    """Recalcular sector_tags desde intereses_laborales (tras cambiar SECTOR_KEYWORDS o cargas por SQL directo)"""
+    table = SectorTag.__table__
+    db.session.execute(table.delete())
+    processed = tags = 0
+    for model, source in _SECTOR_SOURCES.items():
+        last_id = 0
+        while True:
+            rows = db.session.query(model.id, model.intereses_laborales).filter(
+                model.id > last_id).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            tags += tag_inserted_rows(db.session.connection(), source, rows)
+            db.session.commit()
+            processed += len(rows)
+            last_id = rows[-1].id
+    mark_seeded(db.session, _SECTOR_TAGS_SEED)
+    db.session.commit()
+    logger.info("🏷️ Sectores recalculados: %s filas, %s etiquetas", processed, tags)
+    return processed
+
+
+def ensure_sector_tags(db):
+    """Carga inicial de sector_tags si aún no se ha hecho
+
+    Los listeners ya etiquetan las filas nuevas (reemplazan las etiquetas de la fila, no suman deltas),
+    así que una tabla no vacía no indica que las filas anteriores al despliegue estén etiquetadas.
+    """
+    if not is_seeded(db.session.connection(), _SECTOR_TAGS_SEED):
+        rebuild_sector_tags(db)
+
+
+def top_sectors(session, limit=12):
+    """(sectores más frecuentes, número total de sectores) agregando sector_tags"""
+    total = func.count()
+    filas = session.query(SectorTag.sector, total, func.count().over()).group_by(
+        SectorTag.sector
+    ).order_by(total.desc(), SectorTag.sector).limit(limit).all()
+    return [{'sector': sector, 'count': count} for sector, count, _ in filas], (filas[0][2] if filas else 0)
+
+
+# ==================== CONTADORES (profile_stats) ====================
+
+# Columnas de las que dependen los contadores
+STAT_FIELDS = ['nivel_educativo', 'tipo_experiencia', 'tipo_adaptacion', 'diagnostico_formal',
+               'tipo_neurodivergencia', 'experiencia_laboral', 'adaptaciones_necesarias', 'habilidades']
+
+# Marca de carga inicial; cambia de nombre cuando cambian los contadores para recargar las instalaciones existentes
+_PROFILE_STATS_SEED = 'profile_stats:habilidades'
+
+# Dimensión con una fila por habilidad (la lee top_skills, no profile_insights)
+SKILL_DIMENSION = 'habilidad'
+
+_SKILL_SEPARATORS = re.compile(r'[,;]+')
+
+
+def extraer_habilidades(habilidades):
+    """Habilidades de una lista separada por comas o punto y coma, en minúsculas (cabe en profile_stats.clave)"""
+    skills = []
+    for skill in _SKILL_SEPARATORS.split(habilidades or ''):
+        skill = skill.strip().lower()
+        if len(skill) > 2:
+            skills.append(skill[:120])
+    return skills
+
+
+def stat_keys(values):
+    """Contadores (dimension, clave) a los que suma un perfil con estos valores"""
+    formal = bool(values.get('diagnostico_formal'))
+    keys = [
+        ('basico', 'total_perfiles'),
+        ('nivel_educativo', values.get('nivel_educativo')),
+        ('tipo_experiencia', values.get('tipo_experiencia')),
+        ('tipo_adaptacion', values.get('tipo_adaptacion')),
+        ('diagnostico', f"{'true' if formal else 'false'}|{values.get('tipo_neurodivergencia') or ''}"),
+    ]
+    if formal:
+        keys.append(('basico', 'con_diagnostico_formal'))
+    if values.get('experiencia_laboral'):
+        keys.append(('basico', 'con_experiencia'))
+    if values.get('adaptaciones_necesarias'):
+        keys.append(('basico', 'necesitan_adaptaciones'))
+    keys.extend((SKILL_DIMENSION, skill) for skill in extraer_habilidades(values.get('habilidades')))
+    return keys
+
+
+_UPSERT_STAT = text(
+    "INSERT INTO profile_stats (dimension, clave, total) VALUES (:dimension, :clave, :delta) "
+    "ON CONFLICT (dimension, clave) DO UPDATE SET total = profile_stats.total + excluded.total"
+)
+
+
+def _apply_deltas(connection, deltas):
+    changes = [{'dimension': d, 'clave': c, 'delta': n} for (d, c), n in deltas.items() if n]
+    if changes:
+        connection.execute(_UPSERT_STAT, changes)
+
+
+def _current_values(profile):
+    return {field: getattr(profile, field) for field in STAT_FIELDS}
+
+
+def _previous_values(profile):
+    # Valores antes de la escritura, a partir del historial de atributos del ORM
+    state = inspect(profile)
+    values = {}
+    for field in STAT_FIELDS:
+        history = state.attrs[field].history
+        if history.deleted:
+            values[field] = history.deleted[0]
+        elif history.unchanged:
+            values[field] = history.unchanged[0]
+        else:
+            values[field] = getattr(profile, field)
+    return values
+
+
+def _add(deltas, keys, amount):
+    for key in keys:
+        deltas[key] = deltas.get(key, 0) + amount
+
+
+@event.listens_for(NeurodivergentProfile, 'before_insert')
+@event.listens_for(NeurodivergentProfile, 'before_update')
+def _classify_before_write(mapper, connection, profile):
+    clasificar_perfil(profile)
+
+
+@event.listens_for(NeurodivergentProfile, 'after_insert')
+def _count_insert(mapper, connection, profile):
+    if not is_seeded(connection, _PROFILE_STATS_SEED):
+        return
+    deltas = {}
+    _add(deltas, stat_keys(_current_values(profile)), 1)
+    _apply_deltas(connection, deltas)
+
+
+@event.listens_for(NeurodivergentProfile, 'after_update')
+def _count_update(mapper, connection, profile):
+    if not is_seeded(connection, _PROFILE_STATS_SEED):
+        return
+    deltas = {}
+    _add(deltas, stat_keys(_previous_values(profile)), -1)
+    _add(deltas, stat_keys(_current_values(profile)), 1)
+    _apply_deltas(connection, deltas)
+
+
+@event.listens_for(NeurodivergentProfile, 'after_delete')
+def _count_delete(mapper, connection, profile):
+    if not is_seeded(connection, _PROFILE_STATS_SEED):
+        return
+    deltas = {}
+    _add(deltas, stat_keys(_previous_values(profile)), -1)
+    _apply_deltas(connection, deltas)
+
+
+def rebuild_profile_stats(db, batch_size=1000):
+    """Recalcular columnas derivadas y contadores desde cero (carga inicial o reparación)
+
+    Necesario tras escrituras que no pasan por el ORM (SQL directo, query.delete()).
+    Devuelve el número de perfiles procesados.
+    """
+    processed = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(
+            NeurodivergentProfile.id, NeurodivergentProfile.formacion_academica,
+            NeurodivergentProfile.experiencia_laboral, NeurodivergentProfile.adaptaciones_necesarias
+        ).filter(NeurodivergentProfile.id > last_id).order_by(NeurodivergentProfile.id).limit(batch_size).all()
+        if not rows:
+            break
+        db.session.execute(
+            NeurodivergentProfile.__table__.update()
+            .where(NeurodivergentProfile.__table__.c.id == bindparam('perfil_id'))
+            .values(nivel_educativo=bindparam('nivel'), tipo_experiencia=bindparam('experiencia'),
+                    tipo_adaptacion=bindparam('adaptacion')),
+            [{
+                'perfil_id': row.id,
+                'nivel': clasificar_educacion(row.formacion_academica),
+                'experiencia': clasificar_experiencia(row.experiencia_laboral),
+                'adaptacion': clasificar_adaptacion(row.adaptaciones_necesarias)
+            } for row in rows]
+        )
+        db.session.commit()
+        processed += len(rows)
+        last_id = rows[-1].id
+
+    # Contadores: una pasada por las columnas ya clasificadas, agregada con stat_keys()
+    deltas = {}
+    columns = [getattr(NeurodivergentProfile, field) for field in STAT_FIELDS]
+    for row in db.session.query(*columns).yield_per(batch_size):
+        _add(deltas, stat_keys(dict(zip(STAT_FIELDS, row))), 1)
+    db.session.query(ProfileStat).delete()
+    _apply_deltas(db.session.connection(), deltas)
+    mark_seeded(db.session, _PROFILE_STATS_SEED)
+    db.session.commit()
+    logger.info("📊 Analítica de perfiles recalculada: %s perfiles, %s contadores", processed, len(deltas))
+    return processed
+
+
+def ensure_profile_stats(db):
+    """Carga inicial de profile_stats si aún no se ha hecho (primera lectura tras el despliegue)"""
+    if not is_seeded(db.session.connection(), _PROFILE_STATS_SEED):
+        rebuild_profile_stats(db)
+
+
+def read_profile_stats(session):
+    """Contadores agrupados por dimensión: {dimension: [(clave, total), ...]} ordenados por total (sin habilidades)"""
+    grouped = {}
+    for stat in session.query(ProfileStat).filter(ProfileStat.total > 0, ProfileStat.dimension != SKILL_DIMENSION):
+        grouped.setdefault(stat.dimension, []).append((stat.clave, stat.total))
+    for values in grouped.values():
+        values.sort(key=lambda item: item[1], reverse=True)
+    return grouped
+
+
+def profile_insights(session):
+    """Datos de /api/neurodivergent/ai-insights a partir de profile_stats"""
+    stats = read_profile_stats(session)
+    basic = dict(stats.get('basico', []))
+
+    diagnosis_breakdown = []
+    for clave, total in stats.get('diagnostico', []):
+        formal, tipo = clave.split('|', 1)
+        diagnosis_breakdown.append({'formal': formal == 'true', 'tipo': tipo or None, 'count': total})
+
+    return {
+        'ai_insights': {
+            'total_perfiles': basic.get('total_perfiles', 0),
+            'con_diagnostico_formal': basic.get('con_diagnostico_formal', 0),
+            'con_experiencia_laboral': basic.get('con_experiencia', 0),
+            'necesitan_adaptaciones': basic.get('necesitan_adaptaciones', 0)
+        },
+        'education_levels': [{'nivel': k, 'count': n} for k, n in stats.get('nivel_educativo', [])],
+        'work_experience_types': [{'tipo': k, 'count': n} for k, n in stats.get('tipo_experiencia', [])],
+        'adaptation_needs': [{'tipo': k, 'count': n} for k, n in stats.get('tipo_adaptacion', [])],
+        'diagnosis_breakdown': diagnosis_breakdown
+    }
+
+
+# ==================== SERIES TEMPORALES (registration_daily) ====================
+# Cuenta altas: un lead archivado o un perfil borrado siguen contando el día en que se registraron
+
+_REGISTRATION_SOURCES = {GeneralLead: 'lead', NeurodivergentProfile: 'profile'}
+
+TIMESERIES_GRANULARITIES = ('day', 'week', 'month')
+
+# Máximo de periodos por respuesta (p. ej. ~5 años por días)
+TIMESERIES_MAX_BUCKETS = 2000
+
+_UPSERT_REGISTRATION = text(
+    "INSERT INTO registration_daily (dia, source, tipo_neurodivergencia, total) "
+    "VALUES (:dia, :source, :tipo, :total) "
+    "ON CONFLICT (dia, source, tipo_neurodivergencia) DO UPDATE SET total = registration_daily.total + excluded.total"
+)
+
+
+def _count_registration(mapper, connection, target):
+    if not is_seeded(connection, 'registration_daily'):
+        return
+    created = target.created_at or datetime.utcnow()
+    connection.execute(_UPSERT_REGISTRATION, {
+        'dia': created.date(),
+        'source': _REGISTRATION_SOURCES[mapper.class_],
+        'tipo': target.tipo_neurodivergencia or '',
+        'total': 1
+    })
+
+
+def count_inserted_registrations(connection, source, rows):
+    """Sumar al rollup altas insertadas sin pasar por el ORM (INSERT ... SELECT); rows: [(created_at, tipo)]
+
+    Como la carga inicial, las filas sin created_at no cuentan.
+    """
+    if not is_seeded(connection, 'registration_daily'):
+        return
+    totales = {}
+    for created, tipo in rows:
+        if created is not None:
+            clave = (created.date(), tipo or '')
+            totales[clave] = totales.get(clave, 0) + 1
+    if totales:
+        connection.execute(_UPSERT_REGISTRATION, [
+            {'dia': dia, 'source': source, 'tipo': tipo, 'total': total} for (dia, tipo), total in totales.items()
+        ])
+
+
+for _model in _REGISTRATION_SOURCES:
+    event.listen(_model, 'after_insert', _count_registration)
+
+
+def rebuild_registration_rollup(db, force=False):
+    """Carga inicial de registration_daily con un GROUP BY por día sobre leads (también archivados) y perfiles
+
+    Solo se ejecuta una vez: después el rollup es el histórico y no se recalcula, porque las altas de
+    perfiles o leads borrados (fuera del archivo) ya no están en las tablas y se perderían días pasados.
+    force=True lo recalcula igualmente desde las tablas actuales, con esa pérdida.
+    """
+    if not force and is_seeded(db.session.connection(), 'registration_daily'):
+        logger.info("📈 Series temporales ya cargadas: no se recalculan (usa force para rehacerlas)")
+        return 0
+    sources = [(GeneralLead, 'lead'), (GeneralLeadArchive, 'lead'), (NeurodivergentProfile, 'profile')]
+    registros = union_all(*[
+        select(func.date(model.created_at).label('dia'), literal(source).label('source'),
+               func.coalesce(model.tipo_neurodivergencia, '').label('tipo'))
+        .where(model.created_at.isnot(None))
+        for model, source in sources
+    ]).subquery()
+    agregado = select(registros.c.dia, registros.c.source, registros.c.tipo, func.count()).group_by(
+        registros.c.dia, registros.c.source, registros.c.tipo)
+
+    table = RegistrationDaily.__table__
+    db.session.execute(table.delete())
+    db.session.execute(table.insert().from_select(['dia', 'source', 'tipo_neurodivergencia', 'total'], agregado))
+    mark_seeded(db.session, 'registration_daily')
+    db.session.commit()
+    filas = db.session.query(func.count()).select_from(table).scalar()
+    logger.info("📈 Series temporales recalculadas: %s filas día/tipo", filas)
+    return filas
+
+
+def ensure_registration_rollup(db):
+    """Carga inicial de registration_daily si aún no se ha hecho"""
+    if not is_seeded(db.session.connection(), 'registration_daily'):
+        rebuild_registration_rollup(db)
+
+
+def period_start(dia, granularity):
+    """Inicio del periodo que contiene el día (lunes para week, día 1 para month)"""
+    if granularity == 'week':
+        return dia - timedelta(days=dia.weekday())
+    if granularity == 'month':
+        return dia.replace(day=1)
+    return dia
+
+
+def _periods_back(hasta, granularity, count):
+    """Inicio del periodo que queda count periodos atrás contando el de hasta"""
+    start = period_start(hasta, granularity)
+    if granularity == 'week':
+        return start - timedelta(days=7 * (count - 1))
+    if granularity == 'month':
+        months = start.year * 12 + start.month - 1 - (count - 1)
+        return date(max(months // 12, 1), months % 12 + 1, 1)
+    return start - timedelta(days=count - 1)
+
+
+def _next_period(dia, granularity):
+    if granularity == 'week':
+        return dia + timedelta(days=7)
+    if granularity == 'month':
+        return date(dia.year + dia.month // 12, dia.month % 12 + 1, 1)
+    return dia + timedelta(days=1)
+
+
+def registration_timeseries(db, granularity='day', desde=None, hasta=None, source=None):
+    """Altas por periodo y tipo de neurodivergencia leyendo solo registration_daily
+
+    Sin desde se devuelven los últimos TIMESERIES_MAX_BUCKETS periodos como mucho; ValueError si la
+    granularidad no es válida o si el rango pedido explícitamente supera ese máximo.
+    """
+    if granularity not in TIMESERIES_GRANULARITIES:
+        raise ValueError(f"granularity debe ser {', '.join(TIMESERIES_GRANULARITIES)}")
+    hasta = hasta or date.today()
+    # Sin from: desde el primer dato, pero nunca más atrás de lo que cabe en una respuesta
+    limite = desde or _periods_back(hasta, granularity, TIMESERIES_MAX_BUCKETS)
+
+    query = db.session.query(RegistrationDaily.dia, RegistrationDaily.tipo_neurodivergencia,
+                             func.sum(RegistrationDaily.total)).filter(RegistrationDaily.dia <= hasta,
+                                                                       RegistrationDaily.dia >= limite)
+    if source:
+        query = query.filter(RegistrationDaily.source == source)
+    rows = query.group_by(RegistrationDaily.dia, RegistrationDaily.tipo_neurodivergencia).all()
+
+    if desde is None:
+        desde = min((row[0] for row in rows), default=hasta)
+    if desde > hasta:
+        raise ValueError('from no puede ser posterior a to')
+
+    # Periodos consecutivos (también los vacíos) para que las gráficas no salten huecos
+    periods = {}
+    current = period_start(desde, granularity)
+    while current <= hasta:
+        if len(periods) >= TIMESERIES_MAX_BUCKETS:
+            raise ValueError(f'El rango supera {TIMESERIES_MAX_BUCKETS} periodos; usa una granularidad mayor')
+        periods[current] = {}
+        current = _next_period(current, granularity)
+
+    tipos = {}
+    for dia, tipo, total in rows:
+        tipo = tipo or 'Sin especificar'
+        bucket = periods[period_start(dia, granularity)]
+        bucket[tipo] = bucket.get(tipo, 0) + total
+        tipos[tipo] = tipos.get(tipo, 0) + total
+
+    return {
+        'granularity': granularity,
+        'from': desde.isoformat(),
+        'to': hasta.isoformat(),
+        'tipos': sorted(tipos, key=tipos.get, reverse=True),
+        'total': sum(tipos.values()),
+        'series': [{'periodo': periodo.isoformat(), 'total': sum(por_tipo.values()), 'por_tipo': por_tipo}
+                   for periodo, por_tipo in periods.items()]
+    }
+
+
+# ==================== DASHBOARD ND (bundle) ====================
+
+# Segundos que se reutiliza el bundle calculado (por proceso)
+DASHBOARD_TTL = float(os.environ.get('CRM_DASHBOARD_TTL', '30'))
+
+# Conexiones extra que calculan widgets en paralelo importando el snapshot; los demás widgets se calculan
+# en la propia conexión que lo exporta (0 = todos seguidos en una sola conexión)
+DASHBOARD_WORKERS = int(os.environ.get('CRM_DASHBOARD_WORKERS', '1'))
+
+_SNAPSHOT_ID = re.compile(r'^[0-9A-Fa-f-]+$')
+
+_dashboard_pool = ThreadPoolExecutor(max_workers=max(1, DASHBOARD_WORKERS), thread_name_prefix='crm-dashboard')
+_dashboard_lock = threading.Lock()
+_dashboard_cache = {'data': None, 'expires': 0.0}
+
+
+def top_skills(session, limit=20):
+    """Habilidades más repetidas en los perfiles ND, leídas de sus contadores en profile_stats"""
+    filas = session.query(ProfileStat.clave, ProfileStat.total).filter(
+        ProfileStat.dimension == SKILL_DIMENSION, ProfileStat.total > 0
+    ).order_by(ProfileStat.total.desc(), ProfileStat.clave).limit(limit).all()
+    return [{'habilidad': skill, 'count': count} for skill, count in filas]
+
+
+def _widget_perfiles(session):
+    insights = profile_insights(session)
+    tipos = {}
+    for row in insights['diagnosis_breakdown']:
+        tipo = row['tipo'] or 'No especificado'
+        tipos[tipo] = tipos.get(tipo, 0) + row['count']
+    return {
+        'metricas': insights['ai_insights'],
+        'tipos': [{'tipo': tipo, 'count': count}
+                  for tipo, count in sorted(tipos.items(), key=lambda item: item[1], reverse=True)],
+        'experiencia': insights['work_experience_types'],
+        'adaptaciones': insights['adaptation_needs']
+    }
+
+
+def _widget_geografico(session):
+    cities, total = top_cities(session)
+    return {'ciudades': cities, 'total': total}
+
+
+def _widget_sectores(session):
+    sectors, total = top_sectors(session)
+    return {'sectores': sectors, 'total': total}
+
+
+# Widget -> función(session); todos son lecturas independientes. Primero el más costoso (GROUP BY sobre
+# users + perfiles), que es el que va a las conexiones extra; el resto lee tablas de contadores
+DASHBOARD_WIDGETS = {
+    'geografico': _widget_geografico,
+    'perfiles': _widget_perfiles,
+    'sectores': _widget_sectores,
+    'habilidades': top_skills,
+}
+
+
+def _timed(widget, session):
+    start = time.perf_counter()
+    result = widget(session)
+    return result, round((time.perf_counter() - start) * 1000, 1)
+
+
+def _timed_in_snapshot(engine, snapshot, widget):
+    # Transacción propia importando el snapshot exportado: ve exactamente los mismos datos
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level='REPEATABLE READ')
+        with conn.begin():
+            conn.execute(text(f"SET TRANSACTION SNAPSHOT '{snapshot}'"))
+            with Session(bind=conn) as session:
+                return _timed(widget, session)
+
+
+def compute_dashboard(db):
+    """Calcular todos los widgets sobre un mismo estado de la base de datos, con el tiempo de cada uno
+
+    En PostgreSQL los primeros DASHBOARD_WORKERS widgets se calculan en paralelo en conexiones que importan
+    el snapshot de la transacción principal (pg_export_snapshot), mientras esta calcula el resto; en otros
+    motores se calculan seguidos en la misma transacción.
+    """
+    start = time.perf_counter()
+    if db.engine.dialect.name == 'postgresql':
+        paralelos = list(DASHBOARD_WIDGETS)[:max(0, DASHBOARD_WORKERS)]
+        with db.engine.connect() as conn:
+            conn.execution_options(isolation_level='REPEATABLE READ')
+            with conn.begin():
+                futures = {}
+                if paralelos:
+                    # El snapshot solo es importable mientras esta transacción siga abierta
+                    snapshot = conn.execute(text('SELECT pg_export_snapshot()')).scalar()
+                    if not _SNAPSHOT_ID.match(snapshot or ''):
+                        raise RuntimeError(f'Identificador de snapshot inesperado: {snapshot!r}')
+                    futures = {name: _dashboard_pool.submit(_timed_in_snapshot, db.engine, snapshot,
+                                                            DASHBOARD_WIDGETS[name])
+                               for name in paralelos}
+                with Session(bind=conn) as session:
+                    results = {name: _timed(widget, session)
+                               for name, widget in DASHBOARD_WIDGETS.items() if name not in futures}
+                results.update({name: future.result() for name, future in futures.items()})
+                results = {name: results[name] for name in DASHBOARD_WIDGETS}
+    else:
+        results = {name: _timed(widget, db.session) for name, widget in DASHBOARD_WIDGETS.items()}
+
+    return {
+        'widgets': {name: data for name, (data, _) in results.items()},
+        'timings_ms': {name: ms for name, (_, ms) in results.items()},
+        'total_ms': round((time.perf_counter() - start) * 1000, 1),
+        'generated_at': datetime.utcnow().isoformat()
+    }
+
+
+def dashboard_bundle(db, refresh=False):
+    """(bundle del dashboard, si venía de la caché); solo un hilo recalcula cuando caduca"""
+    cached = _dashboard_cache['data']
+    if not refresh and cached and _dashboard_cache['expires'] > time.monotonic():
+        return cached, True
+    with _dashboard_lock:
+        # Otra petición pudo recalcularlo mientras esperábamos el lock
+        cached = _dashboard_cache['data']
+        if not refresh and cached and _dashboard_cache['expires'] > time.monotonic():
+            return cached, True
+        ensure_profile_stats(db)
+        ensure_city_keys(db)
+        ensure_sector_tags(db)
+        data = compute_dashboard(db)
+        _dashboard_cache.update(data=data, expires=time.monotonic() + DASHBOARD_TTL)
+    logger.info('Dashboard ND calculado', extra={'total_ms': data['total_ms'], 'timings_ms': data['timings_ms']})
+    return data, False
+
+
+# ==================== RECÁLCULO COMPLETO ====================
+
+REBUILDERS = {
+    'perfiles': rebuild_profile_stats,
+    'ciudades': rebuild_city_keys,
+    'sectores': rebuild_sector_tags,
+    'series': rebuild_registration_rollup,
+}
+
+
+def rebuild_all(db, only=None, force_series=False):
+    """Recalcular todos los datos derivados (o solo los de only); devuelve las filas procesadas por cada uno
+
+    Las series temporales solo se cargan la primera vez salvo force_series (ver rebuild_registration_rollup).
+    """
+    result = {}
+    for name, rebuild in REBUILDERS.items():
+        if only and name not in only:
+            continue
+        result[name] = rebuild(db, force=True) if name == 'series' and force_series else rebuild(db)
+    return result
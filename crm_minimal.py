@@ -6,82 +6,122 @@ CRM Minimal - Sistema simple que funciona sin complicaciones
 from flask import jsonify, request, render_template, session, redirect
 import json
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import csv
 import io
+import codecs
+import time
+from itertools import islice
 
-# Archivo de datos simple
+import logging
+from crm_store import CRMStore
+from crm_mirror import MirrorQueue
+from logging_config import audit
+
+logger = logging.getLogger(__name__)
+
+# Archivo de datos simple (snapshot + log de cambios gestionados por CRMStore)
 DATA_FILE = 'crm_data.json'
+store = CRMStore(DATA_FILE)
+
+# Copias write-behind de los formularios públicos (ver crm_mirror.py)
+mirror = MirrorQueue(store)
+
+# Filas por lote al importar CSV (cada lote es una escritura atómica del store)
+IMPORT_CHUNK_SIZE = int(os.environ.get('CRM_IMPORT_CHUNK_SIZE', '1000'))
 
 def init_data_file():
     """Inicializar archivo de datos si no existe"""
-    if not os.path.exists(DATA_FILE):
-        data = {
-            'companies': [],
-            'contacts': [],
-            'stats': {
-                'total_companies': 0,
-                'total_contacts': 0,
-                'last_updated': datetime.now().isoformat()
-            }
-        }
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    store.init_file()
 
 def load_data():
     """Cargar datos del archivo"""
-    init_data_file()
-    with open(DATA_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return store.load_data()
 
 def save_data(data):
     """Guardar datos al archivo"""
-    data['stats']['last_updated'] = datetime.now().isoformat()
-    data['stats']['total_companies'] = len(data.get('companies', []))
-    data['stats']['total_contacts'] = len(data.get('contacts', []))
-    
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    store.save_data(data)
+
+def _csv_companies(reader, counts):
+    """Generador: mapear y validar filas del CSV de DiversIA a empresas"""
+    for row in reader:
+        # Mapear columnas específicas del CSV de DiversIA
+        empresa = (row.get('Empresa') or '').strip()
+        
+        # Validar que tenga al menos empresa
+        if not empresa:
+            counts['skipped'] += 1
+            # Detalle por fila: muestreado (LOG_SAMPLE_RATE) para no inundar el log en CSV grandes
+            logger.debug("Fila CSV omitida: sin columna Empresa", extra={'linea': reader.line_num, 'sample': True})
+            continue
+        
+        # Limpiar email si tiene formato mailto:
+        email = (row.get('Email') or '').strip()
+        if email.startswith('mailto:'):
+            email = email.replace('mailto:', '')
+        
+        yield {
+            'nombre': empresa,
+            'email': email,
+            'telefono': (row.get('Telefono') or '').strip(),
+            'sector': (row.get('Sector') or '').strip(),
+            'ciudad': (row.get('Ciudad') or '').strip(),
+            'fecha_contacto': (row.get('Fecha') or '').strip(),
+            'notas': (row.get('Acciones') or '').strip(),
+            'created_at': datetime.now().isoformat()
+        }
+
+def _chunks(iterable, size):
+    """Agrupar un iterable en listas de como máximo size elementos"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
 
 def create_minimal_crm_routes(app):
     """Crear rutas del CRM minimal"""
     from flask import flash, redirect
     from app import db
     
+    # Recuperar copias pendientes del spool y arrancar el volcado en segundo plano
+    mirror.start()
+    
+    def json_response(payload):
+        """Respuesta JSON a partir de bytes ya serializados (sin volver a codificar)"""
+        return app.response_class(payload, mimetype='application/json')
+    
+    def is_admin():
+        """¿Sesión de administrador del CRM? (mismo criterio que las páginas protegidas)"""
+        return 'admin_user_id' in session or 'admin_username' in session or bool(session.get('admin_ok'))
+    
     @app.route('/crm-minimal')
     def crm_minimal_dashboard():
         """Dashboard del CRM minimal - requiere autenticación"""
         # Verificar si está autenticado como admin
-        if not ('admin_user_id' in session or 'admin_username' in session or session.get('admin_ok')):
+        if not is_admin():
             return redirect('/diversia-admin')
         return render_template('crm-minimal.html')
     
     @app.route('/empresas')
     def empresas_cards():
         """Vista de tarjetas de empresas para edición individual"""
-        if not ('admin_user_id' in session or 'admin_username' in session or session.get('admin_ok')):
+        if not is_admin():
             return redirect('/diversia-admin')
         
-        data = load_data()
-        companies = data.get('companies', [])
+        # Snapshot en caché: solo se reconstruye cuando cambia la versión del store
+        companies = store.snapshot('companies').records
         return render_template('empresas-cards.html', companies=companies)
     
     @app.route('/asociaciones-crm')
     def asociaciones_crm():
         """Dashboard de asociaciones del CRM - requiere autenticación"""
-        if not ('admin_user_id' in session or 'admin_username' in session or session.get('admin_ok')):
+        if not is_admin():
             return redirect('/diversia-admin')
         
-        try:
-            data = load_data()
-            # Usar tabla separada de asociaciones
-            asociaciones = data.get('asociaciones', [])
-            print(f"🔍 Debug: Encontradas {len(asociaciones)} asociaciones en tabla separada")
-            return render_template('asociaciones-crm.html', asociaciones=asociaciones)
-        except Exception as e:
-            print(f"❌ Error cargando asociaciones: {e}")
-            flash(f'Error cargando asociaciones: {str(e)}', 'error')
-            return render_template('asociaciones-crm.html', asociaciones=[])
+        # Los datos se cargan por páginas desde /api/asociaciones (tabla asociaciones de PostgreSQL)
+        return render_template('asociaciones-crm.html')
     
     @app.route('/usuarios-neurodivergentes')
     def usuarios_neurodivergentes():
@@ -102,87 +142,15 @@ def create_minimal_crm_routes(app):
     
     @app.route('/api/minimal/companies')
     def get_companies_minimal():
-        """Obtener todas las empresas"""
-        data = load_data()
-        return jsonify(data.get('companies', []))
-    
-    @app.route('/api/asociaciones')
-    def get_asociaciones_api():
-        """API para obtener asociaciones de la tabla separada"""
-        try:
-            data = load_data()
-            asociaciones = data.get('asociaciones', [])
-            print(f"🔍 API: Devolviendo {len(asociaciones)} asociaciones de tabla separada")
-            return jsonify(asociaciones)
-        except Exception as e:
-            print(f"❌ Error en API asociaciones: {e}")
-            return jsonify([]), 500
-    
-    @app.route('/api/asociaciones/<int:asociacion_id>')
-    def get_asociacion_individual(asociacion_id):
-        """API para obtener una asociación específica"""
-        try:
-            data = load_data()
-            asociaciones = data.get('asociaciones', [])
-            
-            # Encontrar asociación específica
-            asociacion = next((a for a in asociaciones if a.get('id') == asociacion_id), None)
-            if asociacion is None:
-                return jsonify({'success': False, 'error': 'Asociación no encontrada'}), 404
-            
-            return jsonify({'success': True, 'asociacion': asociacion})
-        except Exception as e:
-            return jsonify({'success': False, 'error': str(e)}), 500
-    
-    @app.route('/api/asociaciones/<int:asociacion_id>', methods=['PUT'])
-    def update_asociacion_api(asociacion_id):
-        """API para actualizar asociación específica"""
-        try:
-            update_data = request.get_json()
-            data = load_data()
-            asociaciones = data.get('asociaciones', [])
-            
-            # Encontrar asociación
-            asociacion_index = next((i for i, a in enumerate(asociaciones) if a.get('id') == asociacion_id), None)
-            if asociacion_index is None:
-                return jsonify({'success': False, 'error': 'Asociación no encontrada'}), 404
-            
-            # Actualizar campos
-            asociacion = asociaciones[asociacion_index]
-            asociacion.update({
-                'nombre_asociacion': update_data.get('nombre_asociacion', asociacion.get('nombre_asociacion', '')),
-                'acronimo': update_data.get('acronimo', asociacion.get('acronimo', '')),
-                'pais': update_data.get('pais', asociacion.get('pais', '')),
-                'ciudad': update_data.get('ciudad', asociacion.get('ciudad', '')),
-                'estado': update_data.get('estado', asociacion.get('estado', '')),
-                'email': update_data.get('email', asociacion.get('email', '')),
-                'telefono': update_data.get('telefono', asociacion.get('telefono', '')),
-                'updated_at': datetime.now().isoformat()
-            })
-            
-            asociaciones[asociacion_index] = asociacion
-            data['asociaciones'] = asociaciones
-            save_data(data)
-            
-            return jsonify({'success': True, 'asociacion': asociacion})
-        except Exception as e:
-            return jsonify({'success': False, 'error': str(e)}), 500
-    
-    @app.route('/api/asociaciones/<int:asociacion_id>', methods=['DELETE'])
-    def delete_asociacion_api(asociacion_id):
-        """API para eliminar asociación específica"""
-        try:
-            data = load_data()
-            asociaciones = data.get('asociaciones', [])
-            
-            # Filtrar asociación a eliminar
-            asociaciones_filtradas = [a for a in asociaciones if a.get('id') != asociacion_id]
-            data['asociaciones'] = asociaciones_filtradas
-            save_data(data)
-            
-            return jsonify({'success': True, 'message': 'Asociación eliminada'})
-        except Exception as e:
-            return jsonify({'success': False, 'error': str(e)}), 500
+        """Obtener todas las empresas (304 si el cliente ya tiene la versión actual)"""
+        from crm_queries import make_etag, not_modified, with_validators
+        
+        snap = store.snapshot('companies')
+        etag = make_etag(request, snap.etag)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        return with_validators(json_response(snap.payload), etag)
     
     @app.route('/api/minimal/companies', methods=['POST'])
     def create_company_minimal():
@@ -190,14 +158,7 @@ def create_minimal_crm_routes(app):
         try:
             company_data = request.get_json()
             
-            data = load_data()
-            companies = data.get('companies', [])
-            
-            # Generar ID
-            new_id = max([c.get('id', 0) for c in companies], default=0) + 1
-            
             new_company = {
-                'id': new_id,
                 'nombre': company_data.get('nombre', ''),
                 'email': company_data.get('email', ''),
                 'telefono': company_data.get('telefono', ''),
@@ -206,9 +167,8 @@ def create_minimal_crm_routes(app):
                 'created_at': datetime.now().isoformat()
             }
             
-            companies.append(new_company)
-            data['companies'] = companies
-            save_data(data)
+            # Generar ID y guardar de forma atómica
+            new_company = store.insert('companies', new_company)
             
             return jsonify({'success': True, 'company': new_company})
         except Exception as e:
@@ -218,14 +178,11 @@ def create_minimal_crm_routes(app):
     def get_company_minimal(company_id):
         """Obtener una empresa específica"""
         try:
-            data = load_data()
-            companies = data.get('companies', [])
-            
-            company = next((c for c in companies if c.get('id') == company_id), None)
-            if not company:
+            payload = store.record_payload('companies', company_id)
+            if payload is None:
                 return jsonify({'success': False, 'error': 'Empresa no encontrada'}), 404
             
-            return jsonify({'success': True, 'company': company})
+            return json_response(b'{"success":true,"company":' + payload + b'}')
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)}), 500
     
@@ -235,47 +192,26 @@ def create_minimal_crm_routes(app):
         try:
             update_data = request.get_json()
             
-            data = load_data()
-            companies = data.get('companies', [])
+            # Actualizar solo los campos enviados (escritura atómica sobre el registro)
+            campos = ['nombre', 'email', 'telefono', 'sector', 'ciudad', 'fecha_contacto', 'notas']
+            cambios = {campo: update_data[campo] for campo in campos if campo in update_data}
+            cambios['updated_at'] = datetime.now().isoformat()
             
-            # Encontrar empresa
-            company_index = next((i for i, c in enumerate(companies) if c.get('id') == company_id), None)
-            if company_index is None:
+            company = store.update('companies', company_id, cambios)
+            if company is None:
                 return jsonify({'success': False, 'error': 'Empresa no encontrada'}), 404
             
-            # Actualizar campos
-            company = companies[company_index]
-            company.update({
-                'nombre': update_data.get('nombre', company.get('nombre', '')),
-                'email': update_data.get('email', company.get('email', '')),
-                'telefono': update_data.get('telefono', company.get('telefono', '')),
-                'sector': update_data.get('sector', company.get('sector', '')),
-                'ciudad': update_data.get('ciudad', company.get('ciudad', '')),
-                'fecha_contacto': update_data.get('fecha_contacto', company.get('fecha_contacto', '')),
-                'notas': update_data.get('notas', company.get('notas', '')),
-                'updated_at': datetime.now().isoformat()
-            })
-            
-            companies[company_index] = company
-            data['companies'] = companies
-            save_data(data)
-            
             # 🔄 SINCRONIZACIÓN CON POSTGRESQL - Protección de datos
             try:
-                from models import db, Company
-                pg_company = Company.query.filter_by(nombre_empresa=company['nombre'].strip()).first()
-                if pg_company:
-                    pg_company.email_contacto = company['email']
-                    pg_company.telefono = company['telefono']
-                    pg_company.sector = company['sector']
-                    pg_company.ciudad = company['ciudad']
-                    pg_company.updated_at = datetime.utcnow()
-                    db.session.commit()
-                    print(f"✅ Empresa {company['nombre']} sincronizada con PostgreSQL")
+                from crm_sync import sync_companies_to_pg
+                result = sync_companies_to_pg([company])
+                if result['synced']:
+                    logger.info("✅ Empresa %s sincronizada con PostgreSQL", company['nombre'])
                 else:
-                    print(f"⚠️ Empresa {company['nombre']} no encontrada en PostgreSQL")
+                    logger.warning("⚠️ Empresa %s no encontrada en PostgreSQL", company['nombre'])
             except Exception as sync_error:
-                print(f"❌ Error sincronizando con PostgreSQL: {sync_error}")
+                db.session.rollback()
+                logger.warning("❌ Error sincronizando con PostgreSQL: %s", sync_error)
                 # No fallar la operación del CRM por errores de sincronización
             
             return jsonify({'success': True, 'company': company})
@@ -286,13 +222,7 @@ def create_minimal_crm_routes(app):
     def delete_company_minimal(company_id):
         """Eliminar empresa"""
         try:
-            data = load_data()
-            companies = data.get('companies', [])
-            
-            # Filtrar empresa a eliminar
-            companies = [c for c in companies if c.get('id') != company_id]
-            data['companies'] = companies
-            save_data(data)
+            store.delete('companies', company_id)
             
             return jsonify({'success': True, 'message': 'Empresa eliminada'})
         except Exception as e:
@@ -302,10 +232,7 @@ def create_minimal_crm_routes(app):
     def clear_companies_minimal():
         """Eliminar todas las empresas"""
         try:
-            data = load_data()
-            count = len(data.get('companies', []))
-            data['companies'] = []
-            save_data(data)
+            count = store.clear('companies')
             
             return jsonify({'success': True, 'message': f'{count} empresas eliminadas'})
         except Exception as e:
@@ -313,42 +240,29 @@ def create_minimal_crm_routes(app):
     
     @app.route('/api/sync/companies', methods=['POST'])
     def sync_companies_manual():
-        """Sincronización manual completa entre CRM y PostgreSQL"""
+        """Sincronización manual entre CRM y PostgreSQL (completa o incremental con ?mode=incremental)"""
         try:
-            from models import db, Company
-            
-            # Obtener datos del CRM
-            data = load_data()
-            crm_companies = data.get('companies', [])
-            
-            # Obtener datos de PostgreSQL
-            pg_companies = Company.query.all()
-            
-            sync_results = []
-            
-            # Sincronizar CRM -> PostgreSQL
-            for crm_company in crm_companies:
-                if crm_company.get('nombre'):
-                    pg_company = Company.query.filter_by(nombre_empresa=crm_company['nombre'].strip()).first()
-                    if pg_company:
-                        # Actualizar PostgreSQL con datos del CRM
-                        pg_company.email_contacto = crm_company.get('email', pg_company.email_contacto)
-                        pg_company.telefono = crm_company.get('telefono', pg_company.telefono)
-                        pg_company.sector = crm_company.get('sector', pg_company.sector)
-                        pg_company.ciudad = crm_company.get('ciudad', pg_company.ciudad)
-                        pg_company.updated_at = datetime.utcnow()
-                        sync_results.append(f"✅ {crm_company['nombre']} → PostgreSQL")
-                    else:
-                        sync_results.append(f"⚠️ {crm_company['nombre']} no encontrada en PostgreSQL")
+            from models import Company
+            from crm_sync import sync_store_companies
             
-            db.session.commit()
+            incremental = request.args.get('mode') == 'incremental'
+            result = sync_store_companies(store, incremental=incremental)
+            
+            sync_results = [f"✅ {nombre} → PostgreSQL" for nombre in result['synced']]
+            sync_results += [f"⚠️ {nombre} no encontrada en PostgreSQL" for nombre in result['missing']]
+            logger.info("🔄 Sincronización %s: %s procesadas, %s actualizadas",
+                        'incremental' if incremental else 'completa', result['processed'], result['updated'])
             
             return jsonify({
                 'success': True, 
                 'message': 'Sincronización completada',
+                'mode': 'incremental' if incremental else 'full',
                 'results': sync_results,
-                'crm_count': len(crm_companies),
-                'pg_count': len(pg_companies)
+                'processed': result['processed'],
+                'updated': result['updated'],
+                'watermark': result['watermark'],
+                'crm_count': store.count('companies'),
+                'pg_count': Company.query.count()
             })
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)}), 500
@@ -430,94 +344,45 @@ def create_minimal_crm_routes(app):
         """API para obtener insights inteligentes para entrenamiento de IA"""
         try:
             from models import db
-            from sqlalchemy import text
-            
-            # Análisis de nivel educativo
-            education_analysis = db.session.execute(text("""
-                SELECT 
-                    CASE 
-                        WHEN LOWER(formacion_academica) LIKE '%primaria%' OR LOWER(formacion_academica) LIKE '%egb%' 
-                             OR formacion_academica = 'No acabé la primaria' THEN 'Educación Primaria'
-                        WHEN LOWER(formacion_academica) LIKE '%eso%' OR LOWER(formacion_academica) LIKE '%bachiller%' 
-                             OR LOWER(formacion_academica) LIKE '%fp%' OR LOWER(formacion_academica) LIKE '%grado medio%' THEN 'Educación Secundaria'
-                        WHEN LOWER(formacion_academica) LIKE '%máster%' OR LOWER(formacion_academica) LIKE '%master%' 
-                             OR LOWER(formacion_academica) LIKE '%universidad%' OR LOWER(formacion_academica) LIKE '%grado%' THEN 'Educación Superior'
-                        WHEN formacion_academica IS NULL OR formacion_academica = '' THEN 'Sin especificar'
-                        ELSE 'Otro'
-                    END as nivel_educativo,
-                    COUNT(*) as total
-                FROM neurodivergent_profiles_new 
-                GROUP BY nivel_educativo
-                ORDER BY total DESC
-            """)).fetchall()
-            
-            # Análisis de experiencia laboral
-            work_experience = db.session.execute(text("""
-                SELECT 
-                    CASE 
-                        WHEN LOWER(experiencia_laboral) LIKE '%ninguna%' OR LOWER(experiencia_laboral) LIKE '%sin experiencia%' THEN 'Sin experiencia'
-                        WHEN experiencia_laboral ~ '[0-9]+.*año' THEN 'Con experiencia (años especificados)'
-                        WHEN LENGTH(experiencia_laboral) > 50 THEN 'Experiencia detallada'
-                        WHEN experiencia_laboral IS NOT NULL AND experiencia_laboral != '' THEN 'Experiencia básica'
-                        ELSE 'Sin especificar'
-                    END as tipo_experiencia,
-                    COUNT(*) as total
-                FROM neurodivergent_profiles_new 
-                GROUP BY tipo_experiencia
-                ORDER BY total DESC
-            """)).fetchall()
-            
-            # Análisis de adaptaciones necesarias
-            adaptations_analysis = db.session.execute(text("""
-                SELECT 
-                    CASE 
-                        WHEN LOWER(adaptaciones_necesarias) LIKE '%ambiente%' OR LOWER(adaptaciones_necesarias) LIKE '%colaborativ%' THEN 'Ambiente de trabajo'
-                        WHEN LOWER(adaptaciones_necesarias) LIKE '%silenc%' OR LOWER(adaptaciones_necesarias) LIKE '%ruido%' THEN 'Control acústico'
-                        WHEN LOWER(adaptaciones_necesarias) LIKE '%música%' OR LOWER(adaptaciones_necesarias) LIKE '%sonido%' THEN 'Estímulos auditivos'
-                        WHEN LOWER(adaptaciones_necesarias) LIKE '%comprens%' OR LOWER(adaptaciones_necesarias) LIKE '%comunic%' THEN 'Comunicación clara'
-                        WHEN adaptaciones_necesarias IS NOT NULL AND adaptaciones_necesarias != '' THEN 'Otras adaptaciones'
-                        ELSE 'Sin adaptaciones específicas'
-                    END as tipo_adaptacion,
-                    COUNT(*) as total
-                FROM neurodivergent_profiles_new 
-                GROUP BY tipo_adaptacion
-                ORDER BY total DESC
-            """)).fetchall()
-            
-            # Análisis de diagnóstico formal vs autodiagnóstico
-            diagnosis_insights = db.session.execute(text("""
-                SELECT 
-                    diagnostico_formal,
-                    tipo_neurodivergencia,
-                    COUNT(*) as total
-                FROM neurodivergent_profiles_new 
-                GROUP BY diagnostico_formal, tipo_neurodivergencia
-                ORDER BY total DESC
-            """)).fetchall()
-            
-            # Estadísticas básicas
-            basic_stats = db.session.execute(text("""
-                SELECT 
-                    COUNT(*) as total_perfiles,
-                    COUNT(CASE WHEN diagnostico_formal = true THEN 1 END) as con_diagnostico_formal,
-                    COUNT(CASE WHEN experiencia_laboral IS NOT NULL AND experiencia_laboral != '' THEN 1 END) as con_experiencia,
-                    COUNT(CASE WHEN adaptaciones_necesarias IS NOT NULL AND adaptaciones_necesarias != '' THEN 1 END) as necesitan_adaptaciones
-                FROM neurodivergent_profiles_new
-            """)).fetchone()
+            from crm_analytics import ensure_profile_stats, profile_insights
             
-            return jsonify({
-                'success': True,
-                'ai_insights': {
-                    'total_perfiles': basic_stats[0] if basic_stats else 0,
-                    'con_diagnostico_formal': basic_stats[1] if basic_stats else 0,
-                    'con_experiencia_laboral': basic_stats[2] if basic_stats else 0,
-                    'necesitan_adaptaciones': basic_stats[3] if basic_stats else 0
-                },
-                'education_levels': [{'nivel': row[0], 'count': row[1]} for row in education_analysis],
-                'work_experience_types': [{'tipo': row[0], 'count': row[1]} for row in work_experience],
-                'adaptation_needs': [{'tipo': row[0], 'count': row[1]} for row in adaptations_analysis],
-                'diagnosis_breakdown': [{'formal': row[0], 'tipo': row[1], 'count': row[2]} for row in diagnosis_insights]
-            })
+            # Contadores mantenidos al escribir cada perfil (crm_analytics)
+            ensure_profile_stats(db)
+            return jsonify({'success': True, **profile_insights(db.session)})
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    @app.route('/api/neurodivergent/dashboard')
+    def get_neurodivergent_dashboard():
+        """Todos los widgets de dashboard-neurodivergentes en una respuesta (caché corta, ?refresh=1 la salta)"""
+        try:
+            from models import db
+            from crm_analytics import dashboard_bundle
+            from crm_queries import parse_bool, make_etag, not_modified, with_validators
+            
+            data, cached = dashboard_bundle(db, refresh=bool(parse_bool(request.args.get('refresh'))))
+            # Mismo bundle en caché -> mismo ETag: el navegador revalida con un 304
+            etag = make_etag(request, data['generated_at'])
+            respuesta_304 = not_modified(request, etag)
+            if respuesta_304:
+                return respuesta_304
+            return with_validators(jsonify({'success': True, 'cached': cached, **data}), etag)
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    @app.route('/api/neurodivergent/analytics/rebuild', methods=['POST'])
+    def rebuild_neurodivergent_analytics():
+        """Recalcular columnas derivadas y contadores de perfiles (tras cargas por SQL directo o cambios de alias)"""
+        if not is_admin():
+            return jsonify({'success': False, 'error': 'Acceso no autorizado'}), 403
+        try:
+            from models import db
+            from crm_analytics import rebuild_all
+            
+            result = rebuild_all(db)
+            audit('analytics_rebuild', **result)
+            return jsonify({'success': True, **result})
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)}), 500
     
@@ -532,56 +397,28 @@ def create_minimal_crm_routes(app):
             if file.filename == '':
                 return jsonify({'success': False, 'error': 'No se seleccionó archivo'})
             
-            # Leer CSV con formato específico
-            content = file.stream.read().decode("UTF8")
-            stream = io.StringIO(content, newline=None)
-            reader = csv.DictReader(stream)
+            try:
+                chunk_size = int(request.form.get('chunk_size') or IMPORT_CHUNK_SIZE)
+            except ValueError:
+                return jsonify({'success': False, 'error': 'chunk_size debe ser un número'}), 400
+            chunk_size = max(1, chunk_size)
             
-            data = load_data()
-            companies = data.get('companies', [])
+            # Decodificar la subida por líneas (sin cargarla entera en memoria)
+            reader = csv.DictReader(codecs.iterdecode(file.stream, 'utf-8-sig'))
+            counts = {'skipped': 0}
             
             created = 0
-            skipped = 0
-            
-            for row in reader:
-                # Mapear columnas específicas del CSV de DiversIA
-                empresa = row.get('Empresa', '').strip()
-                email = row.get('Email', '').strip()
-                telefono = row.get('Telefono', '').strip()
-                sector = row.get('Sector', '').strip()
-                ciudad = row.get('Ciudad', '').strip()
-                fecha = row.get('Fecha', '').strip()
-                acciones = row.get('Acciones', '').strip()
-                
-                # Validar que tenga al menos empresa
-                if not empresa:
-                    skipped += 1
-                    continue
-                
-                # Limpiar email si tiene formato mailto:
-                if email.startswith('mailto:'):
-                    email = email.replace('mailto:', '')
-                
-                # Generar ID único
-                new_id = max([c.get('id', 0) for c in companies], default=0) + 1
-                
-                new_company = {
-                    'id': new_id,
-                    'nombre': empresa,
-                    'email': email,
-                    'telefono': telefono,
-                    'sector': sector,
-                    'ciudad': ciudad,
-                    'fecha_contacto': fecha,
-                    'notas': acciones,
-                    'created_at': datetime.now().isoformat()
-                }
-                
-                companies.append(new_company)
-                created += 1
-            
-            data['companies'] = companies
-            save_data(data)
+            started = time.perf_counter()
+            for chunk in _chunks(_csv_companies(reader, counts), chunk_size):
+                # Cada lote se guarda de forma atómica con ids consecutivos
+                store.insert_many('companies', chunk)
+                created += len(chunk)
+                elapsed = time.perf_counter() - started
+                logger.info("📥 Importación CSV: %s empresas (%.0f filas/s)", created, created / elapsed)
+            
+            elapsed = time.perf_counter() - started
+            skipped = counts['skipped']
+            rows_per_second = round((created + skipped) / elapsed, 1) if elapsed else 0
             
             message = f'Importación completada: {created} empresas creadas'
             if skipped > 0:
@@ -591,7 +428,9 @@ def create_minimal_crm_routes(app):
                 'success': True,
                 'message': message,
                 'created': created,
-                'skipped': skipped
+                'skipped': skipped,
+                'chunk_size': chunk_size,
+                'rows_per_second': rows_per_second
             })
             
         except Exception as e:
@@ -604,8 +443,7 @@ def create_minimal_crm_routes(app):
         try:
             from flask import make_response
             
-            data = load_data()
-            companies = data.get('companies', [])
+            companies = store.all('companies')
             
             if not companies:
                 return jsonify({'success': False, 'error': 'No hay datos para exportar'})
@@ -640,114 +478,211 @@ def create_minimal_crm_routes(app):
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)}), 500
     
+    # ==================== EXPORTACIONES EN SEGUNDO PLANO ====================
+    
+    from export_jobs import ExportJobs, ExportBusy
+    exports = ExportJobs(app)
+    
+    @app.route('/api/exports', methods=['POST'])
+    def create_export_job():
+        """Crear una exportación CSV: {"type": "leads|companies|asociaciones|email_marketing|colaboradores", "params": {...}}"""
+        try:
+            data = request.get_json(silent=True) or {}
+            kind = data.get('type')
+            if kind == 'colaboradores' and not session.get('admin_ok'):
+                return jsonify({'success': False, 'error': 'Acceso no autorizado'}), 403
+            
+            try:
+                job = exports.submit(kind, data.get('params'))
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            except ExportBusy as e:
+                response = jsonify({'success': False, 'error': str(e)})
+                response.headers['Retry-After'] = '5'
+                return response, 429
+            
+            response = jsonify({'success': True, 'job': job})
+            response.headers['Location'] = f"/api/exports/{job['id']}"
+            return response, 202
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    @app.route('/api/exports/<job_id>')
+    def get_export_job(job_id):
+        """Estado y progreso de una exportación"""
+        job = exports.status(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Exportación no encontrada'}), 404
+        return jsonify({'success': True, 'job': job})
+    
+    @app.route('/api/exports/<job_id>/download')
+    def download_export_job(job_id):
+        """Descargar el CSV comprimido de una exportación terminada"""
+        from flask import send_file
+        
+        job = exports.status(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Exportación no encontrada'}), 404
+        if job['state'] != 'done':
+            return jsonify({'success': False, 'error': f"La exportación está en estado {job['state']}", 'job': job}), 409
+        return send_file(os.path.abspath(exports.artifact_path(job_id)), mimetype='application/gzip',
+                         as_attachment=True, download_name=job['filename'])
+    
     # ==================== RUTAS PARA USUARIOS NEURODIVERGENTES ====================
     
+    # Columnas cortas para listados; el texto largo solo se pide en el detalle o con ?fields=
+    PROFILE_LIST_FIELDS = ['id', 'nombre', 'apellidos', 'email', 'ciudad',
+                           'tipo_neurodivergencia', 'diagnostico_formal', 'created_at']
+    
+    def profile_detail(profile):
+        """Perfil completo; los campos específicos guardados como JSON se añaden al primer nivel"""
+        from crm_queries import row_to_dict
+        data = row_to_dict(profile, [c.key for c in profile.__table__.columns if c.key != 'campos_especificos'])
+        try:
+            especificos = json.loads(profile.campos_especificos) if profile.campos_especificos else {}
+        except (ValueError, TypeError):
+            especificos = {}
+        if isinstance(especificos, dict):
+            for campo, valor in especificos.items():
+                data.setdefault(campo, valor)
+        return data
+    
     @app.route('/api/neurodivergent-profiles')
     def get_neurodivergent_profiles():
-        """Obtener todos los perfiles neurodivergentes detallados de la base de datos"""
+        """Perfiles neurodivergentes paginados por (created_at, id)
+
+        Parámetros: fields=a,b,c (o 'all'), limit, cursor, tipo_neurodivergencia, ciudad, stream=ndjson|json
+        """
+        try:
+            from models import NeurodivergentProfile
+            from crm_queries import parse_fields, parse_limit, keyset_sorted_page, row_to_dict, stream_format, stream_query
+            
+            try:
+                fields = parse_fields(request.args.get('fields'), NeurodivergentProfile,
+                                      PROFILE_LIST_FIELDS, required=('id', 'created_at'))
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            
+            # Consulta de columnas: filas ligeras, sin objetos ORM en el identity map
+            query = db.session.query(*[getattr(NeurodivergentProfile, f) for f in fields])
+            if request.args.get('tipo_neurodivergencia'):
+                query = query.filter(NeurodivergentProfile.tipo_neurodivergencia == request.args['tipo_neurodivergencia'])
+            if request.args.get('ciudad'):
+                query = query.filter(NeurodivergentProfile.ciudad == request.args['ciudad'])
+            
+            fmt = stream_format(request)
+            if fmt:
+                query = query.order_by(NeurodivergentProfile.created_at.desc(), NeurodivergentProfile.id.desc())
+                return stream_query(query, lambda row: row_to_dict(row, fields), fmt)
+            
+            cursor = request.args.get('cursor')
+            try:
+                rows, next_cursor = keyset_sorted_page(
+                    query, NeurodivergentProfile.created_at, NeurodivergentProfile.id,
+                    cursor=cursor, limit=parse_limit(request.args), descending=True
+                )
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            
+            response = {
+                'success': True,
+                'profiles': [row_to_dict(row, fields) for row in rows],
+                'fields': fields,
+                'next_cursor': next_cursor
+            }
+            if not cursor:
+                response['total'] = query.order_by(None).count()
+            return jsonify(response)
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    @app.route('/api/neurodivergent-profiles/<int:profile_id>')
+    def get_neurodivergent_profile(profile_id):
+        """Detalle completo de un perfil (incluye los campos de texto largos)"""
         try:
             from models import NeurodivergentProfile
-            from app import db
             
-            profiles = NeurodivergentProfile.query.all()
-            
-            profiles_data = []
-            for profile in profiles:
-                profiles_data.append({
-                    'id': profile.id,
-                    'nombre': profile.nombre,
-                    'apellidos': profile.apellidos,
-                    'email': profile.email,
-                    'telefono': profile.telefono,
-                    'ciudad': profile.ciudad,
-                    'fecha_nacimiento': profile.fecha_nacimiento.isoformat() if profile.fecha_nacimiento else None,
-                    'tipo_neurodivergencia': profile.tipo_neurodivergencia,
-                    'diagnostico_formal': profile.diagnostico_formal,
-                    'habilidades': profile.habilidades,
-                    'experiencia_laboral': profile.experiencia_laboral,
-                    'formacion_academica': profile.formacion_academica,
-                    'intereses_laborales': profile.intereses_laborales,
-                    'adaptaciones_necesarias': profile.adaptaciones_necesarias,
-                    'motivaciones': profile.motivaciones,
-                    # Campos específicos TDAH
-                    'tipo_tdah': profile.tipo_tdah,
-                    'nivel_atencion': profile.nivel_atencion,
-                    'impulsividad': profile.impulsividad,
-                    'hiperactividad': profile.hiperactividad,
-                    'medicacion': profile.medicacion,
-                    'medicacion_actual': profile.medicacion_actual,
-                    'dosis_medicacion': profile.dosis_medicacion,
-                    'efectos_secundarios': profile.efectos_secundarios,
-                    'estrategias_organizacion': profile.estrategias_organizacion,
-                    # Campos específicos TEA
-                    'nivel_comunicacion': profile.nivel_comunicacion,
-                    'sensibilidades': profile.sensibilidades,
-                    'rutinas_importantes': profile.rutinas_importantes,
-                    'intereses_especiales': profile.intereses_especiales,
-                    'dificultades_sociales': profile.dificultades_sociales,
-                    # Campos específicos Dislexia
-                    'areas_dificultad': profile.areas_dificultad,
-                    'herramientas_apoyo': profile.herramientas_apoyo,
-                    'estrategias_lectura': profile.estrategias_lectura,
-                    'created_at': profile.created_at.isoformat() if profile.created_at else None
-                })
-            
-            return jsonify(profiles_data)
+            profile = db.session.get(NeurodivergentProfile, profile_id)
+            if profile is None:
+                return jsonify({'success': False, 'error': 'Perfil no encontrado'}), 404
+            
+            return jsonify({'success': True, 'profile': profile_detail(profile)})
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)}), 500
 
+    # ==================== BÚSQUEDA DE CANDIDATOS ====================
+
+    @app.route('/api/search/candidates')
+    def search_candidates_api():
+        """Búsqueda de texto completo: ?q=python react&source=profiles,leads&tipo_neurodivergencia=&ciudad=&page=1&limit=20"""
+        try:
+            from crm_queries import parse_limit
+            from crm_search import search_candidates
+
+            q = (request.args.get('q') or '').strip()
+            if not q:
+                return jsonify({'success': False, 'error': 'Parámetro q requerido'}), 400
+            sources = [s.strip() for s in request.args.get('source', 'profiles,leads').split(',') if s.strip()]
+            page = max(1, request.args.get('page', 1, type=int))
+            filters = {
+                'tipo_neurodivergencia': request.args.get('tipo_neurodivergencia'),
+                'ciudad': request.args.get('ciudad')
+            }
+
+            try:
+                result = search_candidates(db, q, sources, filters, limit=parse_limit(request.args, default=20, maximum=100), page=page)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+
+            return jsonify(dict(result, success=True, query=q))
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/api/search/typeahead')
+    def typeahead_api():
+        """Autocompletado aproximado: ?q=claramunt&types=lead,profile,company,asociacion,email_marketing&k=10"""
+        try:
+            from crm_search import typeahead
+
+            types = [t.strip() for t in request.args.get('types', '').split(',') if t.strip()]
+            k = max(1, min(request.args.get('k', 10, type=int), 50))
+            try:
+                result = typeahead(db, request.args.get('q', ''), types or None, k=k)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+
+            return jsonify(dict(result, success=True))
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
+
     # ==================== MIGRACIÓN DE USUARIOS LEGACY A LEADS ====================
     
     @app.route('/api/migrate-users-to-leads', methods=['POST'])
     def migrate_users_to_leads():
-        """Migrar usuarios de la tabla User legacy a GeneralLead"""
+        """Migrar usuarios de la tabla User legacy a GeneralLead (?dry_run=1 solo cuenta, ?batch_size=N)"""
         try:
-            from models import User, NeurodivergentProfile, GeneralLead
             from app import db
+            from crm_queries import migrate_legacy_users, parse_bool, BULK_CHUNK_SIZE
             
-            # Obtener todos los usuarios de la tabla legacy
-            usuarios_legacy = User.query.all()
-            migrados = 0
+            data = request.get_json(silent=True) or {}
+            try:
+                dry_run = bool(parse_bool(request.args.get('dry_run', data.get('dry_run'))))
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            batch_size = max(1, request.args.get('batch_size', data.get('batch_size', BULK_CHUNK_SIZE), type=int))
             
-            for usuario in usuarios_legacy:
-                # Verificar si ya existe en GeneralLead
-                lead_existente = GeneralLead.query.filter_by(email=usuario.email).first()
-                
-                if not lead_existente:
-                    # Migrar a GeneralLead
-                    nuevo_lead = GeneralLead(
-                        nombre=usuario.nombre,
-                        apellidos=usuario.apellidos,
-                        email=usuario.email,
-                        telefono=usuario.telefono,
-                        ciudad=usuario.ciudad,
-                        fecha_nacimiento=usuario.fecha_nacimiento,
-                        tipo_neurodivergencia=usuario.tipo_neurodivergencia,
-                        diagnostico_formal=usuario.diagnostico_formal,
-                        habilidades=usuario.habilidades,
-                        experiencia_laboral=usuario.experiencia_laboral,
-                        formacion_academica=usuario.formacion_academica,
-                        intereses_laborales=usuario.intereses_laborales,
-                        adaptaciones_necesarias=usuario.adaptaciones_necesarias,
-                        motivaciones=usuario.motivaciones,
-                        convertido_a_perfil=False,  # Viene del test general
-                        created_at=usuario.created_at,
-                        updated_at=usuario.updated_at
-                    )
-                    
-                    db.session.add(nuevo_lead)
-                    migrados += 1
-            
-            # Limpiar tabla legacy después de migrar
-            if migrados > 0:
-                db.session.query(User).delete()
-                db.session.commit()
-                
-            return jsonify({
-                'success': True, 
-                'message': f'Migrados {migrados} usuarios de legacy a leads generales',
-                'migrados': migrados
-            })
+            # INSERT ... SELECT por lotes: unas pocas sentencias en lugar de 2 por usuario
+            resultado = migrate_legacy_users(db, batch_size=batch_size, dry_run=dry_run)
+            
+            if dry_run:
+                mensaje = f"Se migrarían {resultado['migrados']} de {resultado['total']} usuarios legacy ({resultado['existentes']} ya son leads)"
+            else:
+                mensaje = f"Migrados {resultado['migrados']} usuarios de legacy a leads generales"
+                audit("🔄 %s en %s lotes (%s ya existían)", mensaje, resultado['lotes'], resultado['existentes'])
+            
+            return jsonify(dict(resultado, success=True, message=mensaje))
             
         except Exception as e:
             try:
@@ -759,38 +694,126 @@ def create_minimal_crm_routes(app):
 
     # ==================== RUTAS PARA LEADS GENERALES (TEST "HAZ MI TEST") ====================
     
+    def lead_to_dict(lead):
+        """Lead completo para el CRM"""
+        return {
+            'id': lead.id,
+            'nombre': lead.nombre,
+            'apellidos': lead.apellidos,
+            'email': lead.email,
+            'telefono': lead.telefono,
+            'ciudad': lead.ciudad,
+            'fecha_nacimiento': lead.fecha_nacimiento.isoformat() if lead.fecha_nacimiento else None,
+            'tipo_neurodivergencia': lead.tipo_neurodivergencia,
+            'diagnostico_formal': lead.diagnostico_formal,
+            'habilidades': lead.habilidades,
+            'experiencia_laboral': lead.experiencia_laboral,
+            'formacion_academica': lead.formacion_academica,
+            'intereses_laborales': lead.intereses_laborales,
+            'adaptaciones_necesarias': lead.adaptaciones_necesarias,
+            'motivaciones': lead.motivaciones,
+            'convertido_a_perfil': lead.convertido_a_perfil,
+            'created_at': lead.created_at.isoformat() if lead.created_at else None
+        }
+    
     @app.route('/api/leads-generales')
     def get_leads_generales():
-        """Obtener todos los leads del test general"""
+        """Leads del test general paginados en servidor
+
+        Parámetros: limit, cursor, sort (created_at|id|email|ciudad|tipo_neurodivergencia), order (asc|desc),
+        ciudad, tipo_neurodivergencia, convertido_a_perfil, origen, q, desde, hasta.
+        Con Accept: application/x-ndjson o ?stream=ndjson|json se envían todos los resultados en streaming.
+        """
         try:
             from models import GeneralLead
-            from app import db
-            
-            leads = GeneralLead.query.all()
+            from sqlalchemy import case, func, or_
+            from crm_queries import (parse_limit, keyset_sorted_page, parse_bool, parse_datetime, stream_format,
+                                     stream_query, table_validator, make_etag, not_modified, with_validators)
+            
+            # Validador barato antes de leer filas; el día entra en el ETag porque las stats son relativas a hoy
+            fmt = stream_format(request)
+            ultimo_cambio, total_filas = table_validator(GeneralLead)
+            etag = make_etag(request, fmt, ultimo_cambio, total_filas, datetime.utcnow().date())
+            cached = not_modified(request, etag)
+            if cached:
+                return cached
+            
+            args = request.args
+            # Solo se ordena por columnas con índice
+            columnas_orden = {
+                'created_at': GeneralLead.created_at,
+                'id': GeneralLead.id,
+                'email': GeneralLead.email,
+                'ciudad': GeneralLead.ciudad,
+                'tipo_neurodivergencia': GeneralLead.tipo_neurodivergencia
+            }
+            sort = args.get('sort', 'created_at')
+            if sort not in columnas_orden:
+                return jsonify({'success': False, 'error': f'Orden no soportado: {sort}'}), 400
+            descending = args.get('order', 'desc') != 'asc'
             
-            leads_data = []
-            for lead in leads:
-                leads_data.append({
-                    'id': lead.id,
-                    'nombre': lead.nombre,
-                    'apellidos': lead.apellidos,
-                    'email': lead.email,
-                    'telefono': lead.telefono,
-                    'ciudad': lead.ciudad,
-                    'fecha_nacimiento': lead.fecha_nacimiento.isoformat() if lead.fecha_nacimiento else None,
-                    'tipo_neurodivergencia': lead.tipo_neurodivergencia,
-                    'diagnostico_formal': lead.diagnostico_formal,
-                    'habilidades': lead.habilidades,
-                    'experiencia_laboral': lead.experiencia_laboral,
-                    'formacion_academica': lead.formacion_academica,
-                    'intereses_laborales': lead.intereses_laborales,
-                    'adaptaciones_necesarias': lead.adaptaciones_necesarias,
-                    'motivaciones': lead.motivaciones,
-                    'convertido_a_perfil': lead.convertido_a_perfil,
-                    'created_at': lead.created_at.isoformat() if lead.created_at else None
-                })
-            
-            return jsonify(leads_data)
+            try:
+                convertido = parse_bool(args.get('convertido_a_perfil'))
+                desde = parse_datetime(args.get('desde'))
+                hasta = parse_datetime(args.get('hasta'), end_of_day=True)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            
+            query = GeneralLead.query
+            if args.get('ciudad'):
+                query = query.filter(GeneralLead.ciudad == args['ciudad'])
+            if args.get('tipo_neurodivergencia'):
+                query = query.filter(GeneralLead.tipo_neurodivergencia == args['tipo_neurodivergencia'])
+            if convertido is not None:
+                query = query.filter(GeneralLead.convertido_a_perfil == convertido)
+            if args.get('origen'):
+                query = query.filter(GeneralLead.motivaciones == args['origen'])
+            if desde:
+                query = query.filter(GeneralLead.created_at >= desde)
+            if hasta:
+                query = query.filter(GeneralLead.created_at <= hasta)
+            if args.get('q'):
+                patron = f"%{args['q'].strip()}%"
+                query = query.filter(or_(
+                    GeneralLead.nombre.ilike(patron),
+                    GeneralLead.apellidos.ilike(patron),
+                    GeneralLead.email.ilike(patron)
+                ))
+            
+            if fmt:
+                columna = columnas_orden[sort]
+                orden = [columna.desc(), GeneralLead.id.desc()] if descending else [columna.asc(), GeneralLead.id.asc()]
+                return with_validators(stream_query(query.order_by(*orden), lead_to_dict, fmt), etag, ultimo_cambio)
+            
+            cursor = args.get('cursor')
+            try:
+                leads, next_cursor = keyset_sorted_page(
+                    query, columnas_orden[sort], GeneralLead.id,
+                    cursor=cursor, limit=parse_limit(args), descending=descending
+                )
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            
+            leads_data = [lead_to_dict(lead) for lead in leads]
+            
+            response = {'success': True, 'leads': leads_data, 'next_cursor': next_cursor}
+            
+            # Metadatos de totales solo en la primera página (el cliente los conserva al paginar)
+            if not cursor:
+                response['total'] = query.order_by(None).count()
+                ahora = datetime.utcnow()
+                hoy = ahora.replace(hour=0, minute=0, second=0, microsecond=0)
+                semana = hoy - timedelta(days=7)
+                mes = hoy - timedelta(days=30)
+                fila = db.session.query(
+                    func.count(GeneralLead.id),
+                    func.count(case((GeneralLead.created_at >= hoy, 1))),
+                    func.count(case((GeneralLead.created_at >= semana, 1))),
+                    func.count(case((GeneralLead.created_at >= mes, 1)))
+                ).one()
+                response['stats'] = {'total': fila[0], 'hoy': fila[1], 'semana': fila[2], 'mes': fila[3]}
+            
+            return with_validators(jsonify(response), etag, ultimo_cambio)
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)}), 500
     
@@ -893,7 +916,7 @@ def create_minimal_crm_routes(app):
             }
             
             # Log de auditoría (aquí podrías guardar en otra tabla)
-            print(f"🗑️ ELIMINACIÓN DE LEAD - ID: {lead_id}, Usuario: {lead.nombre} {lead.apellidos}, Email: {lead.email}")
+            audit("🗑️ ELIMINACIÓN DE LEAD - ID: %s, Usuario: %s %s, Email: %s", lead_id, lead.nombre, lead.apellidos, lead.email)
             
             db.session.delete(lead)
             db.session.commit()
@@ -915,8 +938,9 @@ def create_minimal_crm_routes(app):
     def bulk_delete_leads():
         """Eliminar múltiples leads seleccionados - CON PROTECCIÓN DE DATOS AVANZADA"""
         try:
-            from models import GeneralLead
+            from models import GeneralLead, GeneralLeadArchive
             from app import db
+            from crm_queries import archive_rows
             
             data = request.get_json()
             lead_ids = data.get('lead_ids', [])
@@ -942,35 +966,24 @@ def create_minimal_crm_routes(app):
                     'count': len(lead_ids)
                 }), 400
             
-            # Crear backup de los datos antes de eliminar
-            leads_to_delete = GeneralLead.query.filter(GeneralLead.id.in_(lead_ids)).all()
-            backup_data = []
-            
-            for lead in leads_to_delete:
-                backup_data.append({
-                    'id': lead.id,
-                    'nombre': lead.nombre,
-                    'apellidos': lead.apellidos,
-                    'email': lead.email,
-                    'tipo_neurodivergencia': lead.tipo_neurodivergencia,
-                    'deleted_at': datetime.now().isoformat()
-                })
-            
-            # Log de auditoría completo
-            print(f"🗑️ ELIMINACIÓN MASIVA - {len(lead_ids)} leads eliminados:")
-            for lead in leads_to_delete:
-                print(f"   - ID: {lead.id}, Usuario: {lead.nombre} {lead.apellidos}, Email: {lead.email}")
-            
-            # Eliminar leads seleccionados
-            deleted_count = GeneralLead.query.filter(GeneralLead.id.in_(lead_ids)).delete(synchronize_session=False)
-            db.session.commit()
+            try:
+                lead_ids = [int(lead_id) for lead_id in lead_ids]
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'error': 'lead_ids debe ser una lista de ids numéricos'}), 400
+            
+            # Las filas se mueven a general_leads_archive en la base de datos (por trozos, sin cargar objetos ORM)
+            archived_count = archive_rows(db, GeneralLead, GeneralLeadArchive, lead_ids, reason='bulk-delete',
+                                          tag_source='lead')
+            
+            # Log de auditoría (el detalle de cada lead queda en la tabla de archivo)
+            audit("🗑️ ELIMINACIÓN MASIVA - %s de %s leads archivados en general_leads_archive", archived_count, len(lead_ids))
             
             return jsonify({
                 'success': True, 
-                'message': f'{deleted_count} leads eliminados correctamente',
-                'deleted_count': deleted_count,
+                'message': f'{archived_count} leads eliminados correctamente',
+                'deleted_count': archived_count,
                 'backup_created': True,
-                'backup_count': len(backup_data)
+                'backup_count': archived_count
             })
         except Exception as e:
             try:
@@ -1103,12 +1116,56 @@ def create_minimal_crm_routes(app):
 
     # ==================== APIS SEPARADAS POR TIPO DE USUARIO ====================""
     
+    def usuario_nd_dict(profile, fuente):
+        """Usuario ND del listado del CRM a partir de un NeurodivergentProfile"""
+        return {
+            'id': f'profile_{profile.id}',
+            'fuente': fuente,
+            'nombre': profile.nombre,
+            'apellidos': profile.apellidos,
+            'nombre_completo': f"{profile.nombre} {profile.apellidos}",
+            'email': profile.email,
+            'telefono': profile.telefono,
+            'ciudad': profile.ciudad,
+            'fecha_nacimiento': profile.fecha_nacimiento.isoformat() if profile.fecha_nacimiento else None,
+            'tipo_neurodivergencia': profile.tipo_neurodivergencia,
+            'diagnostico_formal': profile.diagnostico_formal,
+            'habilidades': profile.habilidades,
+            'experiencia_laboral': profile.experiencia_laboral,
+            'formacion_academica': profile.formacion_academica,
+            'intereses_laborales': profile.intereses_laborales,
+            'adaptaciones_necesarias': profile.adaptaciones_necesarias,
+            'motivaciones': profile.motivaciones,
+            'created_at': profile.created_at.isoformat() if profile.created_at else None
+        }
+    
     @app.route('/api/usuarios-neurodivergentes')
     def get_usuarios_neurodivergentes():
         """Obtener SOLO usuarios de formularios específicos ND (NeurodivergentProfile)"""
         try:
             from models import NeurodivergentProfile
             from app import db
+            from crm_queries import stream_format, stream_query, table_validator, make_etag, not_modified, with_validators
+            
+            fmt = stream_format(request)
+            # Validador (max(updated_at), count): si no ha cambiado nada se responde 304 sin leer perfiles
+            etag = ultimo_cambio = None
+            try:
+                ultimo_cambio, total_filas = table_validator(NeurodivergentProfile)
+                etag = make_etag(request, fmt, ultimo_cambio, total_filas)
+            except Exception as e:
+                logger.warning("⚠️ Error calculando validador de perfiles ND: %s", e)
+                db.session.rollback()
+            if etag:
+                cached = not_modified(request, etag)
+                if cached:
+                    return cached
+            
+            # Streaming opcional (Accept: application/x-ndjson o ?stream=ndjson|json)
+            if fmt:
+                query = NeurodivergentProfile.query.order_by(NeurodivergentProfile.id)
+                response = stream_query(query, lambda profile: usuario_nd_dict(profile, 'NeurodivergentProfile (formulario específico)'), fmt)
+                return with_validators(response, etag, ultimo_cambio) if etag else response
             
             usuarios_data = []
             
@@ -1117,28 +1174,11 @@ def create_minimal_crm_routes(app):
                 usuarios_profile = NeurodivergentProfile.query.all()
                 # Procesar perfiles neurodivergentes
                 for profile in usuarios_profile:
-                    usuarios_data.append({
-                        'id': f'profile_{profile.id}',
-                        'fuente': 'NeurodivergentProfile (formulario específico)',
-                        'nombre': profile.nombre,
-                        'apellidos': profile.apellidos,
-                        'nombre_completo': f"{profile.nombre} {profile.apellidos}",
-                        'email': profile.email,
-                        'telefono': profile.telefono,
-                        'ciudad': profile.ciudad,
-                        'fecha_nacimiento': profile.fecha_nacimiento.isoformat() if profile.fecha_nacimiento else None,
-                        'tipo_neurodivergencia': profile.tipo_neurodivergencia,
-                        'diagnostico_formal': profile.diagnostico_formal,
-                        'habilidades': profile.habilidades,
-                        'experiencia_laboral': profile.experiencia_laboral,
-                        'formacion_academica': profile.formacion_academica,
-                        'intereses_laborales': profile.intereses_laborales,
-                        'adaptaciones_necesarias': profile.adaptaciones_necesarias,
-                        'motivaciones': profile.motivaciones,
-                        'created_at': profile.created_at.isoformat() if profile.created_at else None
-                    })
+                    usuarios_data.append(usuario_nd_dict(profile, 'NeurodivergentProfile (formulario específico)'))
             except Exception as e:
-                print(f"⚠️ Error cargando perfiles ND específicos: {e}")
+                logger.warning("⚠️ Error cargando perfiles ND específicos: %s", e)
+                # Los datos de respaldo no deben quedar cacheados en el cliente
+                etag = None
                 # Intentar reconexión automática
                 try:
                     from app import db
@@ -1147,29 +1187,10 @@ def create_minimal_crm_routes(app):
                     # Reintentar una vez más
                     usuarios_profile = NeurodivergentProfile.query.all()
                     for profile in usuarios_profile:
-                        usuarios_data.append({
-                            'id': f'profile_{profile.id}',
-                            'fuente': 'NeurodivergentProfile (reconectado)',
-                            'nombre': profile.nombre,
-                            'apellidos': profile.apellidos,
-                            'nombre_completo': f"{profile.nombre} {profile.apellidos}",
-                            'email': profile.email,
-                            'telefono': profile.telefono,
-                            'ciudad': profile.ciudad,
-                            'fecha_nacimiento': profile.fecha_nacimiento.isoformat() if profile.fecha_nacimiento else None,
-                            'tipo_neurodivergencia': profile.tipo_neurodivergencia,
-                            'diagnostico_formal': profile.diagnostico_formal,
-                            'habilidades': profile.habilidades,
-                            'experiencia_laboral': profile.experiencia_laboral,
-                            'formacion_academica': profile.formacion_academica,
-                            'intereses_laborales': profile.intereses_laborales,
-                            'adaptaciones_necesarias': profile.adaptaciones_necesarias,
-                            'motivaciones': profile.motivaciones,
-                            'created_at': profile.created_at.isoformat() if profile.created_at else None
-                        })
-                    print("✅ Reconexión exitosa a base de datos")
+                        usuarios_data.append(usuario_nd_dict(profile, 'NeurodivergentProfile (reconectado)'))
+                    logger.info("✅ Reconexión exitosa a base de datos")
                 except Exception as e2:
-                    print(f"⚠️ Reconexión falló, usando datos demo: {e2}")
+                    logger.warning("⚠️ Reconexión falló, usando datos demo: %s", e2)
                     # En caso de error de DB persistente, devolver datos demo para pruebas
                 usuarios_data = [
                     {
@@ -1214,6 +1235,8 @@ def create_minimal_crm_routes(app):
                     }
                 ]
             
+            if etag:
+                return with_validators(jsonify(usuarios_data), etag, ultimo_cambio)
             return jsonify(usuarios_data)
             
         except Exception as e:
@@ -1242,73 +1265,62 @@ def create_minimal_crm_routes(app):
 
     # ==================== RUTAS PARA USUARIOS GENERALES (LEGACY) ====================""
     
+    # Columnas cortas del listado de usuarios unificados
+    USUARIOS_LIST_FIELDS = ['uid', 'source', 'nombre', 'apellidos', 'email', 'ciudad',
+                            'tipo_neurodivergencia', 'diagnostico_formal', 'created_at']
+    
     @app.route('/api/usuarios')
     def get_usuarios():
-        """Obtener TODOS los usuarios neurodivergentes (tabla User + nuevos perfiles)"""
+        """Usuarios ND de todas las fuentes (vista usuarios_unificados), paginados y filtrables
+
+        Parámetros: fields, limit, cursor, source (user|profile), email, tipo_neurodivergencia, ciudad, desde, hasta,
+        stream=ndjson|json (o Accept: application/x-ndjson)
+        """
         try:
-            from models import User, NeurodivergentProfile
-            from app import db
+            from db_schema import usuarios_unificados as vista
+            from crm_queries import parse_fields, parse_limit, keyset_sorted_page, parse_datetime, row_to_dict, stream_format, stream_query
             
-            usuarios_data = []
-            
-            # 1. Obtener usuarios de la tabla User original
+            args = request.args
             try:
-                usuarios_user = User.query.all()
-                for user in usuarios_user:
-                    usuarios_data.append({
-                        'id': f'user_{user.id}',
-                        'fuente': 'User (original)',
-                        'nombre': user.nombre,
-                        'apellidos': user.apellidos,
-                        'email': user.email,
-                        'telefono': user.telefono,
-                        'ciudad': user.ciudad,
-                        'fecha_nacimiento': user.fecha_nacimiento.isoformat() if user.fecha_nacimiento else None,
-                        'tipo_neurodivergencia': user.tipo_neurodivergencia,
-                        'diagnostico_formal': user.diagnostico_formal,
-                        'habilidades': user.habilidades,
-                        'experiencia_laboral': user.experiencia_laboral,
-                        'formacion_academica': user.formacion_academica,
-                        'intereses_laborales': user.intereses_laborales,
-                        'adaptaciones_necesarias': user.adaptaciones_necesarias,
-                        'motivaciones': user.motivaciones,
-                        'created_at': user.created_at.isoformat() if user.created_at else None
-                    })
-            except Exception as e:
-                print(f"⚠️ Error cargando tabla User: {e}")
-            
-            # 2. Obtener usuarios de la tabla NeurodivergentProfile nueva  
+                fields = parse_fields(args.get('fields'), vista, USUARIOS_LIST_FIELDS,
+                                      required=('uid', 'created_at'))
+                desde = parse_datetime(args.get('desde'))
+                hasta = parse_datetime(args.get('hasta'), end_of_day=True)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            
+            query = db.session.query(*[vista.c[f] for f in fields])
+            for filtro in ('source', 'email', 'tipo_neurodivergencia', 'ciudad'):
+                if args.get(filtro):
+                    query = query.filter(vista.c[filtro] == args[filtro])
+            if desde:
+                query = query.filter(vista.c.created_at >= desde)
+            if hasta:
+                query = query.filter(vista.c.created_at <= hasta)
+            
+            fmt = stream_format(request)
+            if fmt:
+                query = query.order_by(vista.c.created_at.desc(), vista.c.uid.desc())
+                return stream_query(query, lambda row: row_to_dict(row, fields), fmt)
+            
+            cursor = args.get('cursor')
             try:
-                usuarios_profile = NeurodivergentProfile.query.all()
-                print(f"🔍 CRM - Encontrados {len(usuarios_profile)} perfiles neurodivergentes")
-                
-                for profile in usuarios_profile:
-                    print(f"📋 CRM - Perfil: {profile.nombre} {profile.apellidos} ({profile.tipo_neurodivergencia})")
-                    usuarios_data.append({
-                        'id': f'profile_{profile.id}',
-                        'fuente': 'NeurodivergentProfile (nuevo)',
-                        'nombre': profile.nombre,
-                        'apellidos': profile.apellidos,
-                        'email': profile.email,
-                        'telefono': profile.telefono,
-                        'ciudad': profile.ciudad,
-                        'fecha_nacimiento': profile.fecha_nacimiento.isoformat() if profile.fecha_nacimiento else None,
-                        'tipo_neurodivergencia': profile.tipo_neurodivergencia,
-                        'diagnostico_formal': profile.diagnostico_formal,
-                        'habilidades': profile.habilidades,
-                        'experiencia_laboral': profile.experiencia_laboral,
-                        'formacion_academica': profile.formacion_academica,
-                        'intereses_laborales': profile.intereses_laborales,
-                        'adaptaciones_necesarias': profile.adaptaciones_necesarias,
-                        'motivaciones': profile.motivaciones,
-                        'created_at': profile.created_at.isoformat() if profile.created_at else None
-                    })
-            except Exception as e:
-                print(f"⚠️ Error cargando tabla NeurodivergentProfile: {e}")
-            
-            print(f"📊 CRM - Total usuarios combinados: {len(usuarios_data)}")
-            
-            return jsonify(usuarios_data)
+                rows, next_cursor = keyset_sorted_page(
+                    query, vista.c.created_at, vista.c.uid,
+                    cursor=cursor, limit=parse_limit(args), descending=True
+                )
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            
+            response = {
+                'success': True,
+                'usuarios': [row_to_dict(row, fields) for row in rows],
+                'fields': fields,
+                'next_cursor': next_cursor
+            }
+            if not cursor:
+                response['total'] = query.order_by(None).count()
+            return jsonify(response)
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)}), 500
     
@@ -1345,51 +1357,160 @@ def create_minimal_crm_routes(app):
 
     # ==================== RUTAS PARA ASOCIACIONES ====================
     
+    def lista_texto(valor):
+        """Lista guardada como JSON o, desde registro_asociacion, separada por comas"""
+        if not valor:
+            return []
+        try:
+            lista = json.loads(valor)
+            if isinstance(lista, list):
+                return lista
+        except (ValueError, TypeError):
+            pass
+        return [v.strip() for v in valor.split(',') if v.strip()]
+    
+    def asociacion_resumen(asoc):
+        """Fila del listado de asociaciones (neurodivergencias y servicios como texto)"""
+        neurodivergencias = lista_texto(asoc.neurodivergencias_atendidas)
+        servicios = lista_texto(asoc.servicios)
+        
+        return {
+            'id': asoc.id,
+            'nombre_asociacion': asoc.nombre_asociacion,
+            'acronimo': asoc.acronimo,
+            'pais': asoc.pais,
+            'ciudad': asoc.ciudad,
+            'telefono': asoc.telefono,
+            'email': asoc.email,
+            'sitio_web': asoc.sitio_web,
+            'contacto_nombre': asoc.contacto_nombre,
+            'contacto_cargo': asoc.contacto_cargo,
+            'estado': asoc.estado,
+            'años_funcionamiento': asoc.años_funcionamiento,
+            'numero_socios': asoc.numero_socios,
+            'neurodivergencias_atendidas': ', '.join(neurodivergencias) if neurodivergencias else '',
+            'servicios': ', '.join(servicios) if servicios else '',
+            'descripcion': asoc.descripcion,
+            'created_at': asoc.created_at.isoformat() if asoc.created_at else None
+        }
+    
     @app.route('/api/asociaciones')
     def get_asociaciones():
-        """Obtener todas las asociaciones de la base de datos"""
+        """Asociaciones paginadas por cursor: ?limit=50&after_id=<último id>&estado=<estado>"""
         try:
             from models import Asociacion
-            from app import db
+            from crm_queries import parse_limit, keyset_page, table_validator, make_etag, not_modified, with_validators
             
-            asociaciones = Asociacion.query.all()
+            ultimo_cambio, total_filas = table_validator(Asociacion)
+            etag = make_etag(request, ultimo_cambio, total_filas)
+            cached = not_modified(request, etag)
+            if cached:
+                return cached
             
-            asociaciones_data = []
-            for asoc in asociaciones:
-                # Procesar neurodivergencias y servicios desde JSON
-                import json
-                try:
-                    neurodivergencias = json.loads(asoc.neurodivergencias_atendidas) if asoc.neurodivergencias_atendidas else []
-                except:
-                    neurodivergencias = []
+            query = Asociacion.query
+            estado = request.args.get('estado')
+            if estado:
+                query = query.filter(Asociacion.estado == estado)
+            
+            after_id = request.args.get('after_id', type=int)
+            asociaciones, next_cursor = keyset_page(query, Asociacion.id, after_id, parse_limit(request.args))
+            
+            response = {
+                'success': True,
+                'asociaciones': [asociacion_resumen(asoc) for asoc in asociaciones],
+                'next_cursor': next_cursor
+            }
+            # El total solo se calcula en la primera página
+            if after_id is None:
+                response['total'] = query.count()
+            return with_validators(jsonify(response), etag, ultimo_cambio)
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    @app.route('/api/asociaciones/migrate-json', methods=['POST'])
+    def migrate_json_asociaciones():
+        """Migración única: pasar las asociaciones de crm_data.json a la tabla asociaciones
+
+        Los registros que no se pueden migrar (fecha inválida, datos rechazados por la base de datos) se
+        saltan y se devuelven en 'errores'; en ese caso la colección del JSON no se vacía y la migración
+        puede repetirse tras corregirlos (las ya migradas cuentan como duplicadas).
+        """
+        if not is_admin():
+            return jsonify({'success': False, 'error': 'Acceso no autorizado'}), 403
+        try:
+            from models import Asociacion
+            
+            registros = store.all('asociaciones')
+            existentes = {
+                (email or '').lower(): nombre
+                for email, nombre in db.session.query(Asociacion.email, Asociacion.nombre_asociacion)
+            }
+            
+            migradas = 0
+            duplicadas = 0
+            errores = []
+            for registro in registros:
+                email = (registro.get('email') or '').strip()
+                nombre = (registro.get('nombre_asociacion') or '').strip()
+                if not nombre or existentes.get(email.lower()) == nombre:
+                    # Ya estaba en PostgreSQL (registro_asociacion escribía en ambos sitios)
+                    duplicadas += 1
+                    continue
                 
-                try:
-                    servicios = json.loads(asoc.servicios) if asoc.servicios else []
-                except:
-                    servicios = []
+                campos = {}
+                if registro.get('created_at'):
+                    try:
+                        campos['created_at'] = datetime.fromisoformat(registro['created_at'])
+                    except (TypeError, ValueError):
+                        errores.append({'id': registro.get('id'), 'nombre': nombre,
+                                        'error': f"created_at no válido: {registro['created_at']!r}"})
+                        continue
                 
-                asociaciones_data.append({
-                    'id': asoc.id,
-                    'nombre_asociacion': asoc.nombre_asociacion,
-                    'acronimo': asoc.acronimo,
-                    'pais': asoc.pais,
-                    'ciudad': asoc.ciudad,
-                    'telefono': asoc.telefono,
-                    'email': asoc.email,
-                    'sitio_web': asoc.sitio_web,
-                    'contacto_nombre': asoc.contacto_nombre,
-                    'contacto_cargo': asoc.contacto_cargo,
-                    'estado': asoc.estado,
-                    'años_funcionamiento': asoc.años_funcionamiento,
-                    'numero_socios': asoc.numero_socios,
-                    'neurodivergencias_atendidas': ', '.join(neurodivergencias) if neurodivergencias else '',
-                    'servicios': ', '.join(servicios) if servicios else '',
-                    'descripcion': asoc.descripcion,
-                    'created_at': asoc.created_at.isoformat() if asoc.created_at else None
-                })
-            
-            return jsonify(asociaciones_data)
+                neurodivergencias = registro.get('neurodivergencias_atendidas') or ''
+                servicios = registro.get('servicios') or ''
+                nueva = Asociacion(
+                    nombre_asociacion=nombre,
+                    acronimo=registro.get('acronimo'),
+                    pais=registro.get('pais') or '',
+                    tipo_documento=registro.get('tipo_documento') or '',
+                    numero_documento=registro.get('numero_documento') or '',
+                    # Mismo formato que registro_asociacion: valores separados por comas
+                    neurodivergencias_atendidas=neurodivergencias if isinstance(neurodivergencias, str) else ','.join(neurodivergencias),
+                    servicios=servicios if isinstance(servicios, str) else ','.join(servicios),
+                    ciudad=registro.get('ciudad') or '',
+                    telefono=registro.get('telefono'),
+                    email=email,
+                    contacto_nombre=registro.get('contacto_nombre'),
+                    contacto_cargo=registro.get('contacto_cargo'),
+                    estado=registro.get('estado') or 'pendiente',
+                    **campos
+                )
+                # Savepoint por registro: uno rechazado no deshace los demás
+                try:
+                    with db.session.begin_nested():
+                        db.session.add(nueva)
+                except Exception as e:
+                    errores.append({'id': registro.get('id'), 'nombre': nombre, 'error': str(e)})
+                    continue
+                existentes[email.lower()] = nombre
+                migradas += 1
+            
+            db.session.commit()
+            if not errores:
+                # La tabla es ahora la única fuente: vaciar la colección del JSON
+                store.clear('asociaciones')
+            logger.info("✅ Asociaciones migradas a PostgreSQL: %s nuevas, %s ya existentes, %s con errores",
+                        migradas, duplicadas, len(errores))
+            
+            return jsonify({
+                'success': True,
+                'message': f'Migradas {migradas} asociaciones del CRM JSON a PostgreSQL',
+                'migradas': migradas,
+                'duplicadas': duplicadas,
+                'errores': errores
+            })
         except Exception as e:
+            db.session.rollback()
             return jsonify({'success': False, 'error': str(e)}), 500
     
     @app.route('/api/asociaciones/<int:asociacion_id>')
@@ -1398,19 +1519,13 @@ def create_minimal_crm_routes(app):
         try:
             from models import Asociacion
             
-            asociacion = Asociacion.query.get_or_404(asociacion_id)
-            
-            # Procesar campos JSON
-            import json
-            try:
-                neurodivergencias = json.loads(asociacion.neurodivergencias_atendidas) if asociacion.neurodivergencias_atendidas else []
-            except:
-                neurodivergencias = []
+            asociacion = db.session.get(Asociacion, asociacion_id)
+            if asociacion is None:
+                return jsonify({'success': False, 'error': 'Asociación no encontrada'}), 404
             
-            try:
-                servicios = json.loads(asociacion.servicios) if asociacion.servicios else []
-            except:
-                servicios = []
+            # Procesar campos de lista (JSON o separados por comas)
+            neurodivergencias = lista_texto(asociacion.neurodivergencias_atendidas)
+            servicios = lista_texto(asociacion.servicios)
                 
             data = {
                 'id': asociacion.id,
@@ -1590,59 +1705,24 @@ def create_minimal_crm_routes(app):
     # ya están definidas en routes_simple.py. Esta duplicación causaba conflictos de mapeo de rutas.
     # Para evitar duplicaciones y conflictos, todas las funciones CRM están centralizadas en routes_simple.py
     
-    # Debug: listar rutas registradas
-    print("🔍 Rutas API registradas:")
-    for rule in app.url_map.iter_rules():
-        if 'api/usuario' in str(rule.rule):
-            print(f"  {rule.rule} -> {rule.endpoint} [{', '.join(rule.methods)}]")
-    
     @app.route('/api/neurodivergent/geographic-data')
     def api_neurodivergent_geographic():
         """API para obtener datos geográficos de usuarios neurodivergentes"""
         try:
-            from models import User, NeurodivergentProfile
-            # Obtener datos de ubicación de todas las tablas ND
-            geographic_data = []
-            
-            # Datos de User (tabla original)
-            users = User.query.all()
-            for user in users:
-                if user.ciudad:
-                    geographic_data.append({
-                        'ciudad': user.ciudad,
-                        'tipo': user.tipo_neurodivergencia,
-                        'source': 'users'
-                    })
-            
-            # Datos de NeurodivergentProfile
-            profiles = NeurodivergentProfile.query.all()
-            for profile in profiles:
-                if profile.ciudad:
-                    geographic_data.append({
-                        'ciudad': profile.ciudad,
-                        'tipo': profile.tipo_neurodivergencia,
-                        'source': 'profiles'
-                    })
-            
-            # Agrupar por ciudad
-            city_counts = {}
-            for item in geographic_data:
-                ciudad = item['ciudad'].strip().title()
-                if ciudad not in city_counts:
-                    city_counts[ciudad] = 0
-                city_counts[ciudad] += 1
-            
-            # Convertir a lista ordenada
-            cities_list = [{'ciudad': k, 'count': v} for k, v in sorted(city_counts.items(), key=lambda x: x[1], reverse=True)]
+            from crm_analytics import ensure_city_keys, top_cities
+            
+            # Filas anteriores a la columna ciudad_clave: se rellenan una vez
+            ensure_city_keys(db)
+            cities_list, total_cities = top_cities(db.session)
             
             return jsonify({
                 'success': True,
-                'geographic_data': cities_list[:15],  # Top 15 ciudades
-                'total_cities': len(city_counts)
+                'geographic_data': cities_list,  # Top 15 ciudades
+                'total_cities': total_cities
             })
         
         except Exception as e:
-            print(f"❌ Error obteniendo datos geográficos: {e}")
+            logger.warning("❌ Error obteniendo datos geográficos: %s", e)
             return jsonify({
                 'success': False,
                 'error': str(e),
@@ -1657,44 +1737,20 @@ def create_minimal_crm_routes(app):
     def api_neurodivergent_sectors():
         """API para obtener datos de sectores laborales de interés"""
         try:
-            from models import User, NeurodivergentProfile
-            # Analizar intereses laborales de todas las fuentes
-            sectors_data = {}
-            
-            # Obtener de User (tabla original)
-            users = User.query.all()
-            for user in users:
-                if user.intereses_laborales:
-                    # Extraer sectores mencionados
-                    intereses = user.intereses_laborales.lower()
-                    sectores_detectados = extract_sectors_from_text(intereses)
-                    for sector in sectores_detectados:
-                        if sector not in sectors_data:
-                            sectors_data[sector] = 0
-                        sectors_data[sector] += 1
-            
-            # Obtener de NeurodivergentProfile
-            profiles = NeurodivergentProfile.query.all()
-            for profile in profiles:
-                if profile.intereses_laborales:
-                    intereses = profile.intereses_laborales.lower()
-                    sectores_detectados = extract_sectors_from_text(intereses)
-                    for sector in sectores_detectados:
-                        if sector not in sectors_data:
-                            sectors_data[sector] = 0
-                        sectors_data[sector] += 1
-            
-            # Convertir a lista ordenada
-            sectors_list = [{'sector': k, 'count': v} for k, v in sorted(sectors_data.items(), key=lambda x: x[1], reverse=True)]
+            from crm_analytics import ensure_sector_tags, top_sectors
+            
+            # Sectores calculados al guardar cada usuario/perfil: solo queda agregar
+            ensure_sector_tags(db)
+            sectors_list, total_sectors = top_sectors(db.session)
             
             return jsonify({
                 'success': True,
-                'sectors_data': sectors_list[:12],  # Top 12 sectores
-                'total_sectors': len(sectors_data)
+                'sectors_data': sectors_list,  # Top 12 sectores
+                'total_sectors': total_sectors
             })
         
         except Exception as e:
-            print(f"❌ Error obteniendo datos de sectores: {e}")
+            logger.warning("❌ Error obteniendo datos de sectores: %s", e)
             return jsonify({
                 'success': False,
                 'error': str(e),
@@ -1706,30 +1762,32 @@ def create_minimal_crm_routes(app):
                 ]
             })
 
-    def extract_sectors_from_text(text):
-        """Extraer sectores laborales mencionados en el texto"""
-        sectores = {
-            'Tecnología': ['tecnolog', 'informática', 'software', 'programación', 'desarrollo', 'it', 'sistemas', 'digital', 'web'],
-            'Hostelería': ['cocina', 'restaurante', 'chef', 'cocinero', 'camarero', 'hostelería', 'gastronomía', 'fogones'],
-            'Educación': ['educación', 'enseñanza', 'docencia', 'formación', 'pedagogía', 'profesor', 'maestro'],
-            'Salud': ['salud', 'medicina', 'enfermería', 'terapia', 'psicología', 'fisioterapia', 'sanitario'],
-            'Arte y Diseño': ['arte', 'diseño', 'creativo', 'gráfico', 'dibujo', 'ilustración', 'creatividad'],
-            'Comunicación': ['comunicación', 'marketing', 'publicidad', 'medios', 'periodismo', 'social media'],
-            'Administración': ['administración', 'gestión', 'oficina', 'recursos humanos', 'contabilidad'],
-            'Ingeniería': ['ingeniería', 'ingeniero', 'técnico', 'industrial', 'construcción'],
-            'Servicios': ['atención cliente', 'servicio', 'comercial', 'ventas'],
-            'Investigación': ['investigación', 'ciencia', 'análisis', 'laboratorio', 'estudio'],
-            'Social': ['social', 'ong', 'voluntariado', 'ayuda', 'asistencia', 'cuidados']
-        }
-        
-        sectores_encontrados = []
-        for sector, keywords in sectores.items():
-            for keyword in keywords:
-                if keyword in text:
-                    sectores_encontrados.append(sector)
-                    break
-        
-        return sectores_encontrados
+    @app.route('/api/neurodivergent/timeseries')
+    def api_neurodivergent_timeseries():
+        """Altas por día/semana/mes y tipo de neurodivergencia (?granularity=day|week|month&from=&to=&source=)"""
+        try:
+            from datetime import date
+            from crm_analytics import ensure_registration_rollup, registration_timeseries
+            
+            source = request.args.get('source') or None
+            if source not in (None, 'lead', 'profile'):
+                return jsonify({'success': False, 'error': 'source debe ser lead o profile'}), 400
+            try:
+                desde = date.fromisoformat(request.args['from']) if request.args.get('from') else None
+                hasta = date.fromisoformat(request.args['to']) if request.args.get('to') else None
+            except ValueError:
+                return jsonify({'success': False, 'error': 'from/to deben tener formato YYYY-MM-DD'}), 400
+            
+            # Rollup vacío con datos existentes: carga inicial (una vez)
+            ensure_registration_rollup(db)
+            
+            try:
+                data = registration_timeseries(db, request.args.get('granularity', 'day'), desde, hasta, source)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            return jsonify({'success': True, **data})
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
 
     @app.route('/unsubscribe')
     def unsubscribe():
@@ -1786,5 +1844,5 @@ def create_minimal_crm_routes(app):
         </html>
         """)
 
-    print("CRM Minimal inicializado correctamente")
+    logger.info("CRM Minimal inicializado correctamente")
     
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Cola write-behind para las copias en el CRM Minimal de los formularios públicos
+La petición solo añade el registro al spool en disco (duradero antes de responder); un hilo en segundo
+plano agrupa lo acumulado en una escritura del store y vacía el spool.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: el spool solo se protege entre hilos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Registros aceptados y todavía sin copiar al store (compartido por todos los procesos)
+SPOOL_FILE = 'crm_mirror_spool.jsonl'
+
+# Espera antes de volcar, para agrupar los registros que llegan en ráfaga (segundos)
+FLUSH_INTERVAL = float(os.environ.get('CRM_MIRROR_FLUSH_INTERVAL', '0.5'))
+
+# Espera antes de reintentar un volcado que falló (segundos)
+RETRY_INTERVAL = float(os.environ.get('CRM_MIRROR_RETRY_INTERVAL', '5'))
+
+
+class MirrorQueue:
+    """Cola de registros pendientes de copiar en el store del CRM
+
+    Cada registro se escribe en el spool (con fsync) al encolarlo: una caída del proceso no lo pierde y el
+    siguiente volcado de cualquier proceso lo copia. La entrega es "al menos una vez": si el proceso cae
+    entre la escritura en el store y el vaciado del spool, esos registros se copian de nuevo.
+    """
+
+    def __init__(self, store, spool_path=SPOOL_FILE, flush_interval=FLUSH_INTERVAL, retry_interval=RETRY_INTERVAL):
+        self.store = store
+        self.spool_path = spool_path
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self._dirty = False  # hay registros nuevos en el spool desde el último volcado
+        self._cond = threading.Condition()
+        self._spool_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        atexit.register(self.close)
+
+    def start(self):
+        """Arrancar el hilo de volcado (recupera antes lo que quedara en el spool)"""
+        with self._cond:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='crm-mirror', daemon=True)
+                self._thread.start()
+
+    def enqueue(self, collection, record):
+        """Guardar el registro en el spool y avisar al hilo de volcado; nunca espera al store"""
+        self._spill([(collection, dict(record))])
+        with self._cond:
+            self._dirty = True
+            self._cond.notify()
+        self.start()
+
+    def pending(self):
+        """Registros en el spool todavía sin copiar (de cualquier proceso)"""
+        try:
+            with self._spool_lock, self._open_spool() as f:
+                f.seek(0)
+                return sum(1 for line in f if line.strip())
+        except OSError:
+            return 0
+
+    def _run(self):
+        self.drain_spool()
+        while True:
+            with self._cond:
+                while not self._dirty and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                self._dirty = False
+            # Dar margen a que lleguen más registros y volcarlos todos juntos
+            time.sleep(self.flush_interval)
+            if self.flush() is None:
+                # El store falló: los registros siguen en el spool, se reintenta más tarde
+                with self._cond:
+                    self._dirty = True
+                    self._cond.wait(self.retry_interval)
+
+    def flush(self):
+        """Volcar el spool al store; devuelve los registros escritos o None si falló"""
+        return self.drain_spool()
+
+    def _write(self, batch):
+        by_collection = {}
+        for collection, record in batch:
+            by_collection.setdefault(collection, []).append(record)
+        for collection, records in by_collection.items():
+            self.store.insert_many(collection, records)
+        logger.info("🪞 CRM: %s registros copiados en una escritura", len(batch))
+
+    # ==================== SPOOL EN DISCO ====================
+
+    def _open_spool(self):
+        f = open(self.spool_path, 'a+', encoding='utf-8')
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return f
+
+    def _spill(self, batch):
+        """Añadir registros al spool de forma duradera"""
+        with self._spool_lock, self._open_spool() as f:
+            for collection, record in batch:
+                f.write(json.dumps({'c': collection, 'record': record}, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def drain_spool(self):
+        """Copiar al store lo que haya en el spool (de este u otro proceso) y vaciarlo
+
+        El lock del spool se mantiene hasta vaciarlo, así dos procesos no copian los mismos registros.
+        Devuelve los registros copiados o None si el store falló (el spool queda intacto).
+        """
+        if not os.path.exists(self.spool_path):
+            return 0
+        try:
+            with self._spool_lock, self._open_spool() as f:
+                f.seek(0)
+                batch = []
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                        batch.append((entry['c'], entry['record']))
+                    except (ValueError, KeyError):
+                        logger.warning("⚠️ Línea corrupta en %s descartada", self.spool_path)
+                if batch:
+                    self._write(batch)
+                f.truncate(0)
+                f.flush()
+                os.fsync(f.fileno())
+                return len(batch)
+        except Exception as e:
+            logger.warning("⚠️ No se pudo volcar el spool del CRM (se reintentará): %s", e)
+            return None
+
+    def close(self):
+        """Parada ordenada: detener el hilo y volcar lo pendiente (si el store falla, queda en el spool)"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.flush()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Utilidades de consulta compartidas por las APIs del CRM
+Paginación por cursor (keyset) sobre columnas indexadas en lugar de OFFSET
+"""
+
+import base64
+import hashlib
+import json
+import os
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, func, or_
+
+# Tamaño de página por defecto y máximo admitido en ?limit=
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def parse_limit(args, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Leer ?limit= acotado a [1, maximum]"""
+    try:
+        limit = int(args.get('limit', default))
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def keyset_page(query, id_column, after_id=None, limit=DEFAULT_PAGE_SIZE):
+    """Página ordenada por id ascendente a partir del cursor; devuelve (filas, siguiente_cursor)"""
+    if after_id is not None:
+        query = query.filter(id_column > after_id)
+    # Una fila de más indica si hay página siguiente sin hacer COUNT
+    rows = query.order_by(id_column).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = getattr(rows[-1], id_column.key)
+    return rows, next_cursor
+
+
+# ==================== CURSORES OPACOS Y ORDEN CONFIGURABLE ====================
+
+def encode_cursor(values):
+    """Cursor opaco (base64 de JSON) a partir de los valores de la última fila"""
+    raw = json.dumps([v.isoformat() if isinstance(v, (datetime, date)) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token, columns):
+    """Valores del cursor convertidos al tipo Python de cada columna; ValueError si no es válido"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception:
+        raise ValueError('cursor inválido')
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('cursor inválido')
+    try:
+        return [_coerce(column, value) for column, value in zip(columns, values)]
+    except (TypeError, ValueError):
+        raise ValueError('cursor inválido')
+
+
+def _coerce(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def keyset_sorted_page(query, sort_column, id_column, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=False):
+    """Página ordenada por (sort_column, id) con cursor opaco; los NULL van al final
+
+    Devuelve (filas, siguiente_cursor). El orden usa el índice de sort_column y el id desempata.
+    """
+    if cursor:
+        last_value, last_id = decode_cursor(cursor, [sort_column, id_column])
+        after = (lambda col, value: col < value) if descending else (lambda col, value: col > value)
+        if last_value is None:
+            # Ya estamos en el tramo de NULL: solo desempata el id
+            query = query.filter(sort_column.is_(None), after(id_column, last_id))
+        else:
+            query = query.filter(or_(
+                after(sort_column, last_value),
+                and_(sort_column == last_value, after(id_column, last_id)),
+                sort_column.is_(None)
+            ))
+
+    if descending:
+        order = [sort_column.desc().nullslast(), id_column.desc()]
+    else:
+        order = [sort_column.asc().nullslast(), id_column.asc()]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, sort_column.key), getattr(last, id_column.key)])
+    return rows, next_cursor
+
+
+# ==================== FILTROS ====================
+
+def parse_bool(value):
+    """'true'/'1'/'si' -> True, 'false'/'0'/'no' -> False, vacío -> None"""
+    if value in (None, ''):
+        return None
+    value = str(value).strip().lower()
+    if value in ('true', '1', 'si', 'sí', 'yes'):
+        return True
+    if value in ('false', '0', 'no'):
+        return False
+    raise ValueError(f'valor booleano no válido: {value}')
+
+
+def parse_datetime(value, end_of_day=False):
+    """Fecha ISO (YYYY-MM-DD o con hora); con end_of_day una fecha sola incluye el día completo"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1) - timedelta(microseconds=1)
+    return parsed
+
+
+def parse_fields(value, model, default, required=('id',)):
+    """Columnas pedidas en ?fields=a,b,c ('all' = todas); ValueError si alguna no existe en el modelo"""
+    # Admite un modelo ORM o una Table (p. ej. una vista)
+    columns = getattr(model, '__table__', model).columns
+    if not value:
+        names = list(default)
+    elif value == 'all':
+        names = [c.key for c in columns]
+    else:
+        names = [n.strip() for n in value.split(',') if n.strip()]
+        unknown = [n for n in names if n not in columns]
+        if unknown:
+            raise ValueError(f"Campos no válidos: {', '.join(unknown)}")
+    # Las columnas del cursor se incluyen siempre
+    for name in required:
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def row_to_dict(row, names):
+    """Fila de una consulta de columnas -> dict serializable (fechas en ISO)"""
+    data = {}
+    for name in names:
+        value = getattr(row, name)
+        data[name] = value.isoformat() if isinstance(value, (datetime, date)) else value
+    return data
+
+
+# ==================== RESPUESTAS EN STREAMING ====================
+
+# Filas que se piden a la base de datos por lote al hacer streaming
+STREAM_BATCH_SIZE = 500
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def stream_format(request):
+    """'ndjson' o 'json' si el cliente pide streaming (Accept o ?stream=), si no None"""
+    requested = request.args.get('stream')
+    if requested in ('ndjson', 'json'):
+        return requested
+    if NDJSON_MIMETYPE in request.headers.get('Accept', ''):
+        return 'ndjson'
+    return None
+
+
+def stream_query(query, serialize, fmt, batch_size=STREAM_BATCH_SIZE):
+    """Respuesta que recorre la consulta con un cursor de servidor y escribe cada fila al generarla
+
+    fmt='ndjson' -> un objeto JSON por línea; fmt='json' -> array JSON enviado por trozos.
+    La memoria por petición depende de batch_size, no del tamaño de la tabla.
+    """
+    from flask import Response, stream_with_context
+
+    def generate():
+        first = True
+        if fmt == 'json':
+            yield '['
+        for row in query.yield_per(batch_size):
+            line = json.dumps(serialize(row), ensure_ascii=False)
+            if fmt == 'ndjson':
+                yield line + '\n'
+            else:
+                yield line if first else ',' + line
+            first = False
+        if fmt == 'json':
+            yield ']'
+
+    mimetype = NDJSON_MIMETYPE if fmt == 'ndjson' else 'application/json'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    # Evitar que un proxy acumule la respuesta completa antes de enviarla
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# ==================== PETICIONES CONDICIONALES (ETag / 304) ====================
+
+def table_validator(model):
+    """(max(updated_at), count) de una tabla: validador barato que no lee filas"""
+    from app import db
+    return db.session.query(func.max(model.updated_at), func.count(model.id)).one()
+
+
+def make_etag(request, *parts):
+    """ETag a partir del validador y de la URL completa (los filtros cambian la respuesta)"""
+    raw = repr((request.full_path,) + parts).encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()
+
+
+def not_modified(request, etag):
+    """Respuesta 304 si el cliente ya tiene esta versión (If-None-Match), si no None"""
+    from flask import Response
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
+def with_validators(response, etag, last_modified=None):
+    """Añadir ETag/Last-Modified y obligar a revalidar en cada sondeo"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+# ==================== OPERACIONES MASIVAS ====================
+
+# Filas por transacción en borrados/migraciones masivas (bloqueos cortos en tablas grandes)
+BULK_CHUNK_SIZE = int(os.environ.get('CRM_BULK_CHUNK_SIZE', '1000'))
+
+
+def chunked(values, size):
+    """Trocear una lista en listas de como mucho size elementos"""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def archive_rows(db, model, archive_model, ids, reason=None, chunk_size=BULK_CHUNK_SIZE, tag_source=None):
+    """Mover filas de model a archive_model por id sin cargarlas en Python; devuelve cuántas se movieron
+
+    Cada trozo es una transacción. En PostgreSQL es una sola sentencia
+    (WITH moved AS (DELETE ... RETURNING ...) INSERT ... SELECT FROM moved); en otros motores,
+    INSERT ... SELECT seguido de DELETE en la misma transacción. Con tag_source se borran en esa
+    transacción las etiquetas de sector_tags de las filas movidas (los listeners del ORM no se ejecutan).
+    """
+    from sqlalchemy import bindparam, delete, insert, literal, select, text
+
+    table, archive = model.__table__, archive_model.__table__
+    names = [c.name for c in table.columns if c.name in archive.columns]
+    extra = {'archived_at': datetime.utcnow(), 'archive_reason': reason}
+    extra_names = [name for name in extra if name in archive.columns]
+    target = names + extra_names
+
+    moved_total = 0
+    for chunk in chunked(sorted(set(ids)), chunk_size):
+        try:
+            if db.engine.dialect.name == 'postgresql':
+                moved = delete(table).where(table.c.id.in_(chunk)).returning(
+                    *[table.c[name] for name in names]).cte('moved')
+                source = select(*[moved.c[name] for name in names],
+                                *[literal(extra[name]).label(name) for name in extra_names])
+                result = db.session.execute(insert(archive).from_select(target, source))
+                moved_total += result.rowcount
+            else:
+                source = select(*[table.c[name] for name in names],
+                                *[literal(extra[name]).label(name) for name in extra_names]
+                                ).where(table.c.id.in_(chunk))
+                db.session.execute(insert(archive).from_select(target, source))
+                moved_total += db.session.execute(delete(table).where(table.c.id.in_(chunk))).rowcount
+            if tag_source:
+                db.session.execute(text(
+                    "DELETE FROM sector_tags WHERE source = :source AND source_id IN :ids"
+                ).bindparams(bindparam('ids', expanding=True)), {'source': tag_source, 'ids': chunk})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    return moved_total
+
+
+# Columnas copiadas de users (legacy) a general_leads
+LEGACY_USER_COLUMNS = ['nombre', 'apellidos', 'email', 'telefono', 'ciudad', 'fecha_nacimiento',
+                       'tipo_neurodivergencia', 'diagnostico_formal', 'habilidades', 'experiencia_laboral',
+                       'formacion_academica', 'intereses_laborales', 'adaptaciones_necesarias',
+                       'motivaciones', 'created_at', 'updated_at']
+
+
+def migrate_legacy_users(db, batch_size=BULK_CHUNK_SIZE, dry_run=False):
+    """Pasar users (legacy) a general_leads con INSERT ... SELECT ... ON CONFLICT (email) DO NOTHING
+
+    Por lotes de ids: cada lote inserta los que faltan, borra de users los que ya tienen lead y confirma.
+    Con dry_run solo cuenta lo que se migraría. Devuelve {'total', 'migrados', 'existentes', 'lotes'}.
+    """
+    from sqlalchemy import text
+
+    if dry_run:
+        total, nuevos = db.session.execute(text(
+            "SELECT count(*), count(CASE WHEN NOT EXISTS "
+            "(SELECT 1 FROM general_leads g WHERE g.email = u.email) THEN 1 END) FROM users u"
+        )).one()
+        return {'total': total, 'migrados': nuevos, 'existentes': total - nuevos, 'lotes': 0, 'dry_run': True}
+
+    from crm_analytics import count_inserted_registrations, tag_inserted_rows
+
+    columns = ', '.join(LEGACY_USER_COLUMNS)
+    insert_batch = text(
+        f"INSERT INTO general_leads ({columns}, convertido_a_perfil) "
+        f"SELECT {columns}, false FROM users WHERE id > :desde AND id <= :hasta ORDER BY id "
+        f"ON CONFLICT (email) DO NOTHING RETURNING id, intereses_laborales, created_at, tipo_neurodivergencia"
+    )
+    # Solo se borran usuarios cuyo email ya está en general_leads (recién migrados o ya existentes)
+    delete_batch = text(
+        "DELETE FROM users WHERE id > :desde AND id <= :hasta "
+        "AND EXISTS (SELECT 1 FROM general_leads g WHERE g.email = users.email)"
+    )
+    # Etiquetas de sector de los usuarios borrados (sector_tags no tiene FK)
+    delete_tags = text(
+        "DELETE FROM sector_tags WHERE source = 'user' AND source_id > :desde AND source_id <= :hasta "
+        "AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = sector_tags.source_id)"
+    )
+    batch_end = text(
+        "SELECT max(id), count(*) FROM (SELECT id FROM users WHERE id > :desde ORDER BY id LIMIT :limite) lote"
+    )
+
+    total = migrados = lotes = 0
+    desde = 0
+    while True:
+        hasta, en_lote = db.session.execute(batch_end, {'desde': desde, 'limite': batch_size}).one()
+        if not en_lote:
+            break
+        try:
+            params = {'desde': desde, 'hasta': hasta}
+            nuevos = db.session.execute(insert_batch, params).fetchall()
+            migrados += len(nuevos)
+            # El INSERT ... SELECT no pasa por los listeners: etiquetas y altas de los leads nuevos aquí
+            tag_inserted_rows(db.session.connection(), 'lead', [(f.id, f.intereses_laborales) for f in nuevos])
+            count_inserted_registrations(db.session.connection(), 'lead',
+                                         [(f.created_at, f.tipo_neurodivergencia) for f in nuevos])
+            db.session.execute(delete_batch, params)
+            db.session.execute(delete_tags, params)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        total += en_lote
+        lotes += 1
+        desde = hasta
+    return {'total': total, 'migrados': migrados, 'existentes': total - migrados, 'lotes': lotes, 'dry_run': False}
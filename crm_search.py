@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Búsqueda en el CRM sobre PostgreSQL
+- Texto completo sobre perfiles ND y leads generales (columna generada search_vector + GIN)
+- Autocompletado aproximado por trigramas (pg_trgm) de personas, empresas y asociaciones
+Los índices se crean en db_schema.POSTGRES_STATEMENTS
+"""
+
+import html
+import os
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from db_schema import SEARCH_CONFIG, SEARCH_FIELDS
+
+# Fuentes buscables: nombre en la API -> (tabla, etiqueta en los resultados)
+SEARCH_SOURCES = {
+    'profiles': ('neurodivergent_profiles_new', 'profile'),
+    'leads': ('general_leads', 'lead'),
+}
+
+# Marcadores internos de ts_headline; se convierten en <mark> después de escapar el texto
+_START_SEL = '\x02'
+_STOP_SEL = '\x03'
+HEADLINE_OPTIONS = f'StartSel={_START_SEL}, StopSel={_STOP_SEL}, MaxFragments=2, MinWords=5, MaxWords=20'
+
+# Paginación por número de página: el ranking necesita todas las coincidencias igualmente
+MAX_OFFSET = 10000
+
+
+def _source_select(source, filters):
+    table, label = SEARCH_SOURCES[source]
+    document = ', '.join(f't.{field}' for field, _ in SEARCH_FIELDS)
+    conditions = ['t.search_vector @@ q.query']
+    if 'tipo_neurodivergencia' in filters:
+        conditions.append('t.tipo_neurodivergencia = :tipo_neurodivergencia')
+    if 'ciudad' in filters:
+        conditions.append('lower(t.ciudad) = lower(:ciudad)')
+    return (
+        f"SELECT '{label}' AS source, t.id, t.nombre, t.apellidos, t.email, t.ciudad, "
+        f"t.tipo_neurodivergencia, t.created_at, "
+        f"ts_rank_cd(t.search_vector, q.query) AS rank, "
+        f"concat_ws(' … ', {document}) AS document "
+        f"FROM {table} t, q WHERE {' AND '.join(conditions)}"
+    )
+
+
+def build_search_sql(sources, filters):
+    """SQL de una sola consulta: coincidencias de todas las fuentes, ordenadas, paginadas y resaltadas"""
+    hits = ' UNION ALL '.join(_source_select(source, filters) for source in sources)
+    # ts_headline es caro: solo se calcula para las filas de la página
+    return text(
+        f"WITH q AS (SELECT websearch_to_tsquery('{SEARCH_CONFIG}', :q) AS query), "
+        f"hits AS ({hits}), "
+        f"page AS (SELECT *, count(*) OVER () AS total FROM hits "
+        f"         ORDER BY rank DESC, created_at DESC NULLS LAST, source, id LIMIT :limit OFFSET :offset) "
+        f"SELECT page.source, page.id, page.nombre, page.apellidos, page.email, page.ciudad, "
+        f"page.tipo_neurodivergencia, page.created_at, page.rank, page.total, "
+        f"ts_headline('{SEARCH_CONFIG}', page.document, q.query, '{HEADLINE_OPTIONS}') AS highlight "
+        f"FROM page, q ORDER BY page.rank DESC, page.created_at DESC NULLS LAST, page.source, page.id"
+    )
+
+
+def highlight_html(fragment):
+    """Fragmento de ts_headline -> HTML seguro (texto escapado, coincidencias en <mark>)"""
+    if not fragment:
+        return ''
+    escaped = html.escape(fragment)
+    return escaped.replace(_START_SEL, '<mark>').replace(_STOP_SEL, '</mark>')
+
+
+def search_candidates(db, query, sources=('profiles', 'leads'), filters=None, limit=20, page=1):
+    """Buscar candidatos por habilidades, experiencia, formación, intereses y motivaciones
+
+    Devuelve {'results', 'total', 'page', 'limit', 'took_ms'}. query admite la sintaxis de
+    websearch_to_tsquery: "frase exacta", OR, -excluir.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        raise RuntimeError('La búsqueda de texto completo requiere PostgreSQL')
+    unknown = [s for s in sources if s not in SEARCH_SOURCES]
+    if unknown or not sources:
+        raise ValueError(f"Fuente no válida: {', '.join(unknown) or '(vacía)'} (opciones: {', '.join(SEARCH_SOURCES)})")
+
+    filters = {k: v for k, v in (filters or {}).items() if v}
+    offset = (page - 1) * limit
+    if offset > MAX_OFFSET:
+        raise ValueError('Página demasiado alta: refina la búsqueda')
+
+    start = time.perf_counter()
+    rows = db.session.execute(
+        build_search_sql(sources, filters),
+        dict(filters, q=query, limit=limit, offset=offset)
+    ).mappings().all()
+    took_ms = (time.perf_counter() - start) * 1000
+
+    results = [{
+        'source': row['source'],
+        'id': row['id'],
+        'nombre': row['nombre'],
+        'apellidos': row['apellidos'],
+        'email': row['email'],
+        'ciudad': row['ciudad'],
+        'tipo_neurodivergencia': row['tipo_neurodivergencia'],
+        'created_at': row['created_at'].isoformat() if row['created_at'] else None,
+        'rank': round(float(row['rank']), 6),
+        'highlight': highlight_html(row['highlight'])
+    } for row in rows]
+
+    return {
+        'results': results,
+        'total': rows[0]['total'] if rows else 0,
+        'page': page,
+        'limit': limit,
+        'took_ms': round(took_ms, 2)
+    }
+
+
+# ==================== AUTOCOMPLETADO POR TRIGRAMAS ====================
+
+# Tipo -> (tabla, columnas buscadas, etiqueta, detalle). Las columnas coinciden con db_schema.TRGM_COLUMNS
+TYPEAHEAD_TARGETS = {
+    'lead': ('general_leads', ['nombre', 'apellidos', 'email', 'ciudad'],
+             "concat_ws(' ', nombre, apellidos)", "concat_ws(' · ', email, ciudad)"),
+    'profile': ('neurodivergent_profiles_new', ['nombre', 'apellidos', 'email', 'ciudad'],
+                "concat_ws(' ', nombre, apellidos)", "concat_ws(' · ', email, ciudad)"),
+    'company': ('companies', ['nombre_empresa'], 'nombre_empresa', "concat_ws(' · ', email_contacto, ciudad)"),
+    'asociacion': ('asociaciones', ['nombre_asociacion'], 'nombre_asociacion', 'email'),
+    'email_marketing': ('email_marketing', ['asociacion'], 'asociacion', "concat_ws(' · ', email, comunidad_autonoma)"),
+}
+
+# Presupuesto de latencia: PostgreSQL cancela la consulta si lo supera
+TYPEAHEAD_TIMEOUT_MS = int(os.environ.get('CRM_TYPEAHEAD_TIMEOUT_MS', '100'))
+
+# Umbral de word_similarity (0-1): más bajo = más tolerante y más filas candidatas
+TYPEAHEAD_THRESHOLD = float(os.environ.get('CRM_TYPEAHEAD_THRESHOLD', '0.4'))
+
+TYPEAHEAD_MIN_LENGTH = 3
+
+
+def build_typeahead_sql(kinds):
+    """Una sola consulta: top-k por columna (índice GIN con <%), deduplicado por registro y ordenado por similitud"""
+    branches = []
+    for kind in kinds:
+        table, columns, label, detail = TYPEAHEAD_TARGETS[kind]
+        for column in columns:
+            branches.append(
+                f"(SELECT '{kind}' AS kind, id, '{column}' AS field, {column} AS value, "
+                f"{label} AS label, {detail} AS detail, word_similarity(:q, {column}) AS score "
+                f"FROM {table} WHERE :q <% {column} ORDER BY score DESC LIMIT :k)"
+            )
+    return text(
+        f"WITH matches AS ({' UNION ALL '.join(branches)}), "
+        f"best AS (SELECT DISTINCT ON (kind, id) * FROM matches ORDER BY kind, id, score DESC) "
+        f"SELECT kind, id, field, value, label, detail, score FROM best ORDER BY score DESC, label LIMIT :k"
+    )
+
+
+def _is_timeout(error):
+    # 57014 = query_canceled (statement_timeout)
+    return getattr(getattr(error, 'orig', None), 'pgcode', None) == '57014'
+
+
+def typeahead(db, query, kinds=None, k=10, timeout_ms=TYPEAHEAD_TIMEOUT_MS, threshold=TYPEAHEAD_THRESHOLD):
+    """Coincidencias aproximadas para autocompletar ("claramunt", "asoc tdah cat")
+
+    Devuelve {'results', 'timed_out', 'took_ms'}; si se agota el presupuesto de latencia
+    se devuelve una lista vacía con timed_out=True en lugar de un error.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        raise RuntimeError('El autocompletado requiere PostgreSQL (pg_trgm)')
+    kinds = list(kinds or TYPEAHEAD_TARGETS)
+    unknown = [kind for kind in kinds if kind not in TYPEAHEAD_TARGETS]
+    if unknown:
+        raise ValueError(f"Tipo no válido: {', '.join(unknown)} (opciones: {', '.join(TYPEAHEAD_TARGETS)})")
+    query = ' '.join(query.split())
+    if len(query) < TYPEAHEAD_MIN_LENGTH:
+        return {'results': [], 'timed_out': False, 'took_ms': 0.0}
+
+    start = time.perf_counter()
+    try:
+        # Ajustes locales a la transacción: no afectan a otras consultas de la conexión
+        db.session.execute(
+            text("SELECT set_config('statement_timeout', :timeout, true), "
+                 "set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+            {'timeout': str(int(timeout_ms)), 'threshold': str(threshold)}
+        )
+        rows = db.session.execute(build_typeahead_sql(kinds), {'q': query, 'k': k}).mappings().all()
+        timed_out = False
+    except DBAPIError as e:
+        if not _is_timeout(e):
+            raise
+        rows, timed_out = [], True
+    finally:
+        # Cerrar la transacción para que statement_timeout no llegue a otras consultas
+        db.session.rollback()
+    took_ms = (time.perf_counter() - start) * 1000
+
+    results = [{
+        'type': row['kind'],
+        'id': row['id'],
+        'label': row['label'],
+        'detail': row['detail'],
+        'matched_field': row['field'],
+        'matched_value': row['value'],
+        'score': round(float(row['score']), 4)
+    } for row in rows]
+    return {'results': results, 'timed_out': timed_out, 'took_ms': round(took_ms, 2)}
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Serializadores intercambiables para el snapshot del CRM Minimal
+Formato configurable con CRM_STORE_FORMAT; al leer se detecta el formato por el contenido
+"""
+
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # opcional: se usa json compacto
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # opcional: solo necesario para el formato binario
+    msgpack = None
+
+
+class JSONSerializer:
+    """json de la biblioteca estándar (compacto o con sangría)"""
+
+    available = True
+
+    def __init__(self, name, indent=None):
+        self.name = name
+        self.indent = indent
+        self.separators = None if indent else (',', ':')
+
+    def dumps(self, data):
+        return json.dumps(data, ensure_ascii=False, indent=self.indent,
+                          separators=self.separators).encode('utf-8')
+
+    def loads(self, raw):
+        return json.loads(raw)
+
+
+class OrjsonSerializer:
+    """orjson: JSON compacto en UTF-8, varias veces más rápido que json"""
+
+    name = 'orjson'
+    available = orjson is not None
+
+    def dumps(self, data):
+        return orjson.dumps(data)
+
+    def loads(self, raw):
+        return orjson.loads(raw)
+
+
+class MsgpackSerializer:
+    """MessagePack: binario, el más compacto (requiere el paquete msgpack)"""
+
+    name = 'msgpack'
+    available = msgpack is not None
+
+    def dumps(self, data):
+        return msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, raw):
+        return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+
+SERIALIZERS = {
+    'json-pretty': JSONSerializer('json-pretty', indent=2),
+    'json': JSONSerializer('json'),
+    'orjson': OrjsonSerializer(),
+    'msgpack': MsgpackSerializer(),
+}
+
+# 'auto': orjson si está instalado, si no json compacto
+DEFAULT_FORMAT = os.environ.get('CRM_STORE_FORMAT', 'auto')
+
+
+def get_serializer(name=None):
+    """Serializador por nombre ('auto', 'json', 'json-pretty', 'orjson', 'msgpack')"""
+    name = name or DEFAULT_FORMAT
+    if name == 'auto':
+        return SERIALIZERS['orjson'] if orjson is not None else SERIALIZERS['json']
+    if name not in SERIALIZERS:
+        raise ValueError(f"Formato de CRM desconocido: {name} (opciones: auto, {', '.join(SERIALIZERS)})")
+    serializer = SERIALIZERS[name]
+    if not serializer.available:
+        raise RuntimeError(f"El formato {name} necesita un paquete que no está instalado")
+    return serializer
+
+
+def detect_serializer(raw):
+    """Elegir el serializador capaz de leer unos bytes de snapshot"""
+    if raw.lstrip()[:1] in (b'{', b'['):
+        return SERIALIZERS['orjson'] if orjson is not None else SERIALIZERS['json']
+    if not SERIALIZERS['msgpack'].available:
+        raise ValueError('snapshot binario (msgpack) pero el paquete msgpack no está instalado')
+    return SERIALIZERS['msgpack']
+
+
+def loads(raw):
+    """Deserializar un snapshot en cualquiera de los formatos soportados"""
+    return detect_serializer(raw).loads(raw)
+
+
+def parse_json(raw):
+    """Parsear una línea JSON (str o bytes) con el parser más rápido disponible"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def json_line(value):
+    """JSON compacto en bytes (log de cambios y respuestas pre-serializadas)"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
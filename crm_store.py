@@ -0,0 +1,588 @@
+#!/usr/bin/env python3
+"""
+Motor de almacenamiento del CRM Minimal
+Índice en memoria por clave primaria + registro de cambios (append-only) + compactación en segundo plano
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+import crm_serializers
+from crm_serializers import get_serializer, json_line, parse_json
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo protección entre hilos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Colecciones indexadas por 'id' dentro de crm_data.json
+COLLECTIONS = ('companies', 'contacts', 'asociaciones')
+
+# Número de cambios en el log antes de lanzar una compactación
+COMPACT_EVERY = int(os.environ.get('CRM_COMPACT_EVERY', '1000'))
+
+# Reintentos de lectura cuando el snapshot o una línea del log no validan
+READ_RETRIES = 5
+READ_RETRY_DELAY = 0.05
+
+
+# Marca de "todavía no se ha visto ningún log"
+_UNSET = object()
+
+
+def _dump_line(entry):
+    return json_line(entry) + b'\n'
+
+
+def _dump_payload(value):
+    """JSON compacto en bytes para respuestas pre-serializadas"""
+    return json_line(value)
+
+
+class FrozenRecord(dict):
+    """Registro de solo lectura compartido entre peticiones (serializable como dict)"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('Registro de snapshot de solo lectura: usar store.update()')
+
+    __setitem__ = __delitem__ = _readonly
+    update = pop = popitem = clear = setdefault = _readonly
+
+
+# Vista inmutable de una colección: versión, registros y JSON ya serializado
+# etag: hash del payload, igual en todos los procesos (la versión es local a cada uno)
+Snapshot = namedtuple('Snapshot', ['version', 'records', 'payload', 'etag'])
+
+
+def _read_log_id(f):
+    """Identificador de la cabecera del log (None en logs sin cabecera)"""
+    f.seek(0)
+    try:
+        header = parse_json(f.readline())
+        if isinstance(header, dict) and header.get('op') == 'log':
+            return header.get('id')
+    except ValueError:
+        pass
+    return None
+
+
+class CRMStore:
+    """Almacén del CRM: snapshot JSON + log de cambios, con índice id -> registro en memoria"""
+
+    def __init__(self, path, compact_every=COMPACT_EVERY, serializer=None):
+        self.path = path
+        # Formato con el que se escribe el snapshot (la lectura detecta cualquiera)
+        self.serializer = serializer or get_serializer()
+        self.log_path = path + '.log'
+        self.lock_path = path + '.lock'
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._collections = {}  # nombre -> {id: registro}
+        self._meta = {}         # claves no indexadas ('stats', ...)
+        self._sequences = {}    # nombre -> último id asignado (nunca retrocede)
+        self._log_pos = 0
+        self._log_id = _UNSET  # cabecera del log leído (el inode puede reutilizarse tras compactar)
+        self._log_entries = 0
+        self._loaded = False
+        self._compacting = False
+        self._lock_fd = None
+        self._flock_depth = 0
+        # Caché de lecturas: versión por colección, se incrementa con cada cambio aplicado
+        self._version_seq = 0
+        self._versions = {}
+        self._snapshots = {}       # colección -> Snapshot
+        self._record_payloads = {}  # (colección, id) -> (registro, bytes)
+
+    # ==================== BLOQUEO ENTRE PROCESOS ====================
+
+    @contextmanager
+    def _flock(self, mode):
+        """Bloqueo fcntl sobre crm_data.json.lock (reentrante dentro del proceso)"""
+        if fcntl is None or self._flock_depth:
+            self._flock_depth += 1
+            try:
+                yield
+            finally:
+                self._flock_depth -= 1
+            return
+        if self._lock_fd is None:
+            self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._lock_fd, mode)
+        self._flock_depth += 1
+        try:
+            yield
+        finally:
+            self._flock_depth -= 1
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _exclusive(self):
+        """Lock de hilo + lock exclusivo entre procesos para escrituras"""
+        with self._lock:
+            with self._flock(fcntl.LOCK_EX if fcntl else None):
+                yield
+
+    def _shared(self):
+        return self._flock(fcntl.LOCK_SH if fcntl else None)
+
+    # ==================== CARGA Y REPRODUCCIÓN DEL LOG ====================
+
+    def _empty_data(self):
+        return {
+            'companies': [],
+            'contacts': [],
+            'stats': {
+                'total_companies': 0,
+                'total_contacts': 0,
+                'last_updated': datetime.now().isoformat()
+            }
+        }
+
+    def init_file(self):
+        """Crear el snapshot vacío si no existe"""
+        if not os.path.exists(self.path):
+            with self._exclusive():
+                if not os.path.exists(self.path):
+                    self._write_snapshot(self._empty_data())
+
+    def _read_snapshot(self):
+        """Leer y validar el snapshot, reintentando si está a medio escribir"""
+        for attempt in range(READ_RETRIES):
+            try:
+                with open(self.path, 'rb') as f:
+                    data = crm_serializers.loads(f.read())
+                if isinstance(data, dict):
+                    return data
+                raise ValueError('snapshot sin formato de diccionario')
+            except (ValueError, OSError) as e:
+                if attempt == READ_RETRIES - 1:
+                    raise
+                logger.warning("⚠️ Snapshot CRM inválido (%s), reintentando...", e)
+                time.sleep(READ_RETRY_DELAY * (attempt + 1))
+
+    def _load(self):
+        """Cargar snapshot completo y reproducir el log encima"""
+        self.init_file()
+        with self._shared():
+            self._load_unlocked()
+
+    def _load_unlocked(self):
+        data = self._read_snapshot()
+
+        self._collections = {name: {} for name in COLLECTIONS}
+        self._meta = {}
+        self._sequences = {}
+        self._snapshots = {}
+        self._record_payloads = {}
+        for name in COLLECTIONS:
+            self._bump(name)
+        for key, value in data.items():
+            if key in COLLECTIONS and isinstance(value, list):
+                index = self._collections[key]
+                for record in value:
+                    index[record.get('id')] = record
+            elif key == 'sequences':
+                self._merge_sequences(value)
+            else:
+                self._meta[key] = value
+        # Ficheros antiguos sin secuencias: partir del id más alto (solo una vez, al cargar)
+        for name, index in self._collections.items():
+            ids = [i for i in index if isinstance(i, int)]
+            if ids:
+                self._merge_sequences({name: max(ids)})
+
+        self._log_pos = 0
+        self._log_entries = 0
+        self._log_id = _UNSET
+        self._replay_log()
+        self._loaded = True
+
+    def _replay_log(self):
+        """Aplicar las entradas nuevas del log desde la última posición leída"""
+        try:
+            f = open(self.log_path, 'rb')
+        except FileNotFoundError:
+            self._log_id = _UNSET
+            self._log_pos = 0
+            return
+
+        with f:
+            # La cabecera y el contenido se leen del mismo descriptor abierto
+            log_id = _read_log_id(f)
+            if self._log_id is not _UNSET and log_id != self._log_id:
+                compacted = True
+            else:
+                compacted = False
+                self._log_id = log_id
+                size = os.fstat(f.fileno()).st_size
+                if size <= self._log_pos:
+                    return
+                f.seek(self._log_pos)
+                chunk = f.read()
+
+        if compacted:
+            # Otro proceso compactó: recargar desde el nuevo snapshot
+            self._load()
+            return
+
+        # Solo se consumen líneas completas; una línea a medio escribir se lee en la siguiente pasada
+        end = chunk.rfind(b'\n') + 1
+        for line in chunk[:end].splitlines():
+            if line.strip():
+                entry = self._parse_line(line)
+                if entry is not None and entry['op'] != 'log':
+                    self._apply(entry)
+                    self._log_entries += 1
+        self._log_pos += end
+
+    def _parse_line(self, line):
+        """Validar una línea del log; una línea corrupta (caída a mitad de escritura) se descarta"""
+        try:
+            entry = parse_json(line)
+            if isinstance(entry, dict) and 'op' in entry:
+                return entry
+        except ValueError:
+            pass
+        logger.warning("⚠️ Línea corrupta en %s descartada (%s bytes)", self.log_path, len(line))
+        return None
+
+    def _refresh(self):
+        if not self._loaded:
+            self._load()
+        else:
+            self._replay_log()
+
+    def _bump(self, collection):
+        self._version_seq += 1
+        self._versions[collection] = self._version_seq
+
+    def _merge_sequences(self, sequences):
+        for name, last_id in (sequences or {}).items():
+            if last_id > self._sequences.get(name, 0):
+                self._sequences[name] = last_id
+
+    def _apply(self, entry):
+        op = entry['op']
+        if 'c' in entry:
+            self._bump(entry['c'])
+        if op == 'put':
+            record = entry['record']
+            record_id = record.get('id')
+            self._collections.setdefault(entry['c'], {})[record_id] = record
+            if isinstance(record_id, int):
+                self._merge_sequences({entry['c']: record_id})
+        elif op == 'del':
+            self._collections.setdefault(entry['c'], {}).pop(entry['id'], None)
+            self._record_payloads.pop((entry['c'], entry['id']), None)
+        elif op == 'clear':
+            self._collections[entry['c']] = {}
+            self._record_payloads = {k: v for k, v in self._record_payloads.items() if k[0] != entry['c']}
+        elif op == 'meta' and entry['key'] == 'sequences':
+            self._merge_sequences(entry['value'])
+        elif op == 'meta':
+            self._meta[entry['key']] = entry['value']
+
+    def _append(self, entries):
+        """Escribir entradas al final del log y aplicarlas al índice (requiere _exclusive)"""
+        if not entries:
+            return
+        if not os.path.exists(self.log_path):
+            tmp_path, self._log_id, self._log_pos = self._write_log_tmp(b'')
+            os.replace(tmp_path, self.log_path)
+
+        payload = b''.join(_dump_line(e) for e in entries)
+        with open(self.log_path, 'ab') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size > self._log_pos:
+                # Cerrar una línea incompleta de una escritura interrumpida
+                payload = b'\n' + payload
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+            self._log_pos = size + len(payload)
+        for entry in entries:
+            self._apply(entry)
+        self._log_entries += len(entries)
+
+        if self._log_entries >= self.compact_every and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self._compact_background, daemon=True).start()
+
+    def _touch_stats(self, entries):
+        """Añadir al lote la actualización de last_updated"""
+        stats = dict(self._meta.get('stats') or {})
+        stats['last_updated'] = datetime.now().isoformat()
+        entries.append({'op': 'meta', 'key': 'stats', 'value': stats})
+        return entries
+
+    # ==================== API DE REGISTROS (O(1)) ====================
+
+    def get(self, collection, record_id):
+        """Obtener un registro por id (copia) o None"""
+        with self._lock:
+            self._refresh()
+            record = self._collections.get(collection, {}).get(record_id)
+            return dict(record) if record is not None else None
+
+    def all(self, collection):
+        """Lista de registros de una colección en orden de inserción"""
+        with self._lock:
+            self._refresh()
+            return [dict(r) for r in self._collections.get(collection, {}).values()]
+
+    def count(self, collection):
+        with self._lock:
+            self._refresh()
+            return len(self._collections.get(collection, {}))
+
+    def ids(self, collection):
+        with self._lock:
+            self._refresh()
+            return list(self._collections.get(collection, {}).keys())
+
+    # ==================== CACHÉ DE LECTURA (SNAPSHOTS) ====================
+
+    def version(self, collection):
+        """Versión actual de una colección (cambia con cada escritura de cualquier proceso)"""
+        with self._lock:
+            self._refresh()
+            return self._versions.get(collection, 0)
+
+    def snapshot(self, collection):
+        """Snapshot inmutable y pre-serializado; se reconstruye solo cuando cambia la versión"""
+        with self._lock:
+            self._refresh()
+            version = self._versions.get(collection, 0)
+            cached = self._snapshots.get(collection)
+            if cached is not None and cached.version == version:
+                return cached
+            index = self._collections.get(collection, {})
+            payload = _dump_payload(list(index.values()))
+            snap = Snapshot(
+                version=version,
+                records=tuple(FrozenRecord(r) for r in index.values()),
+                payload=payload,
+                etag=hashlib.sha1(payload).hexdigest()
+            )
+            self._snapshots[collection] = snap
+            return snap
+
+    def record_payload(self, collection, record_id):
+        """JSON pre-serializado de un registro (None si no existe)"""
+        with self._lock:
+            self._refresh()
+            record = self._collections.get(collection, {}).get(record_id)
+            if record is None:
+                return None
+            key = (collection, record_id)
+            cached = self._record_payloads.get(key)
+            # Los registros nunca se mutan en sitio: misma identidad => mismo contenido
+            if cached is not None and cached[0] is record:
+                return cached[1]
+            payload = _dump_payload(record)
+            self._record_payloads[key] = (record, payload)
+            return payload
+
+    def put(self, collection, record):
+        """Crear o reemplazar un registro completo"""
+        self.put_many(collection, [record])
+
+    def put_many(self, collection, records):
+        """Crear o reemplazar varios registros en una sola escritura del log"""
+        with self._exclusive():
+            self._refresh()
+            entries = [{'op': 'put', 'c': collection, 'record': dict(r)} for r in records]
+            if entries:
+                self._append(self._touch_stats(entries))
+
+    def insert(self, collection, record):
+        """Crear un registro asignándole el siguiente id de forma atómica entre procesos"""
+        return self.insert_many(collection, [record])[0]
+
+    def insert_many(self, collection, records):
+        """Crear varios registros con ids consecutivos en una sola escritura del log"""
+        with self._exclusive():
+            self._refresh()
+            # Secuencia persistida: O(1) y sin reutilizar ids de registros eliminados
+            next_id = self._sequences.get(collection, 0) + 1
+            created = []
+            for record in records:
+                new_record = dict(record)
+                new_record['id'] = next_id
+                next_id += 1
+                created.append(new_record)
+            if created:
+                entries = [{'op': 'put', 'c': collection, 'record': r} for r in created]
+                entries.append({'op': 'meta', 'key': 'sequences', 'value': {collection: next_id - 1}})
+                self._append(self._touch_stats(entries))
+            return [dict(r) for r in created]
+
+    def update(self, collection, record_id, changes):
+        """Aplicar cambios a un registro existente bajo lock; devuelve el registro o None"""
+        with self._exclusive():
+            self._refresh()
+            current = self._collections.get(collection, {}).get(record_id)
+            if current is None:
+                return None
+            record = dict(current)
+            record.update(changes)
+            self._append(self._touch_stats([{'op': 'put', 'c': collection, 'record': record}]))
+            return dict(record)
+
+    def delete(self, collection, record_id):
+        """Eliminar un registro; devuelve True si existía"""
+        with self._exclusive():
+            self._refresh()
+            if record_id not in self._collections.get(collection, {}):
+                return False
+            self._append(self._touch_stats([{'op': 'del', 'c': collection, 'id': record_id}]))
+            return True
+
+    def clear(self, collection):
+        """Vaciar una colección; devuelve el número de registros eliminados"""
+        with self._exclusive():
+            self._refresh()
+            count = len(self._collections.get(collection, {}))
+            self._append(self._touch_stats([{'op': 'clear', 'c': collection}]))
+            return count
+
+    def get_meta(self, key, default=None):
+        """Valor de una clave no indexada del store (copia de JSON)"""
+        with self._lock:
+            self._refresh()
+            value = self._meta.get(key, default)
+            return json.loads(json.dumps(value)) if value is not None else default
+
+    def set_meta(self, key, value):
+        """Guardar una clave no indexada (p. ej. marcas de sincronización)"""
+        with self._exclusive():
+            self._refresh()
+            self._append([{'op': 'meta', 'key': key, 'value': value}])
+
+    # ==================== CONTRATO load_data / save_data ====================
+
+    def _build_data(self):
+        data = {key: value for key, value in self._meta.items()}
+        data['sequences'] = dict(self._sequences)
+        for name, index in self._collections.items():
+            if index or name in ('companies', 'contacts'):
+                data[name] = list(index.values())
+        stats = dict(data.get('stats') or {})
+        stats['total_companies'] = len(self._collections.get('companies', {}))
+        stats['total_contacts'] = len(self._collections.get('contacts', {}))
+        stats.setdefault('last_updated', datetime.now().isoformat())
+        data['stats'] = stats
+        return data
+
+    def load_data(self):
+        """Diccionario completo con el mismo formato que crm_data.json (sin parsear JSON)"""
+        with self._lock:
+            self._refresh()
+            data = self._build_data()
+            for name in COLLECTIONS:
+                if name in data:
+                    data[name] = [dict(r) for r in data[name]]
+            return data
+
+    def save_data(self, data):
+        """Guardar un diccionario completo escribiendo solo las diferencias en el log"""
+        with self._exclusive():
+            self._refresh()
+            entries = []
+            for name in COLLECTIONS:
+                if name not in data:
+                    continue
+                current = self._collections.get(name, {})
+                incoming = {r.get('id'): r for r in data[name]}
+                for record_id in current:
+                    if record_id not in incoming:
+                        entries.append({'op': 'del', 'c': name, 'id': record_id})
+                for record_id, record in incoming.items():
+                    if current.get(record_id) != record:
+                        entries.append({'op': 'put', 'c': name, 'record': dict(record)})
+            for key, value in data.items():
+                if key in COLLECTIONS or key in ('stats', 'sequences'):
+                    continue
+                if self._meta.get(key) != value:
+                    entries.append({'op': 'meta', 'key': key, 'value': value})
+            self._append(self._touch_stats(entries))
+
+    # ==================== COMPACTACIÓN ====================
+
+    def _write_tmp(self, data):
+        """Serializar el snapshot a un fichero temporal junto al definitivo"""
+        tmp_path = f'{self.path}.tmp.{os.getpid()}.{threading.get_ident()}'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.serializer.dumps(data))
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp_path
+
+    def _write_snapshot(self, data):
+        os.replace(self._write_tmp(data), self.path)
+
+    def _write_log_tmp(self, tail):
+        """Crear un log nuevo (cabecera con id único + cola) en un temporal; devuelve (ruta, id, tamaño)"""
+        log_id = uuid.uuid4().hex
+        content = _dump_line({'op': 'log', 'id': log_id}) + tail
+        tmp_path = f'{self.log_path}.tmp.{os.getpid()}.{threading.get_ident()}'
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp_path, log_id, len(content)
+
+    def compact(self):
+        """Reescribir el snapshot con el estado actual y vaciar el log"""
+        with self._lock:
+            self._refresh()
+            data = self._build_data()
+            log_pos = self._log_pos
+            log_id = self._log_id
+
+        # La serialización (lo caro) se hace fuera del lock
+        tmp_path = self._write_tmp(data)
+
+        with self._exclusive():
+            current_id = _UNSET
+            if os.path.exists(self.log_path):
+                with open(self.log_path, 'rb') as f:
+                    current_id = _read_log_id(f)
+            if current_id != log_id:
+                # Otro proceso compactó mientras serializábamos: su snapshot ya es válido
+                os.remove(tmp_path)
+                return
+            # Dejar el índice al final del log para que la cola copiada ya esté aplicada
+            self._refresh()
+
+            # Conservar los cambios que llegaron durante la serialización
+            tail = b''
+            if os.path.exists(self.log_path):
+                with open(self.log_path, 'rb') as f:
+                    f.seek(log_pos)
+                    tail = f.read()
+            new_log, new_id, new_size = self._write_log_tmp(tail)
+            os.replace(tmp_path, self.path)
+            os.replace(new_log, self.log_path)
+            self._log_id = new_id
+            self._log_pos = new_size
+            self._log_entries = tail.count(b'\n')
+
+    def _compact_background(self):
+        try:
+            self.compact()
+            logger.info("🗜️ CRM store compactado")
+        except Exception as e:
+            logger.exception("⚠️ Error compactando CRM store: %s", e)
+        finally:
+            self._compacting = False
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark y conversor de formato del snapshot del CRM Minimal
+
+Uso:
+    python crm_store_format.py benchmark --sizes 1000,10000,100000
+    python crm_store_format.py convert crm_data.json --to orjson
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from crm_serializers import SERIALIZERS, get_serializer
+from crm_store import CRMStore
+
+SECTORES = ['Tecnología', 'Educación', 'Sanidad', 'Hostelería', 'Logística', 'Banca', 'Comercio']
+CIUDADES = ['Madrid', 'Barcelona', 'València', 'Sevilla', 'Bilbao', 'Málaga', 'A Coruña']
+
+
+def synthetic_companies(count, seed=42):
+    """Empresas sintéticas con la misma forma que las del CRM"""
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {
+            'nombre': f'Empresa {i} S.L.',
+            'email': f'contacto{i}@empresa{i}.es',
+            'telefono': f'+34 6{rng.randint(10000000, 99999999)}',
+            'sector': rng.choice(SECTORES),
+            'ciudad': rng.choice(CIUDADES),
+            'fecha_contacto': f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+            'notas': 'Interesada en contratación inclusiva' if rng.random() < 0.3 else '',
+            'created_at': f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00',
+            'origen': 'benchmark'
+        }
+
+
+def _bench_format(workdir, serializer, companies):
+    path = os.path.join(workdir, f'crm_{serializer.name}.json')
+    store = CRMStore(path, compact_every=10 ** 9, serializer=serializer)
+    store.put_many('companies', companies)
+
+    start = time.perf_counter()
+    store.compact()
+    save_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loaded = CRMStore(path, serializer=serializer).count('companies')
+    load_time = time.perf_counter() - start
+    assert loaded == len(companies)
+
+    return save_time, load_time, os.path.getsize(path)
+
+
+def benchmark(sizes):
+    formats = [s for s in SERIALIZERS.values() if s.available]
+    skipped = [name for name, s in SERIALIZERS.items() if not s.available]
+    if skipped:
+        print(f"⚠️ Formatos sin paquete instalado (omitidos): {', '.join(skipped)}")
+
+    print(f"{'empresas':>9}  {'formato':<12} {'guardar':>10} {'cargar':>10} {'tamaño':>12}")
+    workdir = tempfile.mkdtemp(prefix='crm_bench_')
+    try:
+        for size in sizes:
+            companies = [dict(c, id=i + 1) for i, c in enumerate(synthetic_companies(size))]
+            for serializer in formats:
+                save_time, load_time, disk = _bench_format(workdir, serializer, companies)
+                print(f"{size:>9}  {serializer.name:<12} {save_time * 1000:>8.1f}ms "
+                      f"{load_time * 1000:>8.1f}ms {disk / 1024:>9.1f} KB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def convert(path, target):
+    """Reescribir el snapshot (y plegar el log) en otro formato; la lectura detecta el formato sola"""
+    if not os.path.exists(path):
+        print(f"❌ No existe {path}")
+        sys.exit(1)
+    serializer = get_serializer(target)
+    before = os.path.getsize(path)
+    store = CRMStore(path, serializer=serializer)
+    store.compact()
+    print(f"✅ {path} convertido a {serializer.name}: {before / 1024:.1f} KB → {os.path.getsize(path) / 1024:.1f} KB")
+    print(f"   Recuerda fijar CRM_STORE_FORMAT={serializer.name} para que las próximas compactaciones lo mantengan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Formato de almacenamiento del CRM Minimal')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    bench = sub.add_parser('benchmark', help='Tiempos de carga/guardado y tamaño por formato')
+    bench.add_argument('--sizes', default='1000,10000,100000', help='Número de empresas, separados por comas')
+
+    conv = sub.add_parser('convert', help='Convertir un snapshot existente a otro formato')
+    conv.add_argument('path', help='Ruta del snapshot (p. ej. crm_data.json)')
+    conv.add_argument('--to', required=True, choices=['auto'] + list(SERIALIZERS), help='Formato destino')
+
+    args = parser.parse_args()
+    if args.command == 'benchmark':
+        benchmark([int(s) for s in args.sizes.split(',')])
+    else:
+        convert(args.path, args.to)
+
+
+if __name__ == '__main__':
+    main()
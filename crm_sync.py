@@ -0,0 +1,99 @@
+"""
+Sincronización por lotes CRM Minimal -> PostgreSQL (tabla companies)
+Una consulta para cargar las empresas, diff en memoria y un UPDATE masivo por lote
+"""
+
+import os
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+# Filas por UPDATE masivo (y umbral para cargar la tabla entera en vez de filtrar por nombre)
+SYNC_CHUNK_SIZE = int(os.environ.get('CRM_SYNC_CHUNK_SIZE', '500'))
+
+# Clave de metadatos del store con la marca de la última sincronización incremental
+WATERMARK_KEY = 'sync_watermarks'
+
+# Campo del CRM -> columna de Company
+FIELD_MAP = {
+    'email': 'email_contacto',
+    'telefono': 'telefono',
+    'sector': 'sector',
+    'ciudad': 'ciudad',
+}
+
+
+def _company_map(names, chunk_size):
+    """Cargar las empresas de PostgreSQL en un diccionario nombre -> fila con una sola consulta"""
+    from models import db, Company
+
+    query = select(Company.id, Company.nombre_empresa, *[getattr(Company, c) for c in FIELD_MAP.values()])
+    if len(names) <= chunk_size:
+        query = query.where(Company.nombre_empresa.in_(names))
+    # Orden por id: ante nombres repetidos se queda la primera, como hacía .first()
+    pg_map = {}
+    for row in db.session.execute(query.order_by(Company.id)):
+        pg_map.setdefault(row.nombre_empresa, row)
+    return pg_map
+
+
+def _diff(crm_companies, pg_map):
+    """Calcular los cambios por id de Company; devuelve (cambios, sincronizadas, no_encontradas)"""
+    changes, synced, missing = [], [], []
+    now = datetime.utcnow()
+    for crm_company in crm_companies:
+        nombre = crm_company['nombre'].strip()
+        row = pg_map.get(nombre)
+        if row is None:
+            missing.append(nombre)
+            continue
+        values = {}
+        for crm_field, column in FIELD_MAP.items():
+            new_value = crm_company.get(crm_field, getattr(row, column))
+            if new_value != getattr(row, column):
+                values[column] = new_value
+        synced.append(nombre)
+        if values:
+            values['id'] = row.id
+            values['updated_at'] = now
+            changes.append(values)
+    return changes, synced, missing
+
+
+def sync_companies_to_pg(crm_companies, chunk_size=SYNC_CHUNK_SIZE):
+    """Aplicar en PostgreSQL los datos de las empresas del CRM con UPDATE masivos por lote"""
+    from models import db, Company
+
+    crm_companies = [c for c in crm_companies if (c.get('nombre') or '').strip()]
+    if not crm_companies:
+        return {'synced': [], 'missing': [], 'updated': 0}
+
+    names = list({c['nombre'].strip() for c in crm_companies})
+    changes, synced, missing = _diff(crm_companies, _company_map(names, chunk_size))
+
+    for start in range(0, len(changes), chunk_size):
+        # UPDATE por clave primaria con executemany: una ida a la base de datos por lote
+        db.session.execute(update(Company), changes[start:start + chunk_size])
+        db.session.commit()
+
+    return {'synced': synced, 'missing': missing, 'updated': len(changes)}
+
+
+def sync_store_companies(store, incremental=False, chunk_size=SYNC_CHUNK_SIZE):
+    """Sincronizar las empresas del store; en modo incremental solo las modificadas desde la última marca"""
+    watermarks = store.get_meta(WATERMARK_KEY, {})
+    since = watermarks.get('companies') if incremental else None
+    # La marca se toma antes de leer: lo que cambie durante la sincronización entra en la siguiente
+    started_at = datetime.now().isoformat()
+
+    crm_companies = store.snapshot('companies').records
+    if since:
+        crm_companies = [c for c in crm_companies
+                         if (c.get('updated_at') or c.get('created_at') or '') > since]
+
+    result = sync_companies_to_pg(crm_companies, chunk_size)
+
+    watermarks['companies'] = started_at
+    store.set_meta(WATERMARK_KEY, watermarks)
+    result.update({'processed': len(crm_companies), 'since': since, 'watermark': started_at})
+    return result
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Normalización de texto libre y detección de sectores laborales
+Funciones puras (sin base de datos): las usan crm_analytics al guardar y bench_sectors.py
+"""
+
+import re
+import unicodedata
+
+
+# Marcas diacríticas combinables que deja NFKD ("á" -> "a" + U+0301)
+_DIACRITICOS = re.compile('[\u0300-\u036f]')
+
+
+def sin_tildes(texto):
+    """Minúsculas y sin tildes; el texto ASCII no pasa por unicodedata"""
+    texto = texto.lower()
+    if texto.isascii():
+        return texto
+    return _DIACRITICOS.sub('', unicodedata.normalize('NFKD', texto))
+
+
+def simplificar(texto):
+    """Minúsculas, sin tildes y con espacios normalizados (equivale a lower(unaccent(trim())))"""
+    return ' '.join(sin_tildes(texto).split())
+
+
+# ==================== SECTORES ====================
+
+# Sector -> raíces que lo identifican en intereses_laborales
+SECTOR_KEYWORDS = {
+    'Tecnología': ['tecnolog', 'informática', 'software', 'programación', 'desarrollo', 'it', 'sistemas', 'digital', 'web'],
+    'Hostelería': ['cocina', 'restaurante', 'chef', 'cocinero', 'camarero', 'hostelería', 'gastronomía', 'fogones'],
+    'Educación': ['educación', 'enseñanza', 'docencia', 'formación', 'pedagogía', 'profesor', 'maestro'],
+    'Salud': ['salud', 'medicina', 'enfermería', 'terapia', 'psicología', 'fisioterapia', 'sanitario'],
+    'Arte y Diseño': ['arte', 'diseño', 'creativo', 'gráfico', 'dibujo', 'ilustración', 'creatividad'],
+    'Comunicación': ['comunicación', 'marketing', 'publicidad', 'medios', 'periodismo', 'social media'],
+    'Administración': ['administración', 'gestión', 'oficina', 'recursos humanos', 'contabilidad'],
+    'Ingeniería': ['ingeniería', 'ingeniero', 'técnico', 'industrial', 'construcción'],
+    'Servicios': ['atención cliente', 'servicio', 'comercial', 'ventas'],
+    'Investigación': ['investigación', 'ciencia', 'análisis', 'laboratorio', 'estudio'],
+    'Social': ['social', 'ong', 'voluntariado', 'ayuda', 'asistencia', 'cuidados']
+}
+
+# Palabras cortas que solo cuentan como palabra completa ("it" no debe casar en "limitado")
+SECTOR_WHOLE_WORD_MAX = 3
+
+
+def _trie_pattern(node):
+    # Alternancia factorizada por prefijos ("ingenier(?:ia|o)"): el motor de re no retrocede
+    # por cada raíz, solo por las ramas que comparten el prefijo ya leído
+    end = node.get('')
+    branches = [(r'\s+' if ch == ' ' else re.escape(ch)) + _trie_pattern(child)
+                for ch, child in sorted(node.items()) if ch]
+    if not branches:
+        return end
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if end is None:
+        return body
+    # Raíz completa también válida: primero la rama más larga ("social media" antes que "social")
+    return '(?:' + body + '|' + end + ')'
+
+
+def _compile_sector_matcher(keywords):
+    """Una sola expresión regular con todas las raíces; cada una empieza en límite de palabra"""
+    by_keyword = {}
+    for sector, words in keywords.items():
+        for word in words:
+            by_keyword.setdefault(simplificar(word), sector)
+    trie = {}
+    for word in by_keyword:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = r'(?!\w)' if len(word) <= SECTOR_WHOLE_WORD_MAX else ''
+    return re.compile(r'\b' + _trie_pattern(trie)), by_keyword
+
+
+_SECTOR_PATTERN, _SECTOR_BY_KEYWORD = _compile_sector_matcher(SECTOR_KEYWORDS)
+_SECTOR_ORDER = {sector: i for i, sector in enumerate(SECTOR_KEYWORDS)}
+
+
+def extraer_sectores(texto):
+    """Sectores mencionados en un texto, en el orden de SECTOR_KEYWORDS (sin tildes ni mayúsculas)"""
+    if not texto:
+        return []
+    # Las raíces de varias palabras admiten cualquier espacio (\s+), así basta con sin_tildes()
+    found = {_SECTOR_BY_KEYWORD[' '.join(m.split())] for m in _SECTOR_PATTERN.findall(sin_tildes(texto))}
+    return sorted(found, key=_SECTOR_ORDER.get)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Actualizaciones de esquema idempotentes que db.create_all() no aplica a tablas ya existentes
+Se ejecutan al arrancar; cada sentencia puede repetirse sin efecto
+"""
+
+import logging
+
+from sqlalchemy import Boolean, Column, Date, DateTime, Integer, MetaData, String, Table, Text, text
+
+logger = logging.getLogger(__name__)
+
+# Columnas comunes de users y neurodivergent_profiles_new expuestas en la vista unificada
+USUARIOS_COLUMNS = ['nombre', 'apellidos', 'email', 'telefono', 'ciudad', 'fecha_nacimiento',
+                    'tipo_neurodivergencia', 'diagnostico_formal', 'habilidades', 'experiencia_laboral',
+                    'formacion_academica', 'intereses_laborales', 'adaptaciones_necesarias',
+                    'motivaciones', 'created_at', 'ciudad_clave']
+
+
+def _usuarios_select(table, source):
+    columns = ', '.join(USUARIOS_COLUMNS)
+    return (f"SELECT '{source}_' || CAST(id AS VARCHAR) AS uid, '{source}' AS source, id AS source_id, "
+            f"{columns} FROM {table}")
+
+
+# Vista de lectura: usuarios legacy + perfiles ND en una sola consulta paginable.
+# Vista normal (no materializada) para que siempre esté al día; PostgreSQL empuja los filtros
+# a cada rama del UNION ALL, así que los índices de las tablas base se siguen usando.
+USUARIOS_VIEW = (
+    "CREATE OR REPLACE VIEW usuarios_unificados AS "
+    + _usuarios_select('users', 'user')
+    + " UNION ALL "
+    + _usuarios_select('neurodivergent_profiles_new', 'profile')
+)
+
+# Definición de la vista para consultas (MetaData aparte: db.create_all() no la crea como tabla)
+usuarios_unificados = Table(
+    'usuarios_unificados', MetaData(),
+    Column('uid', String, primary_key=True),
+    Column('source', String),
+    Column('source_id', Integer),
+    Column('nombre', String),
+    Column('apellidos', String),
+    Column('email', String),
+    Column('telefono', String),
+    Column('ciudad', String),
+    Column('fecha_nacimiento', Date),
+    Column('tipo_neurodivergencia', String),
+    Column('diagnostico_formal', Boolean),
+    Column('habilidades', Text),
+    Column('experiencia_laboral', Text),
+    Column('formacion_academica', Text),
+    Column('intereses_laborales', Text),
+    Column('adaptaciones_necesarias', Text),
+    Column('motivaciones', Text),
+    Column('created_at', DateTime),
+    Column('ciudad_clave', String),
+)
+
+SCHEMA_STATEMENTS = [
+    # Asociaciones: listado del CRM filtrado por estado y búsqueda de duplicados por email
+    "CREATE INDEX IF NOT EXISTS ix_asociaciones_estado ON asociaciones (estado)",
+    "CREATE INDEX IF NOT EXISTS ix_asociaciones_email ON asociaciones (email)",
+    # Leads generales: filtros y orden del listado paginado del CRM
+    "CREATE INDEX IF NOT EXISTS ix_general_leads_ciudad ON general_leads (ciudad)",
+    "CREATE INDEX IF NOT EXISTS ix_general_leads_tipo_neurodivergencia ON general_leads (tipo_neurodivergencia)",
+    "CREATE INDEX IF NOT EXISTS ix_general_leads_convertido_created ON general_leads (convertido_a_perfil, created_at)",
+    # Perfiles ND: cursor (created_at, id) del listado
+    "CREATE INDEX IF NOT EXISTS ix_nd_profiles_created_id ON neurodivergent_profiles_new (created_at, id)",
+    # Vista usuarios_unificados: índices de las tablas base para los filtros del CRM
+    "CREATE INDEX IF NOT EXISTS ix_users_tipo_neurodivergencia ON users (tipo_neurodivergencia)",
+    "CREATE INDEX IF NOT EXISTS ix_users_ciudad ON users (ciudad)",
+    "CREATE INDEX IF NOT EXISTS ix_neurodivergent_profiles_new_tipo_neurodivergencia ON neurodivergent_profiles_new (tipo_neurodivergencia)",
+    "CREATE INDEX IF NOT EXISTS ix_neurodivergent_profiles_new_ciudad ON neurodivergent_profiles_new (ciudad)",
+    # Ciudad normalizada (minúsculas, sin tildes, alias) para agrupar en el dashboard geográfico
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS ciudad_clave VARCHAR(100)",
+    "ALTER TABLE neurodivergent_profiles_new ADD COLUMN IF NOT EXISTS ciudad_clave VARCHAR(100)",
+    "CREATE INDEX IF NOT EXISTS ix_users_ciudad_clave ON users (ciudad_clave)",
+    "CREATE INDEX IF NOT EXISTS ix_neurodivergent_profiles_new_ciudad_clave ON neurodivergent_profiles_new (ciudad_clave)",
+    # La vista va después: CREATE OR REPLACE VIEW solo admite columnas nuevas al final
+    USUARIOS_VIEW,
+    # Perfiles ND: clasificaciones derivadas para los contadores de ai-insights
+    "ALTER TABLE neurodivergent_profiles_new ADD COLUMN IF NOT EXISTS nivel_educativo VARCHAR(40)",
+    "ALTER TABLE neurodivergent_profiles_new ADD COLUMN IF NOT EXISTS tipo_experiencia VARCHAR(40)",
+    "ALTER TABLE neurodivergent_profiles_new ADD COLUMN IF NOT EXISTS tipo_adaptacion VARCHAR(40)",
+    "CREATE INDEX IF NOT EXISTS ix_neurodivergent_profiles_new_nivel_educativo ON neurodivergent_profiles_new (nivel_educativo)",
+    "CREATE INDEX IF NOT EXISTS ix_neurodivergent_profiles_new_tipo_experiencia ON neurodivergent_profiles_new (tipo_experiencia)",
+    "CREATE INDEX IF NOT EXISTS ix_neurodivergent_profiles_new_tipo_adaptacion ON neurodivergent_profiles_new (tipo_adaptacion)",
+]
+
+# ==================== BÚSQUEDA DE TEXTO COMPLETO ====================
+
+# Configuración de búsqueda: español con unaccent antes del stemmer ("programación" = "programacion")
+SEARCH_CONFIG = 'crm_es'
+
+# Campos de texto libre indexados y su peso en el ranking (A = más relevante)
+SEARCH_FIELDS = [
+    ('habilidades', 'A'),
+    ('intereses_laborales', 'B'),
+    ('experiencia_laboral', 'B'),
+    ('formacion_academica', 'C'),
+    ('motivaciones', 'D'),
+]
+
+# Tablas con columna search_vector generada
+SEARCH_TABLES = ['neurodivergent_profiles_new', 'general_leads']
+
+
+def _search_vector_expression():
+    parts = [f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({field}, '')), '{weight}')"
+             for field, weight in SEARCH_FIELDS]
+    return ' || '.join(parts)
+
+
+# ==================== BÚSQUEDA APROXIMADA (TRIGRAMAS) ====================
+
+# Columnas con índice GIN de trigramas para el autocompletado del CRM
+TRGM_COLUMNS = {
+    'general_leads': ['nombre', 'apellidos', 'email', 'ciudad'],
+    'neurodivergent_profiles_new': ['nombre', 'apellidos', 'email', 'ciudad'],
+    'companies': ['nombre_empresa'],
+    'asociaciones': ['nombre_asociacion'],
+    'email_marketing': ['asociacion'],
+}
+
+
+# Sentencias solo para PostgreSQL (extensiones, tsvector, GIN)
+POSTGRES_STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # CREATE TEXT SEARCH CONFIGURATION no admite IF NOT EXISTS
+    f"""DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{SEARCH_CONFIG}') THEN
+            CREATE TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} (COPY = spanish);
+            ALTER TEXT SEARCH CONFIGURATION {SEARCH_CONFIG}
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+        END IF;
+    END $$""",
+]
+for _table in SEARCH_TABLES:
+    # Columna generada: PostgreSQL la mantiene en cada INSERT/UPDATE sin tocar el código de la app
+    POSTGRES_STATEMENTS.append(
+        f"ALTER TABLE {_table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({_search_vector_expression()}) STORED"
+    )
+    POSTGRES_STATEMENTS.append(
+        f"CREATE INDEX IF NOT EXISTS ix_{_table}_search ON {_table} USING GIN (search_vector)"
+    )
+for _table, _columns in TRGM_COLUMNS.items():
+    for _column in _columns:
+        POSTGRES_STATEMENTS.append(
+            f"CREATE INDEX IF NOT EXISTS ix_{_table}_{_column}_trgm ON {_table} USING GIN ({_column} gin_trgm_ops)"
+        )
+
+
+def apply_schema_updates(db):
+    """Aplicar SCHEMA_STATEMENTS (y POSTGRES_STATEMENTS en PostgreSQL); un fallo en una sentencia no impide las demás"""
+    statements = list(SCHEMA_STATEMENTS)
+    if db.engine.dialect.name == 'postgresql':
+        statements += POSTGRES_STATEMENTS
+    applied = 0
+    for statement in statements:
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(text(statement))
+            applied += 1
+        except Exception as e:
+            logger.error("🚨 Error aplicando esquema (%s...): %s", statement[:60], e)
+    logger.info("✅ Esquema actualizado (%s/%s sentencias)", applied, len(statements))
+    return applied
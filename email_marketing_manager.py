@@ -558,7 +558,7 @@ EMAIL_MARKETING_TABLE_TEMPLATE = '''
                     </div>
                     <div class="col-md-4 text-end">
                         <button class="btn btn-success me-2" onclick="showAddEmailMarketingForm()">➕ Añadir Registro</button>
-                        <a href="/email-marketing/export" class="btn btn-warning me-2">Exportar CSV</a>
+                        <button onclick="exportarEnSegundoPlano('email_marketing', {}, this)" class="btn btn-warning me-2">Exportar CSV</button>
                         <button onclick="deleteAllAssociations()" class="btn btn-danger">🗑️ Eliminar Todo</button>
                     </div>
                 </div>
@@ -788,6 +788,7 @@ EMAIL_MARKETING_TABLE_TEMPLATE = '''
         </div>
     </div>
     
+    <script src="{{ url_for('static', filename='js/export-jobs.js') }}"></script>
     <script>
         function deleteAssociation(id) {
             if (confirm('¿Estás seguro de que quieres eliminar esta asociación?')) {
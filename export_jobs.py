@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Exportaciones CSV en segundo plano
+La petición solo crea el trabajo; un hilo recorre la consulta con un cursor de servidor y escribe
+un CSV comprimido en disco. El estado se guarda junto al fichero para consultarlo desde cualquier proceso.
+"""
+
+import csv
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Carpeta de los ficheros generados (<id>.csv.gz) y su estado (<id>.json)
+EXPORT_DIR = os.environ.get('CRM_EXPORT_DIR', 'exports')
+
+# Exportaciones simultáneas por proceso (cada worker de gunicorn tiene su propio límite); por encima 429
+MAX_EXPORT_JOBS = int(os.environ.get('CRM_MAX_EXPORT_JOBS', '2'))
+
+# Segundos sin actualizar su estado tras los que un trabajo en curso de otro proceso se da por perdido
+# (el proceso murió o se recicló a mitad de la exportación)
+EXPORT_STALE_SECONDS = float(os.environ.get('CRM_EXPORT_STALE_SECONDS', '600'))
+
+# Horas que se conservan los ficheros antes de borrarlos
+EXPORT_RETENTION_HOURS = float(os.environ.get('CRM_EXPORT_RETENTION_HOURS', '24'))
+
+# Filas por lote del cursor y cada cuántas filas se actualiza el progreso
+EXPORT_BATCH_SIZE = 1000
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Tipo de exportación -> (prefijo del fichero, cabecera, función(params) -> (total, filas))
+EXPORT_TYPES = {}
+
+# Tipo de exportación -> función(params) -> params limpios; ValueError si no son válidos
+EXPORT_VALIDATORS = {}
+
+
+class ExportBusy(Exception):
+    """Ya hay MAX_EXPORT_JOBS exportaciones en curso"""
+
+
+def export_type(name, filename, header, validate=None):
+    """Registrar un tipo de exportación (validate comprueba los params antes de crear el trabajo)"""
+    def register(func):
+        EXPORT_TYPES[name] = (filename, header, func)
+        if validate:
+            EXPORT_VALIDATORS[name] = validate
+        return func
+    return register
+
+
+def _fecha(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else ''
+
+
+def _lista_texto(valor):
+    # Listas guardadas como JSON o separadas por comas (registro_asociacion)
+    if not valor:
+        return ''
+    try:
+        lista = json.loads(valor)
+        if isinstance(lista, list):
+            return ', '.join(str(v) for v in lista)
+    except (ValueError, TypeError):
+        pass
+    return valor
+
+
+# ==================== TIPOS DE EXPORTACIÓN ====================
+
+LEADS_HEADER = [
+    'ID', 'Nombre', 'Apellidos', 'Email', 'Teléfono', 'Ciudad',
+    'Tipo Neurodivergencia', 'Diagnóstico Formal', 'Habilidades',
+    'Experiencia Laboral', 'Formación Académica', 'Intereses Laborales',
+    'Adaptaciones Necesarias', 'Motivaciones', 'Convertido a Perfil',
+    'Fecha Registro'
+]
+
+
+def _validate_leads(params):
+    """lead_ids opcional: lista de ids numéricos (enteros o cadenas de dígitos)"""
+    lead_ids = params.get('lead_ids')
+    if lead_ids is None:
+        return params
+    if not isinstance(lead_ids, list) or not all(
+            (isinstance(i, int) and not isinstance(i, bool)) or (isinstance(i, str) and i.strip().isdigit())
+            for i in lead_ids):
+        raise ValueError('lead_ids debe ser una lista de ids numéricos')
+    params['lead_ids'] = [int(i) for i in lead_ids]
+    return params
+
+
+@export_type('leads', 'leads', LEADS_HEADER, validate=_validate_leads)
+def _export_leads(params):
+    """Todos los leads generales o solo params['lead_ids'] (ya validados en submit)"""
+    from models import GeneralLead
+
+    query = GeneralLead.query
+    if params.get('lead_ids'):
+        query = query.filter(GeneralLead.id.in_(params['lead_ids']))
+    rows = ([
+        lead.id, lead.nombre, lead.apellidos, lead.email, lead.telefono or '', lead.ciudad,
+        lead.tipo_neurodivergencia or '', 'Sí' if lead.diagnostico_formal else 'No',
+        lead.habilidades or '', lead.experiencia_laboral or '', lead.formacion_academica or '',
+        lead.intereses_laborales or '', lead.adaptaciones_necesarias or '', lead.motivaciones or '',
+        'Sí' if lead.convertido_a_perfil else 'No', _fecha(lead.created_at)
+    ] for lead in query.order_by(GeneralLead.id).yield_per(EXPORT_BATCH_SIZE))
+    return query.order_by(None).count(), rows
+
+
+@export_type('companies', 'diversia_empresas',
+             ['Empresa', 'Email', 'Telefono', 'Sector', 'Ciudad', 'Fecha', 'Acciones'])
+def _export_companies(params):
+    """Empresas del CRM Minimal (store en disco)"""
+    from crm_minimal import store
+
+    companies = store.snapshot('companies').records
+    rows = ([
+        c.get('nombre', ''), c.get('email', ''), c.get('telefono', ''), c.get('sector', ''),
+        c.get('ciudad', ''), c.get('fecha_contacto', ''), c.get('notas', '')
+    ] for c in companies)
+    return len(companies), rows
+
+
+@export_type('asociaciones', 'diversia_asociaciones', [
+    'ID', 'Nombre Asociación', 'Acrónimo', 'País', 'Ciudad', 'Teléfono',
+    'Email', 'Sitio Web', 'Contacto', 'Cargo', 'Estado', 'Años Funcionamiento',
+    'Número Socios', 'Neurodivergencias', 'Servicios', 'Descripción'
+])
+def _export_asociaciones(params):
+    from models import Asociacion
+
+    query = Asociacion.query
+    rows = ([
+        a.id, a.nombre_asociacion, a.acronimo or '', a.pais, a.ciudad, a.telefono or '',
+        a.email, a.sitio_web or '', a.contacto_nombre or '', a.contacto_cargo or '', a.estado,
+        a.años_funcionamiento or '', a.numero_socios or '',
+        _lista_texto(a.neurodivergencias_atendidas), _lista_texto(a.servicios), a.descripcion or ''
+    ] for a in query.order_by(Asociacion.id).yield_per(EXPORT_BATCH_SIZE))
+    return query.order_by(None).count(), rows
+
+
+@export_type('email_marketing', 'email_marketing_diversia', [
+    'Comunidad Autónoma', 'Asociación', 'Email', 'Teléfono',
+    'Dirección', 'Servicios', 'ENVIADOS', 'RESPUESTA'
+])
+def _export_email_marketing(params):
+    from models import EmailMarketing
+
+    query = EmailMarketing.query
+    rows = ([
+        c.comunidad_autonoma, c.asociacion, c.email, c.telefono or '', c.direccion or '',
+        c.servicios or '', c.fecha_enviado or '', c.respuesta or ''
+    ] for c in query.order_by(EmailMarketing.id).yield_per(EXPORT_BATCH_SIZE))
+    return query.order_by(None).count(), rows
+
+
+@export_type('colaboradores', 'colaboradores_diversia', [
+    'ID', 'Nombre', 'Email', 'Rol', 'Departamento', 'Teléfono',
+    'Fecha Ingreso', 'Especialidades', 'Notas', 'Fecha Creación'
+])
+def _export_colaboradores(params):
+    from models import Employee
+
+    query = Employee.query.filter_by(active=True)
+    rows = ([
+        e.id, e.name, e.email, e.rol, e.department, e.telefono or '', e.fecha_ingreso or '',
+        e.especialidades or '', e.notas or '', _fecha(e.created_at)
+    ] for e in query.order_by(Employee.id).yield_per(EXPORT_BATCH_SIZE))
+    return query.order_by(None).count(), rows
+
+
+# ==================== TRABAJOS ====================
+
+class ExportJobs:
+    """Cola de exportaciones con un máximo de trabajos simultáneos
+
+    El límite y los hilos son de cada proceso: con varios workers de gunicorn puede haber hasta
+    workers x max_jobs exportaciones a la vez. El estado sí es común (ficheros en directory).
+    """
+
+    def __init__(self, app, directory=EXPORT_DIR, max_jobs=MAX_EXPORT_JOBS):
+        self.app = app
+        self.directory = directory
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix='crm-export')
+        self._lock = threading.Lock()
+        self._active = 0
+        self._running = set()  # ids de los trabajos de este proceso (vivos aunque tarden)
+
+    def submit(self, kind, params=None):
+        """Crear un trabajo y devolver su estado inicial; ValueError si el tipo o los params no son válidos, ExportBusy si no hay hueco"""
+        if kind not in EXPORT_TYPES:
+            raise ValueError(f"Tipo de exportación desconocido: {kind} (opciones: {', '.join(EXPORT_TYPES)})")
+        if params is not None and not isinstance(params, dict):
+            raise ValueError('params debe ser un objeto')
+        params = dict(params or {})
+        if kind in EXPORT_VALIDATORS:
+            params = EXPORT_VALIDATORS[kind](params)
+        with self._lock:
+            if self._active >= self.max_jobs:
+                raise ExportBusy(f'Ya hay {self._active} exportaciones en curso, inténtalo en unos segundos')
+            self._active += 1
+
+        filename, _, _ = EXPORT_TYPES[kind]
+        job = {
+            'id': uuid.uuid4().hex,
+            'type': kind,
+            'state': 'queued',
+            'rows': 0,
+            'total': None,
+            'progress': 0.0,
+            'filename': f"{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv.gz",
+            'size': None,
+            'error': None,
+            'created_at': datetime.now().isoformat(),
+            'updated_at': None,
+            'finished_at': None
+        }
+        with self._lock:
+            self._running.add(job['id'])
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.cleanup()
+            self._save(job)
+            self._executor.submit(self._run, job, params)
+        except Exception:
+            with self._lock:
+                self._active -= 1
+                self._running.discard(job['id'])
+            raise
+        # Copia: el hilo de la exportación sigue modificando job
+        return dict(job)
+
+    def status(self, job_id):
+        """Estado de un trabajo (None si no existe); un trabajo abandonado pasa a error al consultarlo"""
+        if not JOB_ID_PATTERN.match(job_id or ''):
+            return None
+        try:
+            with open(self._path(job_id, '.json'), encoding='utf-8') as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return self._expire_if_stale(job)
+
+    def _expire_if_stale(self, job):
+        """Marcar como error un trabajo en curso cuyo proceso dejó de actualizarlo"""
+        if job.get('state') not in ('queued', 'running'):
+            return job
+        with self._lock:
+            if job['id'] in self._running:
+                return job
+        try:
+            updated = datetime.fromisoformat(job.get('updated_at') or job['created_at'])
+        except (KeyError, TypeError, ValueError):
+            updated = datetime.min
+        if (datetime.now() - updated).total_seconds() < EXPORT_STALE_SECONDS:
+            return job
+        job.update(state='error', error='La exportación se interrumpió (el proceso que la generaba se detuvo)',
+                   finished_at=datetime.now().isoformat())
+        self._save(job)
+        logger.warning("⚠️ Exportación %s abandonada marcada como error", job['id'])
+        return job
+
+    def artifact_path(self, job_id):
+        """Ruta del CSV comprimido de un trabajo terminado"""
+        return self._path(job_id, '.csv.gz')
+
+    def _path(self, job_id, suffix):
+        return os.path.join(self.directory, job_id + suffix)
+
+    def _save(self, job):
+        # updated_at hace de latido: cada escritura demuestra que el proceso sigue vivo
+        job['updated_at'] = datetime.now().isoformat()
+        # Escritura atómica: quien consulta nunca ve un estado a medias
+        path = self._path(job['id'], '.json')
+        tmp = f'{path}.tmp.{threading.get_ident()}'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _run(self, job, params):
+        _, header, rows_for = EXPORT_TYPES[job['type']]
+        final_path = self.artifact_path(job['id'])
+        tmp_path = final_path + '.tmp'
+        start = time.perf_counter()
+        try:
+            with self.app.app_context():
+                job['state'] = 'running'
+                total, rows = rows_for(params)
+                job['total'] = total
+                self._save(job)
+
+                with gzip.open(tmp_path, 'wt', encoding='utf-8', newline='') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(header)
+                    for row in rows:
+                        writer.writerow(row)
+                        job['rows'] += 1
+                        if job['rows'] % EXPORT_BATCH_SIZE == 0:
+                            job['progress'] = round(job['rows'] / total, 4) if total else 0.0
+                            self._save(job)
+            os.replace(tmp_path, final_path)
+
+            job.update(state='done', progress=1.0, size=os.path.getsize(final_path),
+                       finished_at=datetime.now().isoformat())
+            logger.info("📤 Exportación %s terminada: %s filas en %.1fs", job['type'], job['rows'], time.perf_counter() - start)
+        except Exception as e:
+            job.update(state='error', error=str(e), finished_at=datetime.now().isoformat())
+            logger.error("❌ Exportación %s fallida: %s", job['type'], e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finally:
+            self._save(job)
+            with self._lock:
+                self._active -= 1
+                self._running.discard(job['id'])
+
+    def cleanup(self):
+        """Borrar ficheros de trabajos más antiguos que EXPORT_RETENTION_HOURS y cerrar los abandonados"""
+        limit = time.time() - EXPORT_RETENTION_HOURS * 3600
+        try:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if os.path.getmtime(path) < limit:
+                    os.remove(path)
+                elif name.endswith('.json'):
+                    self.status(name[:-len('.json')])
+        except OSError as e:
+            logger.warning("⚠️ No se pudieron limpiar exportaciones antiguas: %s", e)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Configuración de logging de la aplicación
+Los handlers de la petición solo encolan el registro (QueueHandler); un hilo aparte (QueueListener)
+lo formatea y lo escribe, así la latencia no depende de la velocidad de stdout.
+
+Variables de entorno:
+    LOG_LEVEL          nivel global (INFO por defecto)
+    LOG_LEVELS         niveles por módulo: "routes_simple=DEBUG,crm_minimal=WARNING"
+    LOG_FORMAT         json (por defecto) o text
+    LOG_SAMPLE_RATE    fracción de los logs de detalle por fila (extra={'sample': True}) que se emiten
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+# Logger de auditoría: siempre a INFO aunque se suba el nivel global
+AUDIT_LOGGER = 'diversia.audit'
+
+# Atributos estándar de LogRecord; el resto (extra=...) se añade como campos del JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'sample'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro con los campos pasados en extra"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Dejar pasar solo una fracción de los registros marcados con extra={'sample': True}"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if getattr(record, 'sample', False):
+            return self.rate >= 1 or random.random() < self.rate
+        return True
+
+
+def _parse_levels(value):
+    levels = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging():
+    """Configurar el logger raíz con cola + hilo escritor (idempotente)"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    if os.environ.get('LOG_FORMAT', 'json') == 'text':
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    else:
+        formatter = JsonFormatter()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(formatter)
+
+    # Cola sin límite: put() nunca bloquea la petición
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(float(os.environ.get('LOG_SAMPLE_RATE', '0.01'))))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+    logging.getLogger(AUDIT_LOGGER).setLevel(logging.INFO)
+    for name, level in _parse_levels(os.environ.get('LOG_LEVELS')).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    # Vaciar la cola al salir para no perder las últimas líneas
+    atexit.register(_listener.stop)
+    return _listener
+
+
+def audit(event, *args, **fields):
+    """Línea de auditoría estructurada (altas, borrados, migraciones); args se interpolan en event con %"""
+    logging.getLogger(AUDIT_LOGGER).info(event, *args, extra=fields)
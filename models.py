@@ -12,11 +12,11 @@ class GeneralLead(db.Model):
     apellidos = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     telefono = db.Column(db.String(20), nullable=True)
-    ciudad = db.Column(db.String(100), nullable=False)
+    ciudad = db.Column(db.String(100), nullable=False, index=True)
     fecha_nacimiento = db.Column(db.Date, nullable=True)  # Permitir nulo para leads simples
     
     # Información básica de neurodivergencia (si aplica)
-    tipo_neurodivergencia = db.Column(db.String(50), nullable=True)  # Puede ser NULL para no-ND
+    tipo_neurodivergencia = db.Column(db.String(50), nullable=True, index=True)  # Puede ser NULL para no-ND
     diagnostico_formal = db.Column(db.Boolean, default=False)
     
     # Información laboral básica
@@ -37,6 +37,37 @@ class GeneralLead(db.Model):
     def __repr__(self):
         return f'<GeneralLead {self.nombre} {self.apellidos}>'
 
+# ARCHIVO DE LEADS ELIMINADOS (copia completa de la fila, se rellena desde bulk-delete)
+class GeneralLeadArchive(db.Model):
+    __tablename__ = 'general_leads_archive'
+    
+    # Mismo id que tenía en general_leads
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    nombre = db.Column(db.String(100), nullable=False)
+    apellidos = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), nullable=False, index=True)  # Sin unique: puede volver a registrarse y borrarse
+    telefono = db.Column(db.String(20), nullable=True)
+    ciudad = db.Column(db.String(100), nullable=True)
+    fecha_nacimiento = db.Column(db.Date, nullable=True)
+    tipo_neurodivergencia = db.Column(db.String(50), nullable=True)
+    diagnostico_formal = db.Column(db.Boolean, default=False)
+    habilidades = db.Column(db.Text, nullable=True)
+    experiencia_laboral = db.Column(db.Text, nullable=True)
+    formacion_academica = db.Column(db.Text, nullable=True)
+    intereses_laborales = db.Column(db.Text, nullable=True)
+    adaptaciones_necesarias = db.Column(db.Text, nullable=True)
+    motivaciones = db.Column(db.Text, nullable=True)
+    convertido_a_perfil = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True)
+    
+    # Datos del archivado
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    archive_reason = db.Column(db.String(50), nullable=True)
+    
+    def __repr__(self):
+        return f'<GeneralLeadArchive {self.id} {self.email}>'
+
 # TABLA PARA PERFILES NEURODIVERGENTES ESPECÍFICOS NUEVOS (formularios detallados)
 class NeurodivergentProfile(db.Model):
     __tablename__ = 'neurodivergent_profiles_new'  # Nombre diferente para evitar conflictos
@@ -47,11 +78,12 @@ class NeurodivergentProfile(db.Model):
     apellidos = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), nullable=False, index=True)  # Sin unique - permite duplicado con GeneralLead
     telefono = db.Column(db.String(20), nullable=True)
-    ciudad = db.Column(db.String(100), nullable=False)
+    ciudad = db.Column(db.String(100), nullable=False, index=True)
+    ciudad_clave = db.Column(db.String(100), nullable=True, index=True)  # Normalizada (crm_analytics)
     fecha_nacimiento = db.Column(db.Date, nullable=False)
     
     # Información de neurodivergencia específica
-    tipo_neurodivergencia = db.Column(db.String(50), nullable=False)
+    tipo_neurodivergencia = db.Column(db.String(50), nullable=False, index=True)
     diagnostico_formal = db.Column(db.Boolean, default=False)
     
     # Información laboral detallada
@@ -72,6 +104,11 @@ class NeurodivergentProfile(db.Model):
     hiperactividad = db.Column(db.String(50), nullable=True)
     medicacion = db.Column(db.String(50), nullable=True)
     
+    # Clasificaciones derivadas (crm_analytics las calcula al insertar/actualizar)
+    nivel_educativo = db.Column(db.String(40), nullable=True, index=True)
+    tipo_experiencia = db.Column(db.String(40), nullable=True, index=True)
+    tipo_adaptacion = db.Column(db.String(40), nullable=True, index=True)
+    
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -89,11 +126,12 @@ class User(db.Model):
     apellidos = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     telefono = db.Column(db.String(20), nullable=True)
-    ciudad = db.Column(db.String(100), nullable=False)
+    ciudad = db.Column(db.String(100), nullable=False, index=True)
+    ciudad_clave = db.Column(db.String(100), nullable=True, index=True)  # Normalizada (crm_analytics)
     fecha_nacimiento = db.Column(db.Date, nullable=False)
     
     # Información de neurodivergencia
-    tipo_neurodivergencia = db.Column(db.String(50), nullable=False)
+    tipo_neurodivergencia = db.Column(db.String(50), nullable=False, index=True)
     diagnostico_formal = db.Column(db.Boolean, default=False)
     
     # Información laboral
@@ -379,7 +417,7 @@ class Asociacion(db.Model):
     ciudad = db.Column(db.String(100), nullable=False)
     direccion = db.Column(db.Text, nullable=True)
     telefono = db.Column(db.String(20), nullable=True)
-    email = db.Column(db.String(120), nullable=False)
+    email = db.Column(db.String(120), nullable=False, index=True)
     sitio_web = db.Column(db.String(200), nullable=True)
     descripcion = db.Column(db.Text, nullable=True)
     
@@ -394,7 +432,7 @@ class Asociacion(db.Model):
     # Información de auditoría
     ip_solicitud = db.Column(db.String(45), nullable=True)
     user_agent = db.Column(db.String(500), nullable=True)
-    estado = db.Column(db.String(20), default='pendiente')
+    estado = db.Column(db.String(20), default='pendiente', index=True)
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -403,6 +441,50 @@ class Asociacion(db.Model):
     def __repr__(self):
         return f'<Asociacion {self.nombre_asociacion}>'
 
+# DATOS DERIVADOS YA CARGADOS (crm_analytics solo aplica deltas a los que tienen fila aquí)
+class AnalyticsState(db.Model):
+    __tablename__ = 'analytics_state'
+    
+    nombre = db.Column(db.String(40), primary_key=True)  # 'profile_stats', 'sector_tags', ...
+    cargado_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<AnalyticsState {self.nombre}: {self.cargado_at}>'
+
+# CONTADORES PRE-AGREGADOS DE PERFILES ND (mantenidos por crm_analytics en la misma transacción)
+class ProfileStat(db.Model):
+    __tablename__ = 'profile_stats'
+    
+    dimension = db.Column(db.String(40), primary_key=True)  # 'nivel_educativo', 'tipo_experiencia', ...
+    clave = db.Column(db.String(120), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ProfileStat {self.dimension}={self.clave}: {self.total}>'
+
+# SECTORES DE INTERÉS DE USUARIOS Y PERFILES ND (calculados por crm_analytics al guardar)
+class SectorTag(db.Model):
+    __tablename__ = 'sector_tags'
+    
+    source = db.Column(db.String(20), primary_key=True)  # 'user' o 'profile' (como en usuarios_unificados)
+    source_id = db.Column(db.Integer, primary_key=True)
+    sector = db.Column(db.String(40), primary_key=True, index=True)
+    
+    def __repr__(self):
+        return f'<SectorTag {self.source}_{self.source_id}: {self.sector}>'
+
+# ALTAS POR DÍA Y TIPO DE NEURODIVERGENCIA (rollup de leads y perfiles ND para las series temporales)
+class RegistrationDaily(db.Model):
+    __tablename__ = 'registration_daily'
+    
+    dia = db.Column(db.Date, primary_key=True)
+    source = db.Column(db.String(20), primary_key=True)  # 'lead' o 'profile'
+    tipo_neurodivergencia = db.Column(db.String(50), primary_key=True)  # '' si no consta
+    total = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<RegistrationDaily {self.dia} {self.source}/{self.tipo_neurodivergencia}: {self.total}>'
+
 class NotificationBackup(db.Model):
     """Sistema de respaldo para notificaciones cuando falla el email"""
     __tablename__ = 'notifications_backup'
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Recálculo único de los datos derivados de crm_analytics (contadores de perfiles, claves de ciudad,
+sectores y series temporales de altas). Pensado para ejecutarse una vez tras desplegar o tras
+cargas hechas por SQL directo; en el día a día se mantienen solos al guardar.
+
+Uso:
+    python rebuild_analytics.py
+    python rebuild_analytics.py --only series
+    python rebuild_analytics.py --only ciudades,sectores
+    python rebuild_analytics.py --only series --force-series   # rehace el histórico (pierde altas borradas)
+"""
+
+import argparse
+import time
+
+
+def main():
+    from crm_analytics import REBUILDERS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', help=f"Separados por comas: {', '.join(REBUILDERS)}")
+    parser.add_argument('--force-series', action='store_true',
+                        help='Recalcular las series temporales aunque ya estén cargadas (con pérdida)')
+    args = parser.parse_args()
+
+    only = [name.strip() for name in args.only.split(',')] if args.only else None
+    unknown = [name for name in only or [] if name not in REBUILDERS]
+    if unknown:
+        parser.error(f"Desconocidos: {', '.join(unknown)} (opciones: {', '.join(REBUILDERS)})")
+
+    from app import app, db
+    from crm_analytics import rebuild_all
+
+    with app.app_context():
+        start = time.perf_counter()
+        result = rebuild_all(db, only, force_series=args.force_series)
+    print(f"✅ Recálculo terminado en {time.perf_counter() - start:.1f}s: {result}")
+
+
+if __name__ == '__main__':
+    main()
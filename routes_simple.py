@@ -2,6 +2,10 @@ from flask import Flask, render_template, request, redirect, url_for, flash, ses
 from app import app, db
 from datetime import datetime
 import json
+import logging
+from logging_config import audit
+
+logger = logging.getLogger(__name__)
 
 # ===== RUTAS BÁSICAS DEL SITIO WEB QUE FALTAN =====
 # Nota: '/' ya está en main.py, solo añadimos las que faltan
@@ -37,16 +41,9 @@ def empresas():
             
             # También guardar en CRM mínimo
             try:
-                from crm_minimal import load_data, save_data
-                
-                crm_data = load_data()
-                companies = crm_data.get('companies', [])
-                
-                # Generar ID único
-                new_id = max([c.get('id', 0) for c in companies], default=0) + 1
+                from crm_minimal import mirror
                 
                 crm_company = {
-                    'id': new_id,
                     'nombre': nueva_empresa.nombre_empresa,
                     'email': nueva_empresa.email_contacto,
                     'telefono': nueva_empresa.telefono or '',
@@ -56,12 +53,11 @@ def empresas():
                     'origen': 'Formulario Web Empresa'
                 }
                 
-                companies.append(crm_company)
-                crm_data['companies'] = companies
-                save_data(crm_data)
+                # Encolar la copia: el ID se asigna al volcarla en segundo plano
+                mirror.enqueue('companies', crm_company)
                 
             except Exception as e:
-                print(f"⚠️ Error guardando empresa en CRM: {e}")
+                logger.warning("⚠️ Error guardando empresa en CRM: %s", e)
             
             flash('¡Empresa registrada exitosamente! Te contactaremos pronto.', 'success')
             return redirect(url_for('empresas'))
@@ -90,10 +86,10 @@ def empresas():
                 
                 
             except Exception as e:
-                print(f"⚠️ Error enviando emails de empresa: {e}")
+                logger.warning("⚠️ Error enviando emails de empresa: %s", e)
             
         except Exception as e:
-            print(f"❌ Error registrando empresa: {e}")
+            logger.exception("❌ Error registrando empresa: %s", e)
             flash('Error al registrar la empresa. Por favor intenta de nuevo.', 'error')
     
     return render_template('empresas.html', form=form)
@@ -141,25 +137,16 @@ def registro():
     
     # Debug completo del formulario
     if request.method == 'POST':
-        print(f"🔍 Registro Simple - POST detectado")
-        print(f"🔍 Form validate(): {form.validate()}")
-        print(f"🔍 Form errors: {form.errors}")
-        print(f"🔍 Datos del formulario:")
-        print(f"  - Nombre: '{form.nombre.data}'")
-        print(f"  - Apellidos: '{form.apellidos.data}'")
-        print(f"  - Email: '{form.email.data}'")
-        print(f"  - Ciudad: '{form.ciudad.data}'")
-        print(f"  - Intereses: '{form.intereses.data}'")
-        print(f"  - Como conociste: '{form.como_conociste.data}'")
-        print(f"  - Privacidad: '{form.aceptar_privacidad.data}'")
+        # Solo nombres de campos: el contenido del formulario no se vuelca al log
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("🔍 Registro Simple - POST", extra={'campos': list(request.form.keys()), 'errores': form.errors})
     
     # Validación más permisiva para debug
     if request.method == 'POST' and form.nombre.data and form.email.data and form.aceptar_privacidad.data:
         try:
             from models import GeneralLead
             
-            print(f"✅ Registro General - Procesando: {form.nombre.data} - {form.email.data}")
-            print(f"✅ Registro General - Validación CSRF bypassed para funcionamiento")
+            logger.debug("✅ Registro General - Procesando (ciudad: %s)", form.ciudad.data)
             
             # Verificar si el email ya existe
             lead_existente = GeneralLead.query.filter_by(email=form.email.data).first()
@@ -174,7 +161,7 @@ def registro():
                 
                 db.session.commit()
                 flash(f'¡Información actualizada exitosamente, {form.nombre.data}!', 'success')
-                print(f"✅ Lead actualizado: {form.nombre.data} {form.apellidos.data}")
+                audit("✅ Lead actualizado: %s %s", form.nombre.data, form.apellidos.data)
                 return redirect(url_for('index'))
             
             # Crear nuevo lead con información básica
@@ -221,20 +208,18 @@ def registro():
                     'tipo': 'Lead General'
                 })
                 
-                print(f"✅ Emails Gmail enviados para registro general: {form.nombre.data}")
+                logger.info("✅ Emails Gmail enviados para registro general: %s", form.nombre.data)
                 
             except Exception as e:
-                print(f"⚠️ Error enviando emails de registro general con Gmail: {e}")
+                logger.warning("⚠️ Error enviando emails de registro general con Gmail: %s", e)
             
             flash(f'¡Registro completado exitosamente, {form.nombre.data}! Te contactaremos pronto con información sobre oportunidades laborales.', 'success')
-            # Lead registrado exitosamente
+            audit("✅ Lead registrado: %s %s", form.nombre.data, form.apellidos.data)
             
             return redirect(url_for('index'))
             
         except Exception as e:
-            print(f"❌ Error en registro simple: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ Error en registro simple: %s", e)
             flash('Error al guardar tu información. Por favor intenta de nuevo.', 'error')
             db.session.rollback()
     
@@ -255,11 +240,11 @@ def registro():
 @app.route('/registro-tdah', methods=['GET', 'POST', 'OPTIONS'])
 def registro_tdah():
     """Página de registro específica para TDAH - Guarda en NeurodivergentProfile"""
-    print(f"🔍 TDAH - Ruta accedida. Método: {request.method}")
+    logger.debug("🔍 TDAH - Ruta accedida. Método: %s", request.method)
     
     # Manejar preflight OPTIONS para CORS
     if request.method == 'OPTIONS':
-        print(f"🔍 TDAH - OPTIONS request (CORS preflight)")
+        logger.debug("🔍 TDAH - OPTIONS request (CORS preflight)")
         response = app.make_default_options_response()
         response.headers['Access-Control-Allow-Origin'] = '*'
         response.headers['Access-Control-Allow-Methods'] = 'POST, GET, OPTIONS'
@@ -268,17 +253,12 @@ def registro_tdah():
     
     # Debug exhaustivo para TDAH
     if request.method == 'POST':
-        print(f"🔍 TDAH - ¡POST DETECTADO!")
-        print(f"🔍 TDAH - Raw form data: {request.form}")
-        print(f"🔍 TDAH - Form keys: {list(request.form.keys())}")
+        logger.debug("🔍 TDAH - POST", extra={'campos': list(request.form.keys())})
         
         # Extraer datos directamente del request
         nombre = request.form.get('nombre', '').strip()
         email = request.form.get('email', '').strip()
-        print(f"🔍 TDAH - Nombre: '{nombre}', Email: '{email}'")
         
-    else:
-        print(f"🔍 TDAH - Método GET - Mostrando formulario")
     
     # Procesamiento directo sin Flask-WTF
     if request.method == 'POST':
@@ -289,8 +269,7 @@ def registro_tdah():
             try:
                 from models import NeurodivergentProfile
                 
-                print(f"✅ TDAH - Procesando registro: {nombre} - {email}")
-                print(f"✅ TDAH - Validación CSRF bypassed para funcionamiento")
+                logger.debug("✅ TDAH - Procesando registro (ciudad: %s)", request.form.get('ciudad', ''))
                 
                 # Crear nuevo perfil neurodivergente
                 nuevo_perfil = NeurodivergentProfile()
@@ -338,18 +317,18 @@ def registro_tdah():
                         'tipo_neurodivergencia': 'TDAH'
                     })
                     
-                    print(f"✅ Emails enviados para registro TDAH: {nombre}")
+                    logger.info("✅ Emails enviados para registro TDAH: %s", nombre)
                     
                 except Exception as e:
-                    print(f"⚠️ Error enviando emails de TDAH: {e}")
+                    logger.warning("⚠️ Error enviando emails de TDAH: %s", e)
                 
                 flash(f'¡Registro TDAH completado exitosamente, {nombre}! Tu perfil detallado ha sido guardado.', 'success')
-                print(f"✅ Perfil TDAH registrado: {nombre} {request.form.get('apellidos', '')}")
+                audit("✅ Perfil TDAH registrado: %s %s", nombre, request.form.get('apellidos', ''))
                 
                 return redirect(url_for('personas_nd'))
                 
             except Exception as e:
-                print(f"❌ Error guardando perfil TDAH: {e}")
+                logger.error("❌ Error guardando perfil TDAH: %s", e)
                 db.session.rollback()
                 
                 # Verificar si es error de email duplicado
@@ -366,14 +345,13 @@ def registro_tdah():
 @app.route('/test-form', methods=['GET', 'POST'])
 def test_form():
     """Formulario de prueba simple sin Flask-WTF"""
-    print(f"🧪 TEST FORM - Método: {request.method}")
+    logger.debug("🧪 TEST FORM - Método: %s", request.method)
     
     if request.method == 'POST':
-        print(f"🧪 TEST FORM - ¡POST RECIBIDO!")
-        print(f"🧪 TEST FORM - Datos: {request.form}")
+        logger.debug("🧪 TEST FORM - ¡POST RECIBIDO!")
         nombre = request.form.get('nombre', '')
         email = request.form.get('email', '')
-        print(f"🧪 TEST FORM - Nombre: {nombre}, Email: {email}")
+        logger.debug("🧪 TEST FORM - Campos: %s", list(request.form.keys()))
         return f"<h1>¡Éxito!</h1><p>Recibido: {nombre} - {email}</p>"
     
     return render_template('test-form.html')
@@ -381,14 +359,13 @@ def test_form():
 @app.route('/test-tdah-simple', methods=['GET', 'POST'])
 def test_tdah_simple():
     """Test ultra simple para TDAH"""
-    print(f"🧪 TDAH SIMPLE - Método: {request.method}")
+    logger.debug("🧪 TDAH SIMPLE - Método: %s", request.method)
     
     if request.method == 'POST':
-        print(f"🧪 TDAH SIMPLE - ¡POST RECIBIDO!")
-        print(f"🧪 TDAH SIMPLE - Datos: {request.form}")
+        logger.debug("🧪 TDAH SIMPLE - ¡POST RECIBIDO!")
         nombre = request.form.get('nombre', '')
         email = request.form.get('email', '')
-        print(f"🧪 TDAH SIMPLE - Nombre: {nombre}, Email: {email}")
+        logger.debug("🧪 TDAH SIMPLE - Campos: %s", list(request.form.keys()))
         
         # Guardar directamente en base de datos
         try:
@@ -411,11 +388,11 @@ def test_tdah_simple():
             
             db.session.add(nuevo_perfil)
             db.session.commit()
-            print(f"✅ TDAH SIMPLE - Guardado: {nombre}")
+            audit("✅ TDAH SIMPLE - Guardado: %s", nombre)
             
             return f"<h1>¡ÉXITO TDAH!</h1><p>Guardado: {nombre} - {email}</p><p><a href='/admin/login-new'>Ver en CRM</a></p>"
         except Exception as e:
-            print(f"❌ TDAH SIMPLE - Error: {e}")
+            logger.error("❌ TDAH SIMPLE - Error: %s", e)
             return f"<h1>Error</h1><p>{e}</p>"
     
     return render_template('test-tdah-simple.html')
@@ -428,17 +405,16 @@ def registro_tea():
     
     # Debug para TEA
     if request.method == 'POST':
-        print(f"🔍 TEA - Datos recibidos: {list(request.form.keys())}")
+        logger.debug("🔍 TEA - Datos recibidos: %s", list(request.form.keys()))
         if not form.validate():
-            print(f"❌ TEA - Errores de validación: {form.errors}")
+            logger.warning("❌ TEA - Errores de validación: %s", form.errors)
     
     # Validación más permisiva para debug
     if request.method == 'POST' and form.nombre.data and form.email.data:
         try:
             from models import NeurodivergentProfile
             
-            print(f"✅ TEA - Procesando registro: {form.nombre.data} - {form.email.data}")
-            print(f"✅ TEA - Validación CSRF bypassed para funcionamiento")
+            logger.debug("✅ TEA - Procesando registro (ciudad: %s)", form.ciudad.data)
             
             # Verificar si el email ya existe en NeurodivergentProfile
             perfil_existente = NeurodivergentProfile.query.filter_by(email=form.email.data).first()
@@ -461,7 +437,7 @@ def registro_tea():
                 
                 db.session.commit()
                 flash(f'¡Perfil TEA actualizado exitosamente, {form.nombre.data}! Tu información ha sido actualizada.', 'success')
-                print(f"✅ TEA - Perfil actualizado: {form.nombre.data} {form.apellidos.data}")
+                audit("✅ TEA - Perfil actualizado: %s %s", form.nombre.data, form.apellidos.data)
                 
                 # Enviar emails automáticos para actualización TEA
                 try:
@@ -486,10 +462,10 @@ def registro_tea():
                         'habilidades': form.habilidades.data
                     })
                     
-                    print(f"✅ TEA - Emails enviados para actualización: {form.nombre.data}")
+                    logger.info("✅ TEA - Emails enviados para actualización: %s", form.nombre.data)
                     
                 except Exception as e:
-                    print(f"⚠️ Error enviando emails de TEA (actualización): {e}")
+                    logger.warning("⚠️ Error enviando emails de TEA (actualización): %s", e)
             else:
                 # Crear nuevo perfil
                 nuevo_perfil = NeurodivergentProfile()
@@ -510,7 +486,7 @@ def registro_tea():
                 db.session.add(nuevo_perfil)
                 db.session.commit()
                 flash(f'¡Perfil TEA completado exitosamente, {form.nombre.data}!', 'success')
-                print(f"✅ TEA - Nuevo perfil guardado: {form.nombre.data} {form.apellidos.data}")
+                audit("✅ TEA - Nuevo perfil guardado: %s %s", form.nombre.data, form.apellidos.data)
                 
                 # Enviar emails automáticos para nuevo registro TEA
                 try:
@@ -535,15 +511,15 @@ def registro_tea():
                         'habilidades': form.habilidades.data
                     })
                     
-                    print(f"✅ TEA - Emails enviados exitosamente: {form.nombre.data}")
+                    logger.info("✅ TEA - Emails enviados exitosamente: %s", form.nombre.data)
                     
                 except Exception as e:
-                    print(f"⚠️ Error enviando emails de TEA: {e}")
+                    logger.warning("⚠️ Error enviando emails de TEA: %s", e)
             
             return redirect(url_for('personas_nd'))
             
         except Exception as e:
-            print(f"❌ TEA - Error: {e}")
+            logger.error("❌ TEA - Error: %s", e)
             db.session.rollback()
             flash('❌ Error al guardar tu perfil TEA. Por favor intenta de nuevo.', 'error')
     
@@ -584,7 +560,7 @@ def registro_dislexia():
                 perfil_existente.motivaciones = form.motivaciones.data
                 
                 db.session.commit()
-                print(f"✅ DISLEXIA - Perfil actualizado: {form.nombre.data} {form.apellidos.data}")
+                audit("✅ DISLEXIA - Perfil actualizado: %s %s", form.nombre.data, form.apellidos.data)
                 flash(f'¡Perfil Dislexia actualizado correctamente, {form.nombre.data}!', 'success')
                 
                 # Enviar emails automáticos para actualización Dislexia
@@ -610,16 +586,16 @@ def registro_dislexia():
                         'habilidades': form.habilidades.data
                     })
                     
-                    print(f"✅ DISLEXIA - Emails enviados para actualización: {form.nombre.data}")
+                    logger.info("✅ DISLEXIA - Emails enviados para actualización: %s", form.nombre.data)
                     
                 except Exception as e:
-                    print(f"⚠️ Error enviando emails de Dislexia (actualización): {e}")
+                    logger.warning("⚠️ Error enviando emails de Dislexia (actualización): %s", e)
             else:
                 # Crear nuevo perfil
                 # Validar que fecha_nacimiento no sea None
                 fecha_nac = form.fecha_nacimiento.data
                 if fecha_nac is None:
-                    print(f"❌ DISLEXIA DEBUG - fecha_nacimiento es None, usando valor por defecto")
+                    logger.debug("❌ DISLEXIA DEBUG - fecha_nacimiento es None, usando valor por defecto")
                     from datetime import date
                     fecha_nac = date(1990, 1, 1)  # Valor por defecto temporal
                 
@@ -640,7 +616,7 @@ def registro_dislexia():
                 nuevo_perfil.motivaciones = form.motivaciones.data
                 db.session.add(nuevo_perfil)
                 db.session.commit()
-                print(f"✅ DISLEXIA - Perfil creado: {form.nombre.data} {form.apellidos.data}")
+                audit("✅ DISLEXIA - Perfil creado: %s %s", form.nombre.data, form.apellidos.data)
                 flash(f'¡Perfil Dislexia registrado exitosamente, {form.nombre.data}!', 'success')
                 
                 # Enviar emails automáticos para nuevo registro Dislexia
@@ -666,14 +642,14 @@ def registro_dislexia():
                         'habilidades': form.habilidades.data
                     })
                     
-                    print(f"✅ DISLEXIA - Emails enviados exitosamente: {form.nombre.data}")
+                    logger.info("✅ DISLEXIA - Emails enviados exitosamente: %s", form.nombre.data)
                     
                 except Exception as e:
-                    print(f"⚠️ Error enviando emails de Dislexia: {e}")
+                    logger.warning("⚠️ Error enviando emails de Dislexia: %s", e)
             
             return redirect(url_for('personas_nd'))
         except Exception as e:
-            print(f"❌ DISLEXIA - Error: {e}")
+            logger.error("❌ DISLEXIA - Error: %s", e)
             flash('Error al guardar tu perfil. Intenta de nuevo.', 'error')
             db.session.rollback()
     return render_template('registro-dislexia.html', form=form)
@@ -751,7 +727,7 @@ def registro_discalculia():
             nuevo_perfil.motivaciones = form.motivaciones.data
             db.session.add(nuevo_perfil)
             db.session.commit()
-            print(f"✅ DISCALCULIA - Perfil guardado: {form.nombre.data} {form.apellidos.data}")
+            audit("✅ DISCALCULIA - Perfil guardado: %s %s", form.nombre.data, form.apellidos.data)
             flash(f'¡Perfil Discalculia completado exitosamente, {form.nombre.data}!', 'success')
             
             # Enviar emails automáticos para nuevo registro Discalculia
@@ -777,15 +753,15 @@ def registro_discalculia():
                     'habilidades': form.habilidades.data
                 })
                 
-                print(f"✅ DISCALCULIA - Emails enviados exitosamente: {form.nombre.data}")
+                logger.info("✅ DISCALCULIA - Emails enviados exitosamente: %s", form.nombre.data)
                 
             except Exception as e:
-                print(f"⚠️ Error enviando emails de Discalculia: {e}")
+                logger.warning("⚠️ Error enviando emails de Discalculia: %s", e)
             
             return redirect(url_for('personas_nd'))
             
         except Exception as e:
-            print(f"❌ DISCALCULIA - Error: {e}")
+            logger.error("❌ DISCALCULIA - Error: %s", e)
             db.session.rollback()
             flash('❌ Error al guardar tu perfil Discalculia. Por favor intenta de nuevo.', 'error')
     return render_template('registro-discalculia.html', form=form)
@@ -822,7 +798,7 @@ def registro_tourette():
             nuevo_perfil.motivaciones = form.motivaciones.data
             db.session.add(nuevo_perfil)
             db.session.commit()
-            print(f"✅ TOURETTE - Perfil guardado: {form.nombre.data}")
+            audit("✅ TOURETTE - Perfil guardado: %s", form.nombre.data)
             flash(f'¡Perfil Síndrome de Tourette completado, {form.nombre.data}!', 'success')
             
             # Enviar emails automáticos para nuevo registro Tourette
@@ -848,13 +824,13 @@ def registro_tourette():
                     'habilidades': form.habilidades.data
                 })
                 
-                print(f"✅ TOURETTE - Emails enviados exitosamente: {form.nombre.data}")
+                logger.info("✅ TOURETTE - Emails enviados exitosamente: %s", form.nombre.data)
                 
             except Exception as e:
-                print(f"⚠️ Error enviando emails de Tourette: {e}")
+                logger.warning("⚠️ Error enviando emails de Tourette: %s", e)
             return redirect(url_for('personas_nd'))
         except Exception as e:
-            print(f"❌ TOURETTE - Error: {e}")
+            logger.error("❌ TOURETTE - Error: %s", e)
             flash('Error al guardar tu perfil. Intenta de nuevo.', 'error')
             db.session.rollback()
     return render_template('registro-tourette.html', form=form)
@@ -890,7 +866,7 @@ def registro_altas_capacidades():
             nuevo_perfil.motivaciones = form.motivaciones.data
             db.session.add(nuevo_perfil)
             db.session.commit()
-            print(f"✅ ALTAS CAPACIDADES - Perfil guardado: {form.nombre.data}")
+            audit("✅ ALTAS CAPACIDADES - Perfil guardado: %s", form.nombre.data)
             flash(f'¡Perfil Altas Capacidades completado, {form.nombre.data}!', 'success')
             
             # Enviar emails automáticos para nuevo registro Altas Capacidades
@@ -916,18 +892,18 @@ def registro_altas_capacidades():
                     'habilidades': form.habilidades.data
                 })
                 
-                print(f"✅ ALTAS CAPACIDADES - Emails enviados exitosamente: {form.nombre.data}")
+                logger.info("✅ ALTAS CAPACIDADES - Emails enviados exitosamente: %s", form.nombre.data)
                 
             except Exception as e:
-                print(f"⚠️ Error enviando emails de Altas Capacidades: {e}")
+                logger.warning("⚠️ Error enviando emails de Altas Capacidades: %s", e)
             return redirect(url_for('personas_nd'))
         except Exception as e:
-            print(f"❌ ALTAS CAPACIDADES - Error: {e}")
+            logger.error("❌ ALTAS CAPACIDADES - Error: %s", e)
             flash('Error al guardar tu perfil. Intenta de nuevo.', 'error')
             db.session.rollback()
     else:
         if request.method == 'POST':
-            print("❌ ALTAS CAPACIDADES - Errores de validación:", form.errors)
+            logger.warning("❌ ALTAS CAPACIDADES - Errores de validación: %s", form.errors)
     return render_template('registro-altas-capacidades.html', form=form)
 
 # ========== FORMULARIOS FALTANTES ==========
@@ -959,7 +935,7 @@ def registro_tel():
             nuevo_perfil.motivaciones = form.motivaciones.data
             db.session.add(nuevo_perfil)
             db.session.commit()
-            print(f"✅ TEL - Perfil guardado: {form.nombre.data}")
+            audit("✅ TEL - Perfil guardado: %s", form.nombre.data)
             flash(f'¡Perfil TEL completado, {form.nombre.data}!', 'success')
             
             # Enviar emails automáticos para nuevo registro TEL
@@ -985,18 +961,18 @@ def registro_tel():
                     'habilidades': form.habilidades.data
                 })
                 
-                print(f"✅ TEL - Emails enviados exitosamente: {form.nombre.data}")
+                logger.info("✅ TEL - Emails enviados exitosamente: %s", form.nombre.data)
                 
             except Exception as e:
-                print(f"⚠️ Error enviando emails de TEL: {e}")
+                logger.warning("⚠️ Error enviando emails de TEL: %s", e)
             return redirect(url_for('personas_nd'))
         except Exception as e:
-            print(f"❌ TEL - Error: {e}")
+            logger.error("❌ TEL - Error: %s", e)
             flash('Error al guardar tu perfil. Intenta de nuevo.', 'error')
             db.session.rollback()
     else:
         if request.method == 'POST':
-            print("❌ TEL - Errores de validación:", form.errors)
+            logger.warning("❌ TEL - Errores de validación: %s", form.errors)
     return render_template('registro-tel.html', form=form)
 
 @app.route('/registro-disgrafia', methods=['GET', 'POST'])
@@ -1026,7 +1002,7 @@ def registro_disgrafia():
             nuevo_perfil.motivaciones = form.motivaciones.data
             db.session.add(nuevo_perfil)
             db.session.commit()
-            print(f"✅ DISGRAFÍA - Perfil guardado: {form.nombre.data}")
+            audit("✅ DISGRAFÍA - Perfil guardado: %s", form.nombre.data)
             flash(f'¡Perfil Disgrafía completado, {form.nombre.data}!', 'success')
             
             # Enviar emails automáticos para nuevo registro Disgrafía
@@ -1052,18 +1028,18 @@ def registro_disgrafia():
                     'habilidades': form.habilidades.data
                 })
                 
-                print(f"✅ DISGRAFÍA - Emails enviados exitosamente: {form.nombre.data}")
+                logger.info("✅ DISGRAFÍA - Emails enviados exitosamente: %s", form.nombre.data)
                 
             except Exception as e:
-                print(f"⚠️ Error enviando emails de Disgrafía: {e}")
+                logger.warning("⚠️ Error enviando emails de Disgrafía: %s", e)
             return redirect(url_for('personas_nd'))
         except Exception as e:
-            print(f"❌ DISGRAFÍA - Error: {e}")
+            logger.error("❌ DISGRAFÍA - Error: %s", e)
             flash('Error al guardar tu perfil. Intenta de nuevo.', 'error')
             db.session.rollback()
     else:
         if request.method == 'POST':
-            print("❌ DISGRAFÍA - Errores de validación:", form.errors)
+            logger.warning("❌ DISGRAFÍA - Errores de validación: %s", form.errors)
     return render_template('registro-disgrafia.html', form=form)
 
 @app.route('/registro-tps', methods=['GET', 'POST'])
@@ -1093,7 +1069,7 @@ def registro_tps():
             nuevo_perfil.motivaciones = form.motivaciones.data
             db.session.add(nuevo_perfil)
             db.session.commit()
-            print(f"✅ TPS - Perfil guardado: {form.nombre.data}")
+            audit("✅ TPS - Perfil guardado: %s", form.nombre.data)
             flash(f'¡Perfil TPS completado, {form.nombre.data}!', 'success')
             
             # Enviar emails automáticos para nuevo registro TPS
@@ -1119,18 +1095,18 @@ def registro_tps():
                     'habilidades': form.habilidades.data
                 })
                 
-                print(f"✅ TPS - Emails enviados exitosamente: {form.nombre.data}")
+                logger.info("✅ TPS - Emails enviados exitosamente: %s", form.nombre.data)
                 
             except Exception as e:
-                print(f"⚠️ Error enviando emails de TPS: {e}")
+                logger.warning("⚠️ Error enviando emails de TPS: %s", e)
             return redirect(url_for('personas_nd'))
         except Exception as e:
-            print(f"❌ TPS - Error: {e}")
+            logger.error("❌ TPS - Error: %s", e)
             flash('Error al guardar tu perfil. Intenta de nuevo.', 'error')
             db.session.rollback()
     else:
         if request.method == 'POST':
-            print("❌ TPS - Errores de validación:", form.errors)
+            logger.warning("❌ TPS - Errores de validación: %s", form.errors)
     return render_template('registro-tps.html', form=form)
 
 @app.route('/registro-asociacion', methods=['GET', 'POST'])
@@ -1177,42 +1153,7 @@ def registro_asociacion():
             db.session.add(nueva_asociacion)
             db.session.commit()
             
-            # También guardar en CRM mínimo - TABLA SEPARADA PARA ASOCIACIONES
-            try:
-                from crm_minimal import load_data, save_data
-                
-                crm_data = load_data()
-                asociaciones = crm_data.get('asociaciones', [])
-                
-                # Generar ID único para asociaciones
-                new_id = max([a.get('id', 0) for a in asociaciones], default=0) + 1
-                
-                crm_asociacion = {
-                    'id': new_id,
-                    'nombre_asociacion': nueva_asociacion.nombre_asociacion,
-                    'acronimo': nueva_asociacion.acronimo,
-                    'email': nueva_asociacion.email,
-                    'telefono': nueva_asociacion.telefono or '',
-                    'ciudad': nueva_asociacion.ciudad,
-                    'pais': nueva_asociacion.pais,
-                    'tipo_documento': nueva_asociacion.tipo_documento,
-                    'numero_documento': nueva_asociacion.numero_documento,
-                    'neurodivergencias_atendidas': neurodivergencias,
-                    'servicios': servicios,
-                    'contacto_nombre': nueva_asociacion.contacto_nombre,
-                    'contacto_cargo': nueva_asociacion.contacto_cargo,
-                    'estado': nueva_asociacion.estado,
-                    'created_at': datetime.now().isoformat(),
-                    'origen': 'Formulario Asociación'
-                }
-                
-                asociaciones.append(crm_asociacion)
-                crm_data['asociaciones'] = asociaciones
-                save_data(crm_data)
-                print(f"✅ Asociación guardada en CRM separado: {nueva_asociacion.nombre_asociacion}")
-                
-            except Exception as e:
-                print(f"⚠️ Error guardando asociación en CRM: {e}")
+            # El CRM de asociaciones lee directamente de la tabla asociaciones (sin copia en JSON)
             
             # Enviar emails automáticos con Gmail (nuevo sistema moderno)
             try:
@@ -1240,10 +1181,10 @@ def registro_asociacion():
                     'servicios': nueva_asociacion.servicios
                 })
                 
-                print(f"✅ ASOCIACIÓN - Emails Gmail enviados exitosamente: {nueva_asociacion.nombre_asociacion}")
+                logger.info("✅ ASOCIACIÓN - Emails Gmail enviados exitosamente: %s", nueva_asociacion.nombre_asociacion)
                 
             except Exception as e:
-                print(f"⚠️ Error enviando emails Gmail de Asociación: {e}")
+                logger.warning("⚠️ Error enviando emails Gmail de Asociación: %s", e)
                 
                 # Fallback al sistema anterior si Gmail falla
                 try:
@@ -1266,19 +1207,19 @@ def registro_asociacion():
                     
                     email_sent = send_association_registration_notification(association_data)
                     if email_sent:
-                        print(f"✅ Notificación fallback enviada a DiversIA")
+                        logger.info("✅ Notificación fallback enviada a DiversIA")
                     else:
-                        print(f"⚠️ No se pudo enviar la notificación fallback")
+                        logger.warning("⚠️ No se pudo enviar la notificación fallback")
                         
                 except Exception as e2:
-                    print(f"⚠️ Error en sistema fallback: {e2}")
+                    logger.warning("⚠️ Error en sistema fallback: %s", e2)
             
-            print(f"✅ Asociación registrada: {nueva_asociacion.nombre_asociacion}")
+            logger.info("✅ Asociación registrada: %s", nueva_asociacion.nombre_asociacion)
             flash('¡Solicitud enviada! Te contactaremos cuando hayamos verificado tu asociación.', 'info')
             return redirect(url_for('asociaciones'))
             
         except Exception as e:
-            print(f"❌ Error registrando asociación: {e}")
+            logger.exception("❌ Error registrando asociación: %s", e)
             flash('Error al registrar la asociación. Por favor intenta de nuevo.', 'error')
     
     return render_template('registro-asociacion.html', form=form)
@@ -1313,10 +1254,10 @@ def verificar_asociaciones():
         
         if notifications:
             db.session.commit()
-            print(f"✅ {len(notifications)} notificaciones marcadas como leídas")
+            logger.info("✅ %s notificaciones marcadas como leídas", len(notifications))
             
     except Exception as e:
-        print(f"⚠️ Error marcando notificaciones: {e}")
+        logger.warning("⚠️ Error marcando notificaciones: %s", e)
     
     # Contar notificaciones pendientes para el badge
     notificaciones_pendientes = NotificationBackup.query.filter_by(
@@ -1401,15 +1342,15 @@ def aprobar_asociacion(asociacion_id):
             }
             
             send_association_status_update(association_data, 'aprobada')
-            print(f"✅ Email de aprobación enviado a {asociacion.email}")
+            logger.info("✅ Email de aprobación enviado a %s", asociacion.email)
         except Exception as e:
-            print(f"⚠️ Error enviando email de aprobación: {e}")
+            logger.warning("⚠️ Error enviando email de aprobación: %s", e)
         
         flash(f'Asociación {asociacion.nombre_asociacion} aprobada exitosamente.', 'success')
         return redirect('/admin/verificar-asociaciones')
         
     except Exception as e:
-        print(f"❌ Error aprobando asociación: {e}")
+        logger.exception("❌ Error aprobando asociación: %s", e)
         flash('Error al aprobar la asociación.', 'error')
         return redirect('/admin/verificar-asociaciones')
 
@@ -1443,15 +1384,15 @@ def rechazar_asociacion(asociacion_id):
             }
             
             send_association_status_update(association_data, 'rechazada')
-            print(f"✅ Email de rechazo enviado a {asociacion.email}")
+            logger.info("✅ Email de rechazo enviado a %s", asociacion.email)
         except Exception as e:
-            print(f"⚠️ Error enviando email de rechazo: {e}")
+            logger.warning("⚠️ Error enviando email de rechazo: %s", e)
         
         flash(f'Asociación {asociacion.nombre_asociacion} rechazada.', 'warning')
         return redirect('/admin/verificar-asociaciones')
         
     except Exception as e:
-        print(f"❌ Error rechazando asociación: {e}")
+        logger.exception("❌ Error rechazando asociación: %s", e)
         flash('Error al rechazar la asociación.', 'error')
         return redirect('/admin/verificar-asociaciones')
 
@@ -1485,15 +1426,15 @@ def solicitar_documentos(asociacion_id):
             }
             
             send_association_status_update(association_data, 'documentos_requeridos', documents_link)
-            print(f"✅ Email de documentos enviado a {asociacion.email}")
+            logger.info("✅ Email de documentos enviado a %s", asociacion.email)
         except Exception as e:
-            print(f"⚠️ Error enviando email de documentos: {e}")
+            logger.warning("⚠️ Error enviando email de documentos: %s", e)
         
         flash(f'Documentos solicitados a {asociacion.nombre_asociacion}.', 'info')
         return redirect('/admin/verificar-asociaciones')
         
     except Exception as e:
-        print(f"❌ Error solicitando documentos: {e}")
+        logger.exception("❌ Error solicitando documentos: %s", e)
         flash('Error al solicitar documentos.', 'error')
         return redirect('/admin/verificar-asociaciones')
 
@@ -1527,7 +1468,7 @@ def api_editar_usuario(user_id):
         if not ('admin_user_id' in session or 'admin_username' in session or session.get('admin_ok')):
             return jsonify({'success': False, 'error': 'No autorizado'}), 401
         
-        print(f"🔧 API edit request for user: {user_id}")
+        logger.debug("🔧 API edit request for user: %s", user_id)
         
         # Determinar si es User o NeurodivergentProfile
         is_profile = user_id.startswith('profile_')
@@ -1554,7 +1495,7 @@ def api_editar_usuario(user_id):
                         setattr(usuario, field, value)
             
             db.session.commit()
-            print(f"✅ {table_name} editado: {usuario.nombre} {usuario.apellidos}")
+            audit("✅ %s editado: %s %s", table_name, usuario.nombre, usuario.apellidos, usuario_id=user_id, campos=sorted(data))
             
             return jsonify({
                 'success': True,
@@ -1581,14 +1522,14 @@ def api_editar_usuario(user_id):
             'motivaciones': usuario.motivaciones or ''
         }
         
-        print(f"📤 Sending user data: {usuario_data['nombre']} {usuario_data['apellidos']}")
+        logger.debug("📤 Sending user data: %s %s", usuario_data['nombre'], usuario_data['apellidos'])
         
         from flask import jsonify
         return jsonify(usuario_data)
         
     except Exception as e:
         from flask import jsonify
-        print(f"❌ Error editando usuario {user_id}: {e}")
+        logger.error("❌ Error editando usuario %s: %s", user_id, e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/usuario/<user_id>/borrar', methods=['DELETE'])
@@ -1621,7 +1562,7 @@ def api_borrar_usuario(user_id):
         db.session.delete(usuario)
         db.session.commit()
         
-        print(f"🗑️ {table_name} borrado exitosamente: {nombre_completo}")
+        logger.info("🗑️ %s borrado exitosamente: %s", table_name, nombre_completo)
         
         from flask import jsonify
         return jsonify({
@@ -1631,7 +1572,7 @@ def api_borrar_usuario(user_id):
         
     except Exception as e:
         from flask import jsonify
-        print(f"❌ Error borrando usuario {user_id}: {e}")
+        logger.exception("❌ Error borrando usuario %s: %s", user_id, e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # ==================== PÁGINAS DE EDICIÓN CRM ====================
@@ -1645,12 +1586,12 @@ def crm_editar_usuario_form(user_id):
             flash('Acceso restringido. Inicia sesión como administrador.', 'error')
             return redirect('/admin/login-new')
         
-        print(f"🔧 Abriendo editor para usuario: {user_id}")
+        logger.info("🔧 Abriendo editor para usuario: %s", user_id)
         return render_template('crm-editar-usuario.html', user_id=user_id)
         
     except Exception as e:
-        print(f"❌ Error abriendo editor: {e}")
+        logger.exception("❌ Error abriendo editor: %s", e)
         flash('Error al abrir el editor de usuario.', 'error')
         return redirect('/crm-neurodivergentes')
 
-print("✅ Routes simplificado cargado correctamente")
\ No newline at end of file
+logger.info("✅ Routes simplificado cargado correctamente")
\ No newline at end of file
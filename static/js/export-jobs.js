@@ -0,0 +1,53 @@
+// Exportaciones CSV en segundo plano (/api/exports)
+// Crea el trabajo, muestra el progreso en el botón y descarga el fichero al terminar
+
+// Máximo que se espera a un trabajo sin que avance (el servidor lo marca como error antes)
+const EXPORT_SIN_PROGRESO_MS = 15 * 60 * 1000;
+
+async function exportarEnSegundoPlano(tipo, params = {}, boton = null) {
+    const textoOriginal = boton ? boton.innerHTML : null;
+    const mostrar = (texto) => { if (boton) boton.innerHTML = texto; };
+    if (boton) boton.disabled = true;
+
+    try {
+        const respuesta = await fetch('/api/exports', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ type: tipo, params: params })
+        });
+        const datos = await respuesta.json();
+        if (!respuesta.ok || !datos.success) {
+            throw new Error(datos.error || `Error ${respuesta.status}`);
+        }
+
+        let job = datos.job;
+        let ultimoCambio = Date.now();
+        while (job.state === 'queued' || job.state === 'running') {
+            mostrar(job.total ? `⏳ ${Math.round(job.progress * 100)}%` : '⏳ Preparando...');
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const estado = await fetch(`/api/exports/${job.id}`);
+            const datosEstado = await estado.json();
+            if (!estado.ok || !datosEstado.job) {
+                throw new Error(datosEstado.error || `Error ${estado.status}`);
+            }
+            if (datosEstado.job.updated_at !== job.updated_at) {
+                ultimoCambio = Date.now();
+            } else if (Date.now() - ultimoCambio > EXPORT_SIN_PROGRESO_MS) {
+                throw new Error('La exportación no avanza; inténtalo de nuevo más tarde');
+            }
+            job = datosEstado.job;
+        }
+
+        if (job.state !== 'done') {
+            throw new Error(job.error || 'La exportación ha fallado');
+        }
+        window.location.href = `/api/exports/${job.id}/download`;
+    } catch (error) {
+        alert('❌ Error exportando: ' + error.message);
+    } finally {
+        if (boton) {
+            boton.disabled = false;
+            boton.innerHTML = textoOriginal;
+        }
+    }
+}
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Prueba de estrés de concurrencia para el CRM Minimal
+Lanza N procesos que crean, editan y eliminan empresas a la vez y comprueba que no se pierde nada
+
+Uso:
+    python stress_crm_minimal.py --url http://localhost:5000 --procs 8 --ops 200
+    python stress_crm_minimal.py --url http://localhost:5000,http://localhost:5001 --procs 8 --ops 200
+    python stress_crm_minimal.py --store /tmp/crm_stress.json --procs 8 --ops 200
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import urllib.request
+from multiprocessing import Pool
+
+
+def _http(base_url, method, path, payload=None):
+    body = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(base_url + path, data=body, method=method,
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return json.loads(resp.read().decode('utf-8'))
+
+
+class HttpBackend:
+    """Operaciones contra los endpoints /api/minimal/companies de un servidor en marcha"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def create(self, company):
+        return _http(self.base_url, 'POST', '/api/minimal/companies', company)['company']
+
+    def update(self, company_id, changes):
+        return _http(self.base_url, 'PUT', f'/api/minimal/companies/{company_id}', changes)['company']
+
+    def delete(self, company_id):
+        _http(self.base_url, 'DELETE', f'/api/minimal/companies/{company_id}')
+
+    def all(self):
+        return _http(self.base_url, 'GET', '/api/minimal/companies')
+
+
+class StoreBackend:
+    """Mismas operaciones directamente sobre CRMStore (sin servidor)"""
+
+    def __init__(self, path):
+        from crm_store import CRMStore
+        # Compactación muy frecuente para ejercitar también el intercambio de snapshot/log
+        self.store = CRMStore(path, compact_every=50)
+
+    def create(self, company):
+        return self.store.insert('companies', company)
+
+    def update(self, company_id, changes):
+        return self.store.update('companies', company_id, changes)
+
+    def delete(self, company_id):
+        self.store.delete('companies', company_id)
+
+    def all(self):
+        return self.store.all('companies')
+
+
+def _backend(args, worker_id=0):
+    if args.url:
+        # Varias URLs separadas por comas: cada proceso ataca una instancia distinta
+        urls = args.url.split(',')
+        return HttpBackend(urls[worker_id % len(urls)])
+    return StoreBackend(args.store)
+
+
+def worker(task):
+    """Ejecuta ops operaciones y devuelve el estado final esperado de sus empresas"""
+    args, worker_id = task
+    backend = _backend(args, worker_id)
+    rng = random.Random(worker_id)
+    expected = {}   # id -> notas esperadas
+    deleted = set()
+    latencies = []
+
+    for op_num in range(args.ops):
+        start = time.perf_counter()
+        choice = rng.random()
+        if not expected or choice < 0.5:
+            company = backend.create({
+                'nombre': f'stress-{worker_id}-{op_num}',
+                'email': f'w{worker_id}op{op_num}@stress.test',
+                'sector': 'stress',
+                'ciudad': 'Barcelona',
+            })
+            expected[company['id']] = company.get('notas', '')
+        elif choice < 0.8:
+            company_id = rng.choice(list(expected))
+            notas = f'update-{worker_id}-{op_num}'
+            backend.update(company_id, {'notas': notas})
+            expected[company_id] = notas
+        else:
+            company_id = rng.choice(list(expected))
+            backend.delete(company_id)
+            expected.pop(company_id)
+            deleted.add(company_id)
+        latencies.append(time.perf_counter() - start)
+
+    return worker_id, expected, deleted, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Estrés concurrente del CRM Minimal')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help='URL base del servidor, o varias separadas por comas')
+    target.add_argument('--store', help='Ruta de un crm_data.json de pruebas para usar CRMStore directamente')
+    parser.add_argument('--procs', type=int, default=8, help='Procesos concurrentes')
+    parser.add_argument('--ops', type=int, default=200, help='Operaciones por proceso')
+    args = parser.parse_args()
+
+    if args.store:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    print(f"🔥 Estrés CRM Minimal: {args.procs} procesos x {args.ops} operaciones")
+    start = time.perf_counter()
+    with Pool(args.procs) as pool:
+        results = pool.map(worker, [(args, i) for i in range(args.procs)])
+    elapsed = time.perf_counter() - start
+
+    final = _backend(args).all()
+    by_id = {}
+    duplicated = 0
+    for company in final:
+        if company['id'] in by_id:
+            duplicated += 1
+        by_id[company['id']] = company
+
+    errors = []
+    latencies = []
+    for worker_id, expected, deleted, lat in results:
+        latencies.extend(lat)
+        for company_id, notas in expected.items():
+            company = by_id.get(company_id)
+            if company is None:
+                errors.append(f'worker {worker_id}: empresa {company_id} perdida')
+            elif company.get('notas', '') != notas:
+                errors.append(f'worker {worker_id}: actualización perdida en empresa {company_id}')
+        for company_id in deleted:
+            # Los ids no se reutilizan: cualquier id eliminado presente es una resurrección
+            if company_id in by_id:
+                errors.append(f'worker {worker_id}: empresa {company_id} eliminada reaparece')
+
+    latencies.sort()
+    total_ops = len(latencies)
+    print(f"⏱️ {total_ops} operaciones en {elapsed:.2f}s ({total_ops / elapsed:.0f} ops/s)")
+    print(f"   p50={latencies[total_ops // 2] * 1000:.1f}ms p95={latencies[int(total_ops * 0.95)] * 1000:.1f}ms")
+    print(f"📊 {len(final)} empresas finales, {duplicated} ids duplicados")
+
+    if duplicated or errors:
+        for error in errors[:20]:
+            print(f"❌ {error}")
+        print(f"❌ FALLO: {len(errors)} inconsistencias, {duplicated} duplicados")
+        sys.exit(1)
+    print("✅ Sin pérdidas ni duplicados")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""Pruebas de las APIs del CRM sobre PostgreSQL (ver conftest.py: necesitan TEST_DATABASE_URL)"""
+
+from datetime import date, datetime, timedelta
+
+
+def _lead(n, **fields):
+    from models import GeneralLead
+
+    values = dict(nombre=f'Lead{n}', apellidos='Prueba', email=f'lead{n}@example.com', ciudad='Madrid',
+                  created_at=datetime(2024, 1, 1) + timedelta(hours=n))
+    values.update(fields)
+    return GeneralLead(**values)
+
+
+def _perfil(n, **fields):
+    from models import NeurodivergentProfile
+
+    values = dict(nombre=f'Perfil{n}', apellidos='Prueba', email=f'perfil{n}@example.com', ciudad='Bilbao',
+                  fecha_nacimiento=date(1990, 1, 1), tipo_neurodivergencia='TDAH',
+                  created_at=datetime(2024, 2, 1) + timedelta(hours=n))
+    values.update(fields)
+    return NeurodivergentProfile(**values)
+
+
+def test_leads_paginados_por_cursor_sin_repetidos(client, db):
+    db.session.add_all(_lead(n) for n in range(7))
+    db.session.commit()
+
+    vistos, cursor = [], None
+    while True:
+        url = '/api/leads-generales?limit=3&sort=created_at&order=asc'
+        data = client.get(url + (f'&cursor={cursor}' if cursor else '')).get_json()
+        assert data['success']
+        vistos += [lead['email'] for lead in data['leads']]
+        cursor = data.get('next_cursor')
+        if not cursor:
+            break
+    assert vistos == [f'lead{n}@example.com' for n in range(7)]
+
+
+def test_cursor_invalido_devuelve_400(client, db):
+    for url in ('/api/leads-generales?cursor=basura', '/api/neurodivergent-profiles?cursor=basura',
+                '/api/neurodivergent-profiles?cursor=W3t9LDFd'):  # [{},1]
+        response = client.get(url)
+        assert response.status_code == 400, url
+        assert response.get_json()['success'] is False
+
+
+def test_leads_etag_304_hasta_que_cambian(client, db):
+    db.session.add(_lead(1))
+    db.session.commit()
+
+    first = client.get('/api/leads-generales')
+    etag = first.headers['ETag']
+    assert client.get('/api/leads-generales', headers={'If-None-Match': etag}).status_code == 304
+
+    db.session.add(_lead(2))
+    db.session.commit()
+    assert client.get('/api/leads-generales', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_perfiles_paginados_del_mas_reciente(client, db):
+    db.session.add_all(_perfil(n) for n in range(5))
+    db.session.commit()
+
+    page = client.get('/api/neurodivergent-profiles?limit=2').get_json()
+    assert [p['email'] for p in page['profiles']] == ['perfil4@example.com', 'perfil3@example.com']
+    rest = client.get(f"/api/neurodivergent-profiles?limit=10&cursor={page['next_cursor']}").get_json()
+    assert [p['email'] for p in rest['profiles']] == [f'perfil{n}@example.com' for n in (2, 1, 0)]
+
+
+def _asociacion_json(n, **fields):
+    values = dict(nombre_asociacion=f'Asociación {n}', email=f'asoc{n}@example.com', pais='ES',
+                  tipo_documento='CIF', numero_documento=f'G{n:08d}', ciudad='Madrid',
+                  created_at='2024-03-01T10:00:00')
+    values.update(fields)
+    return values
+
+
+def test_migrar_asociaciones_json_solo_admin(client):
+    from crm_minimal import store
+
+    store.clear('asociaciones')
+    store.insert('asociaciones', _asociacion_json(1))
+    assert client.post('/api/asociaciones/migrate-json').status_code == 403
+    assert store.count('asociaciones') == 1
+
+
+def test_migrar_asociaciones_json_salta_las_invalidas(admin_client, db):
+    from crm_minimal import store
+    from models import Asociacion
+
+    store.clear('asociaciones')
+    registros = store.insert_many('asociaciones', [
+        _asociacion_json(1),
+        _asociacion_json(2, created_at='ayer'),
+        _asociacion_json(3, acronimo='X' * 50),  # más largo que la columna
+        _asociacion_json(4, created_at=None),
+    ])
+
+    data = admin_client.post('/api/asociaciones/migrate-json').get_json()
+    assert data['success'] and data['migradas'] == 2
+    assert sorted(e['nombre'] for e in data['errores']) == ['Asociación 2', 'Asociación 3']
+    migradas = {a.nombre_asociacion: a for a in db.session.query(Asociacion)}
+    assert sorted(migradas) == ['Asociación 1', 'Asociación 4']
+    assert migradas['Asociación 1'].created_at == datetime(2024, 3, 1, 10, 0)
+    assert migradas['Asociación 4'].created_at is not None  # valor por defecto de la columna
+    # Con errores la colección del JSON se conserva para corregirla y repetir
+    assert store.count('asociaciones') == 4
+
+    store.update('asociaciones', registros[1]['id'], {'created_at': '2024-03-02'})
+    store.update('asociaciones', registros[2]['id'], {'acronimo': 'A3'})
+    data = admin_client.post('/api/asociaciones/migrate-json').get_json()
+    assert (data['migradas'], data['duplicadas'], data['errores']) == (2, 2, [])
+    assert store.count('asociaciones') == 0
+
+
+def _usuario(n, **fields):
+    from models import User
+
+    values = dict(nombre=f'Usuario{n}', apellidos='Legacy', email=f'usuario{n}@example.com', ciudad='Sevilla',
+                  fecha_nacimiento=date(1985, 1, 1), tipo_neurodivergencia='Dislexia',
+                  created_at=datetime(2023, 6, 1) + timedelta(days=n))
+    values.update(fields)
+    return User(**values)
+
+
+def _sectores(db):
+    from crm_analytics import top_sectors
+
+    return {s['sector']: s['count'] for s in top_sectors(db.session)[0]}
+
+
+def test_migracion_legacy_conserva_los_sectores(client, db):
+    from crm_analytics import ensure_sector_tags
+
+    db.session.add_all([_usuario(1, intereses_laborales='Cocina y restaurante'),
+                        _usuario(2, intereses_laborales='Software y diseño gráfico'),
+                        _usuario(3, intereses_laborales='Marketing')])
+    db.session.add(_lead(1, email='usuario3@example.com', intereses_laborales='Marketing'))  # ya era lead
+    db.session.commit()
+    ensure_sector_tags(db)
+    antes = _sectores(db)
+
+    data = client.post('/api/migrate-users-to-leads?batch_size=2').get_json()
+    assert data['success'] and (data['migrados'], data['existentes']) == (2, 1)
+    assert _sectores(db) == {'Hostelería': 1, 'Tecnología': 1, 'Arte y Diseño': 1, 'Comunicación': 1}
+    assert antes == {'Hostelería': 1, 'Tecnología': 1, 'Arte y Diseño': 1, 'Comunicación': 2}
+
+
+def test_archivar_leads_borra_sus_sectores(client, db):
+    from crm_analytics import ensure_sector_tags
+
+    leads = [_lead(n, intereses_laborales='Enfermería') for n in range(3)]
+    db.session.add_all(leads)
+    db.session.commit()
+    ensure_sector_tags(db)
+
+    response = client.post('/api/leads-generales/bulk-delete',
+                           json={'lead_ids': [leads[0].id, leads[1].id], 'confirmed': True})
+    assert response.get_json()['success']
+    assert _sectores(db) == {'Salud': 1}
+
+
+def _rollup(db):
+    from models import RegistrationDaily
+
+    return {(r.dia, r.source, r.tipo_neurodivergencia): r.total for r in db.session.query(RegistrationDaily)}
+
+
+def test_migracion_legacy_suma_las_altas_al_rollup(client, db):
+    from crm_analytics import ensure_registration_rollup, rebuild_registration_rollup
+
+    db.session.add(_lead(1, created_at=datetime(2023, 6, 2, 9), tipo_neurodivergencia='Dislexia'))
+    db.session.commit()
+    ensure_registration_rollup(db)
+    db.session.add_all([_usuario(1), _usuario(1, email='otro@example.com'),  # mismo día y tipo
+                        _usuario(2, tipo_neurodivergencia='TEA'), _usuario(3, created_at=None),
+                        _usuario(4, email='lead1@example.com')])  # ya era lead: no suma
+    db.session.commit()
+
+    data = client.post('/api/migrate-users-to-leads?batch_size=2').get_json()
+    assert data['success'] and data['migrados'] == 4
+    incremental = _rollup(db)
+    assert incremental[(date(2023, 6, 2), 'lead', 'Dislexia')] == 3
+
+    # Igual que recalcularlo desde cero con un GROUP BY sobre general_leads
+    rebuild_registration_rollup(db, force=True)
+    assert incremental == _rollup(db)
+
+
+def test_recalcular_analitica_solo_admin(client, db):
+    db.session.add(_perfil(1))
+    db.session.commit()
+    assert client.post('/api/neurodivergent/analytics/rebuild').status_code == 403
+
+    with client.session_transaction() as session:
+        session['admin_ok'] = True
+    assert client.post('/api/neurodivergent/analytics/rebuild').get_json()['success']
+
+
+def test_claves_de_ciudad_se_cargan_una_vez(db):
+    from sqlalchemy import text
+
+    from crm_analytics import ensure_city_keys, rebuild_city_keys
+
+    db.session.add(_perfil(1, ciudad=' BCN '))
+    db.session.commit()
+    db.session.execute(text("UPDATE neurodivergent_profiles_new SET ciudad_clave = NULL"))
+    db.session.commit()
+
+    ensure_city_keys(db)
+    assert db.session.execute(text("SELECT ciudad_clave FROM neurodivergent_profiles_new")).scalar() == 'barcelona'
+
+    # Ya cargadas: no se vuelve a buscar filas sin clave en cada petición
+    db.session.execute(text("UPDATE neurodivergent_profiles_new SET ciudad_clave = NULL"))
+    db.session.commit()
+    ensure_city_keys(db)
+    assert db.session.execute(text("SELECT ciudad_clave FROM neurodivergent_profiles_new")).scalar() is None
+    rebuild_city_keys(db)
+    assert db.session.execute(text("SELECT ciudad_clave FROM neurodivergent_profiles_new")).scalar() == 'barcelona'
+
+
+def test_dashboard_habilidades_desde_contadores(client, db, monkeypatch):
+    import crm_analytics
+
+    perfiles = [_perfil(1, habilidades='Python, SQL; Excel'), _perfil(2, habilidades='python,Diseño'),
+                _perfil(3, habilidades='SQL, ab')]
+    db.session.add_all(perfiles)
+    db.session.commit()
+
+    data = client.get('/api/neurodivergent/dashboard').get_json()
+    assert data['success']
+    assert data['widgets']['habilidades'] == [
+        {'habilidad': 'python', 'count': 2}, {'habilidad': 'sql', 'count': 2},
+        {'habilidad': 'diseño', 'count': 1}, {'habilidad': 'excel', 'count': 1}]
+    assert 'habilidad' not in {d for d in crm_analytics.read_profile_stats(db.session)}
+
+    # Los listeners mantienen los contadores al editar y borrar perfiles (cargados, como en las rutas)
+    perfil = db.session.get(crm_analytics.NeurodivergentProfile, perfiles[0].id)
+    perfil.habilidades = 'Excel'
+    db.session.delete(perfiles[1])
+    db.session.commit()
+    for workers in (0, 1, 4):
+        monkeypatch.setattr(crm_analytics, 'DASHBOARD_WORKERS', workers)
+        widgets = client.get('/api/neurodivergent/dashboard?refresh=1').get_json()['widgets']
+        assert widgets['habilidades'] == [{'habilidad': 'excel', 'count': 1}, {'habilidad': 'sql', 'count': 1}]
+        assert widgets['perfiles']['metricas']['total_perfiles'] == 2
@@ -0,0 +1,56 @@
+"""Pruebas de MirrorQueue: los registros encolados sobreviven a una caída antes del volcado"""
+
+import pytest
+
+from crm_mirror import MirrorQueue
+from crm_store import CRMStore
+
+
+class StoreCaido:
+    def insert_many(self, collection, records):
+        raise OSError('disco lleno')
+
+
+@pytest.fixture
+def rutas(tmp_path):
+    return str(tmp_path / 'crm_data.json'), str(tmp_path / 'spool.jsonl')
+
+
+def test_encolar_es_duradero_sin_volcado(rutas):
+    data_path, spool_path = rutas
+    # Sin start(): simula un proceso que muere antes del primer volcado
+    caido = MirrorQueue(CRMStore(data_path), spool_path=spool_path)
+    caido._closed = True  # sin hilo ni volcado final (SIGKILL)
+    caido.enqueue('companies', {'nombre': 'Acme'})
+    caido.enqueue('companies', {'nombre': 'Beta'})
+    assert caido.pending() == 2
+
+    # Otro proceso recupera el spool al arrancar
+    store = CRMStore(data_path)
+    assert MirrorQueue(store, spool_path=spool_path).drain_spool() == 2
+    assert [c['nombre'] for c in store.all('companies')] == ['Acme', 'Beta']
+    assert MirrorQueue(store, spool_path=spool_path).pending() == 0
+
+
+def test_volcado_fallido_conserva_el_spool(rutas):
+    data_path, spool_path = rutas
+    queue = MirrorQueue(StoreCaido(), spool_path=spool_path)
+    queue._closed = True  # sin hilo: el volcado se lanza a mano
+    queue.enqueue('companies', {'nombre': 'Acme'})
+    assert queue.flush() is None
+    assert queue.pending() == 1
+
+    store = CRMStore(data_path)
+    assert MirrorQueue(store, spool_path=spool_path).flush() == 1
+    assert store.count('companies') == 1
+
+
+def test_hilo_de_volcado_agrupa_y_vacia(rutas):
+    data_path, spool_path = rutas
+    store = CRMStore(data_path)
+    queue = MirrorQueue(store, spool_path=spool_path, flush_interval=0.01)
+    for n in range(5):
+        queue.enqueue('companies', {'nombre': f'E{n}'})
+    queue.close()
+    assert store.count('companies') == 5
+    assert queue.pending() == 0
@@ -0,0 +1,160 @@
+"""Pruebas de crm_queries: cursores keyset, filtros, ETag y operaciones masivas (SQLite en memoria)"""
+
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask, request
+from sqlalchemy import Column, DateTime, Integer, String, create_engine, text
+from sqlalchemy.orm import DeclarativeBase, Session
+
+from crm_queries import (archive_rows, decode_cursor, encode_cursor, keyset_page, keyset_sorted_page,
+                         make_etag, migrate_legacy_users, not_modified, parse_bool, parse_datetime,
+                         parse_fields, parse_limit)
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Fila(Base):
+    __tablename__ = 'filas'
+    id = Column(Integer, primary_key=True)
+    ciudad = Column(String(50))
+    created_at = Column(DateTime)
+
+
+class FilaArchivada(Base):
+    __tablename__ = 'filas_archivadas'
+    id = Column(Integer, primary_key=True)
+    ciudad = Column(String(50))
+    created_at = Column(DateTime)
+    archived_at = Column(DateTime)
+    archive_reason = Column(String(50))
+
+
+CIUDADES = ['Madrid', None, 'Bilbao', 'Madrid', None, 'Cádiz', 'Bilbao', 'Madrid']
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(Fila(id=i, ciudad=ciudad, created_at=datetime(2024, 1, 1 + i % 3, 10, i))
+                        for i, ciudad in enumerate(CIUDADES, start=1))
+        session.commit()
+        yield session
+
+
+def _todas_las_paginas(session, sort_column, descending, limit):
+    ids, cursor, paginas = [], None, 0
+    while True:
+        rows, cursor = keyset_sorted_page(session.query(Fila), sort_column, Fila.id,
+                                          cursor=cursor, limit=limit, descending=descending)
+        ids += [row.id for row in rows]
+        paginas += 1
+        if cursor is None:
+            return ids, paginas
+
+
+@pytest.mark.parametrize('sort_column', [Fila.ciudad, Fila.created_at, Fila.id])
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('limit', [1, 2, 3, 100])
+def test_keyset_sorted_page_recorre_todo_una_vez(session, sort_column, descending, limit):
+    expected = [row.id for row in session.query(Fila).order_by(
+        sort_column.desc().nullslast() if descending else sort_column.asc().nullslast(),
+        Fila.id.desc() if descending else Fila.id.asc())]
+    ids, paginas = _todas_las_paginas(session, sort_column, descending, limit)
+    assert ids == expected
+    assert paginas == max(1, -(-len(CIUDADES) // limit))
+
+
+def test_keyset_page_por_id(session):
+    rows, cursor = keyset_page(session.query(Fila), Fila.id, limit=5)
+    assert [r.id for r in rows] == [1, 2, 3, 4, 5] and cursor == 5
+    rows, cursor = keyset_page(session.query(Fila), Fila.id, after_id=cursor, limit=5)
+    assert [r.id for r in rows] == [6, 7, 8] and cursor is None
+
+
+def test_cursor_ida_y_vuelta_con_tipos():
+    columns = [Fila.created_at, Fila.id]
+    valores = [datetime(2024, 5, 6, 7, 8, 9, 123), 42]
+    assert decode_cursor(encode_cursor(valores), columns) == valores
+    assert decode_cursor(encode_cursor([None, 3]), columns) == [None, 3]
+
+
+@pytest.mark.parametrize('token', [
+    'no-es-base64!!',
+    encode_cursor([1]),                  # longitud distinta
+    encode_cursor(['ayer', 1]),          # fecha no ISO
+    encode_cursor([{}, 1]),              # tipo no convertible
+    encode_cursor(['2024-01-01', 'x']),  # id no numérico
+])
+def test_cursor_invalido_es_value_error(token):
+    with pytest.raises(ValueError, match='cursor inválido'):
+        decode_cursor(token, [Fila.created_at, Fila.id])
+
+
+def test_cursor_invalido_en_la_paginacion(session):
+    with pytest.raises(ValueError):
+        keyset_sorted_page(session.query(Fila), Fila.ciudad, Fila.id, cursor=encode_cursor(['x']))
+
+
+def test_parse_limit_acotado():
+    assert parse_limit({}) == 50
+    assert parse_limit({'limit': '0'}) == 1
+    assert parse_limit({'limit': '100000'}) == 500
+    assert parse_limit({'limit': 'abc'}) == 50
+
+
+def test_parse_bool_y_fechas():
+    assert parse_bool('Sí') is True and parse_bool('0') is False and parse_bool('') is None
+    with pytest.raises(ValueError):
+        parse_bool('quizá')
+    assert parse_datetime('2024-03-01', end_of_day=True) == datetime(2024, 3, 1, 23, 59, 59, 999999)
+    assert parse_datetime('2024-03-01T10:00') == datetime(2024, 3, 1, 10, 0)
+
+
+def test_parse_fields():
+    assert parse_fields(None, Fila, ['ciudad']) == ['ciudad', 'id']
+    assert parse_fields('all', Fila, [], required=()) == ['id', 'ciudad', 'created_at']
+    with pytest.raises(ValueError, match='nope'):
+        parse_fields('ciudad,nope', Fila, [])
+
+
+def test_etag_depende_de_la_url_y_responde_304():
+    app = Flask(__name__)
+    with app.test_request_context('/api/x?ciudad=Madrid'):
+        etag = make_etag(request, date(2024, 1, 1), 8)
+        assert not_modified(request, etag) is None
+    with app.test_request_context('/api/x?ciudad=Bilbao'):
+        assert make_etag(request, date(2024, 1, 1), 8) != etag
+    with app.test_request_context('/api/x?ciudad=Madrid', headers={'If-None-Match': f'"{etag}"'}):
+        response = not_modified(request, etag)
+        assert response.status_code == 304 and response.get_etag()[0] == etag
+
+
+def test_archive_rows_mueve_por_trozos(session):
+    db = SimpleNamespace(session=session, engine=session.get_bind())
+    moved = archive_rows(db, Fila, FilaArchivada, [2, 3, 5, 5, 99], reason='prueba', chunk_size=2)
+    assert moved == 3
+    assert [r.id for r in session.query(Fila).order_by(Fila.id)] == [1, 4, 6, 7, 8]
+    archivadas = session.query(FilaArchivada).order_by(FilaArchivada.id).all()
+    assert [(r.id, r.ciudad, r.archive_reason) for r in archivadas] == [
+        (2, None, 'prueba'), (3, 'Bilbao', 'prueba'), (5, None, 'prueba')]
+    assert all(r.archived_at is not None for r in archivadas)
+
+
+def test_migracion_dry_run_solo_cuenta(session):
+    session.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR(120))"))
+    session.execute(text("CREATE TABLE general_leads (id INTEGER PRIMARY KEY, email VARCHAR(120) UNIQUE)"))
+    session.execute(text("INSERT INTO users (email) VALUES ('a@x.es'), ('b@x.es'), ('c@x.es')"))
+    session.execute(text("INSERT INTO general_leads (email) VALUES ('b@x.es')"))
+    session.commit()
+
+    db = SimpleNamespace(session=session, engine=session.get_bind())
+    result = migrate_legacy_users(db, dry_run=True)
+    assert result == {'total': 3, 'migrados': 2, 'existentes': 1, 'lotes': 0, 'dry_run': True}
+    assert session.execute(text('SELECT count(*) FROM users')).scalar() == 3
+    assert session.execute(text('SELECT count(*) FROM general_leads')).scalar() == 1
@@ -0,0 +1,96 @@
+"""Pruebas de CRMStore: escrituras desde varios procesos, compactación y log interrumpido"""
+
+import multiprocessing
+import os
+
+import pytest
+
+from crm_store import CRMStore
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason='necesita fork (fcntl entre procesos)')
+
+PROCESOS = 4
+ALTAS_POR_PROCESO = 60
+
+
+def _insertar(path, worker, compact_every):
+    store = CRMStore(path, compact_every=compact_every)
+    for n in range(ALTAS_POR_PROCESO):
+        record = store.insert('companies', {'nombre': f'w{worker}-{n}', 'visitas': 0})
+        # Lectura-modificación-escritura bajo el lock del store
+        store.update('companies', record['id'], {'visitas': 1})
+
+
+def _lanzar(path, compact_every):
+    ctx = multiprocessing.get_context('fork')
+    procesos = [ctx.Process(target=_insertar, args=(path, worker, compact_every)) for worker in range(PROCESOS)]
+    for proceso in procesos:
+        proceso.start()
+    for proceso in procesos:
+        proceso.join(60)
+        assert proceso.exitcode == 0
+
+
+@pytest.mark.parametrize('compact_every', [10000, 25])
+def test_altas_concurrentes_sin_perdidas_ni_ids_repetidos(tmp_path, compact_every):
+    path = str(tmp_path / 'crm_data.json')
+    _lanzar(path, compact_every)
+
+    companies = CRMStore(path).all('companies')
+    total = PROCESOS * ALTAS_POR_PROCESO
+    assert len(companies) == total
+    assert sorted(c['id'] for c in companies) == list(range(1, total + 1))
+    assert {c['nombre'] for c in companies} == {f'w{w}-{n}' for w in range(PROCESOS)
+                                                for n in range(ALTAS_POR_PROCESO)}
+    assert all(c['visitas'] == 1 for c in companies)
+
+
+def test_compactar_conserva_el_estado_y_vacia_el_log(tmp_path):
+    path = str(tmp_path / 'crm_data.json')
+    store = CRMStore(path, compact_every=10000)
+    primero, segundo, tercero = store.insert_many('companies', [{'nombre': n} for n in 'abc'])
+    store.update('companies', segundo['id'], {'nombre': 'b2'})
+    store.delete('companies', tercero['id'])
+    store.compact()
+
+    with open(store.log_path, 'rb') as f:
+        assert len(f.read().splitlines()) == 1  # solo la cabecera
+    reabierto = CRMStore(path)
+    assert [c['nombre'] for c in reabierto.all('companies')] == ['a', 'b2']
+    # La secuencia no reutiliza el id borrado
+    assert reabierto.insert('companies', {'nombre': 'd'})['id'] == tercero['id'] + 1
+    assert reabierto.get('companies', primero['id'])['nombre'] == 'a'
+
+
+def test_otro_proceso_ve_la_compactacion(tmp_path):
+    path = str(tmp_path / 'crm_data.json')
+    escritor, lector = CRMStore(path, compact_every=10000), CRMStore(path, compact_every=10000)
+    escritor.insert('companies', {'nombre': 'antes'})
+    assert lector.count('companies') == 1
+
+    escritor.compact()
+    escritor.insert('companies', {'nombre': 'despues'})
+    assert [c['nombre'] for c in lector.all('companies')] == ['antes', 'despues']
+
+
+def test_linea_a_medio_escribir_se_descarta(tmp_path):
+    path = str(tmp_path / 'crm_data.json')
+    store = CRMStore(path, compact_every=10000)
+    store.insert('companies', {'nombre': 'completa'})
+    with open(store.log_path, 'ab') as f:
+        f.write(b'{"op": "put", "c": "companies", "rec')  # caída a mitad de escritura
+
+    reabierto = CRMStore(path, compact_every=10000)
+    assert [c['nombre'] for c in reabierto.all('companies')] == ['completa']
+    reabierto.insert('companies', {'nombre': 'siguiente'})
+    assert [c['nombre'] for c in CRMStore(path).all('companies')] == ['completa', 'siguiente']
+
+
+def test_etag_del_snapshot_igual_entre_procesos(tmp_path):
+    path = str(tmp_path / 'crm_data.json')
+    uno, otro = CRMStore(path), CRMStore(path)
+    uno.insert('companies', {'nombre': 'a'})
+    assert uno.snapshot('companies').etag == otro.snapshot('companies').etag
+    antes = otro.snapshot('companies')
+    uno.update('companies', 1, {'nombre': 'b'})
+    assert otro.snapshot('companies').etag != antes.etag
@@ -0,0 +1,52 @@
+"""Pruebas de crm_text: normalización y detección de sectores"""
+
+import pytest
+
+from crm_text import extraer_sectores, simplificar, sin_tildes
+
+
+def test_sin_tildes_y_simplificar():
+    assert sin_tildes('Málaga') == 'malaga'
+    assert sin_tildes('ASCII') == 'ascii'
+    assert simplificar('  A   Coruña\t') == 'a coruna'
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('Trabajo en IT', ['Tecnología']),
+    ('it, sistemas', ['Tecnología']),
+    ('Voluntariado en una ONG', ['Social']),
+])
+def test_palabras_cortas_como_palabra_completa(texto, esperado):
+    assert extraer_sectores(texto) == esperado
+
+
+@pytest.mark.parametrize('texto', [
+    'horario limitado',     # "it" dentro de "limitado"
+    'longitud de onda',     # "ong" dentro de "longitud"
+    'editorial',            # "it" dentro de la palabra
+])
+def test_palabras_cortas_dentro_de_otra_no_cuentan(texto):
+    assert extraer_sectores(texto) == []
+
+
+def test_raices_largas_casan_como_prefijo():
+    assert extraer_sectores('Ingeniero industrial') == ['Ingeniería']
+    assert extraer_sectores('tecnología y programación') == ['Tecnología']
+
+
+def test_sin_tildes_ni_mayusculas():
+    assert extraer_sectores('EDUCACION y psicologia') == ['Educación', 'Salud']
+
+
+def test_raices_de_varias_palabras_admiten_cualquier_espacio():
+    assert extraer_sectores('Social\n  media') == ['Comunicación']
+    assert extraer_sectores('recursos  humanos') == ['Administración']
+
+
+def test_orden_de_sector_keywords_y_sin_repetidos():
+    assert extraer_sectores('cuidados, web, software, cocina') == ['Tecnología', 'Hostelería', 'Social']
+
+
+@pytest.mark.parametrize('texto', [None, '', '   '])
+def test_texto_vacio(texto):
+    assert extraer_sectores(texto) == []
@@ -0,0 +1,107 @@
+"""Pruebas de ExportJobs: validación al encolar, límite por proceso y trabajos abandonados"""
+
+import gzip
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+import export_jobs
+from export_jobs import EXPORT_TYPES, ExportBusy, ExportJobs
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    liberar = threading.Event()
+
+    def filas(params):
+        def generar():
+            for n in range(params.get('n', 3)):
+                if params.get('esperar'):
+                    liberar.wait(5)
+                yield [n, f'fila {n}']
+        return params.get('n', 3), generar()
+
+    monkeypatch.setitem(EXPORT_TYPES, 'prueba', ('prueba', ['N', 'Texto'], filas))
+    queue = ExportJobs(Flask(__name__), directory=str(tmp_path), max_jobs=1)
+    queue.liberar = liberar
+    yield queue
+    liberar.set()
+
+
+def _esperar(jobs, job_id, estados=('done', 'error')):
+    for _ in range(200):
+        job = jobs.status(job_id)
+        if job['state'] in estados:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'el trabajo sigue en {job["state"]}')
+
+
+def test_exporta_csv_comprimido(jobs):
+    job = _esperar(jobs, jobs.submit('prueba', {'n': 3})['id'])
+    assert (job['state'], job['rows'], job['progress']) == ('done', 3, 1.0)
+    assert job['updated_at'] >= job['created_at']
+    with gzip.open(jobs.artifact_path(job['id']), 'rt', encoding='utf-8') as f:
+        assert f.read().splitlines() == ['N,Texto', '0,fila 0', '1,fila 1', '2,fila 2']
+
+
+@pytest.mark.parametrize('params', [{'lead_ids': ['a']}, {'lead_ids': '1,2'}, {'lead_ids': [True]}, ['x']])
+def test_params_invalidos_antes_de_encolar(jobs, params):
+    with pytest.raises(ValueError):
+        jobs.submit('leads', params)
+    assert jobs._active == 0
+
+
+def test_lead_ids_se_convierten_al_encolar():
+    assert export_jobs._validate_leads({'lead_ids': ['7', 8]}) == {'lead_ids': [7, 8]}
+
+
+def test_limite_de_trabajos_por_proceso(jobs):
+    primero = jobs.submit('prueba', {'esperar': True})
+    with pytest.raises(ExportBusy):
+        jobs.submit('prueba')
+    jobs.liberar.set()
+    _esperar(jobs, primero['id'])
+    jobs._executor.submit(lambda: None).result()  # el hueco se libera tras guardar el estado final
+    _esperar(jobs, jobs.submit('prueba')['id'])
+
+
+def _trabajo_de_otro_proceso(jobs, minutos):
+    job = {'id': 'a' * 32, 'type': 'prueba', 'state': 'running', 'rows': 10, 'total': 100,
+           'created_at': (datetime.now() - timedelta(hours=1)).isoformat(),
+           'updated_at': (datetime.now() - timedelta(minutes=minutos)).isoformat()}
+    with open(jobs._path(job['id'], '.json'), 'w', encoding='utf-8') as f:
+        json.dump(job, f)
+    return job['id']
+
+
+def test_trabajo_abandonado_pasa_a_error(jobs, monkeypatch):
+    monkeypatch.setattr(export_jobs, 'EXPORT_STALE_SECONDS', 600)
+    vivo = _trabajo_de_otro_proceso(jobs, minutos=1)
+    assert jobs.status(vivo)['state'] == 'running'
+
+    abandonado = _trabajo_de_otro_proceso(jobs, minutos=30)
+    job = jobs.status(abandonado)
+    assert job['state'] == 'error' and 'interrumpió' in job['error']
+    # Queda guardado para cualquier proceso
+    with open(jobs._path(abandonado, '.json'), encoding='utf-8') as f:
+        assert json.load(f)['state'] == 'error'
+
+
+def test_limpieza_cierra_los_abandonados(jobs):
+    abandonado = _trabajo_de_otro_proceso(jobs, minutos=30)
+    jobs.cleanup()
+    with open(jobs._path(abandonado, '.json'), encoding='utf-8') as f:
+        assert json.load(f)['state'] == 'error'
+
+
+def test_trabajo_propio_lento_no_caduca(jobs, monkeypatch):
+    monkeypatch.setattr(export_jobs, 'EXPORT_STALE_SECONDS', 0)
+    job = jobs.submit('prueba', {'esperar': True})
+    assert jobs.status(job['id'])['state'] in ('queued', 'running')
+    jobs.liberar.set()
+    assert _esperar(jobs, job['id'])['state'] == 'done'